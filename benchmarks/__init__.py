@@ -0,0 +1,63 @@
+"""
+Performance benchmarks for the API. Each module runs against a throwaway test
+database built from the project settings, for example:
+
+    SECRET=somesecret python -m benchmarks.uuid_lookup
+"""
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup():
+    """
+    Configure Django with the project settings.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0, name=None):
+    """
+    Create the test databases for the duration of the block. Pass the name of
+    a file for the default database when threads need to share it, SQLite
+    test databases are in memory otherwise.
+    """
+    from django.db import connections
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    if name is not None:
+        connections.databases['default'].setdefault('TEST', {})['NAME'] = name
+    setup_test_environment()
+    config = setup_databases(verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(config, verbosity)
+        teardown_test_environment()
+
+
+def percentile(samples, pct):
+    """
+    Nearest rank percentile of a list of samples.
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1,
+                       int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def timed(func, *args, **kwargs):
+    """
+    Call func and return how long it took in milliseconds.
+    """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,4 @@
+from .endpoints import main
+
+if __name__ == '__main__':
+    main()
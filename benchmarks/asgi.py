@@ -0,0 +1,174 @@
+"""
+Compares how the read endpoints (recent and user feeds, post details and
+comment lists) hold up as concurrent connections grow, under the WSGI entry
+point with a thread per connection, under the ASGI entry point with the reads
+served on the event loop (see posts/asgi.py) and under ASGI with them turned
+off, where Django 3.0 runs every request in one shared thread. Both entry
+points are called in process, without a server in front.
+
+    SECRET=somesecret python -m benchmarks.asgi --connections 1 10 50 100
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from . import percentile, setup, test_database
+from .seed import seed
+
+
+def read_paths():
+    from posts.models import Post
+
+    posts = Post.objects.order_by('-comment_count').select_related(
+        'author')[:10]
+    paths = ['/posts/recent/']
+    for post in posts:
+        paths += [f'/posts/{post.uuid}/', f'/posts/{post.uuid}/comments/',
+                  f'/posts/user/{post.author.uuid}/']
+    return paths
+
+
+def wsgi_request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+               'HTTP_HOST': 'testserver', 'wsgi.input': io.BytesIO()}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = b''.join(application(
+        environ, lambda status, headers: statuses.append(status)))
+    return int(statuses[0].split()[0]), body
+
+
+def run_wsgi(paths, connections, seconds):
+    """
+    One thread per connection, each sending requests back to back.
+    """
+    from mysite.wsgi import application
+
+    results, deadline = [], time.perf_counter() + seconds
+
+    def connection(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = wsgi_request(application, paths[i % len(paths)])
+            results.append((status, time.perf_counter() - start))
+            i += 1
+
+    threads = [threading.Thread(target=connection, args=(i,))
+               for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+async def asgi_request(application, path):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'root_path': '',
+        'query_string': b'', 'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    response = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    await application(scope, receive, send)
+    return response['status']
+
+
+def run_asgi(paths, connections, seconds):
+    """
+    One coroutine per connection on a single event loop.
+    """
+    from mysite.asgi import application
+
+    results = []
+
+    async def connection(offset, deadline):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await asgi_request(application, paths[i % len(paths)])
+            results.append((status, time.perf_counter() - start))
+            i += 1
+
+    async def main():
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(connection(i, deadline)
+                               for i in range(connections)))
+
+    asyncio.run(main())
+    return results
+
+
+def summarize(results, seconds):
+    timings = [duration * 1000 for status, duration in results]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        'requests_per_second': round(len(results) / seconds, 1),
+        'statuses': statuses,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+    }
+
+
+def run(connection_counts, seconds):
+    from django.test import override_settings
+
+    seed('small')
+    paths = read_paths()
+    entry_points = {
+        'wsgi': lambda count: run_wsgi(paths, count, seconds),
+        'asgi': lambda count: run_asgi(paths, count, seconds),
+        'asgi_sync_views': lambda count: run_asgi(paths, count, seconds),
+    }
+    report = []
+    for count in connection_counts:
+        row = {'connections': count}
+        for name, entry_point in entry_points.items():
+            enabled = name != 'asgi_sync_views'
+            with override_settings(ASYNC_READS={'ENABLED': enabled}):
+                row[name] = summarize(entry_point(count), seconds)
+        report.append(row)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', nargs='+', type=int,
+                        default=[1, 10, 50, 100])
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    setup()
+    import logging
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    directory = tempfile.mkdtemp()
+    try:
+        # threads share the database, in memory databases are per connection
+        with test_database(name=os.path.join(directory, 'asgi.sqlite3')):
+            print(json.dumps(run(args.connections, args.seconds), indent=2))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
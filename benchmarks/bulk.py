@@ -0,0 +1,78 @@
+"""
+Compares creating posts and comments one request at a time with the batch
+endpoints, in items created per second.
+
+    SECRET=somesecret python -m benchmarks.bulk --items 1000 --batch-sizes 10 100 500
+"""
+import argparse
+import json
+import time
+
+from . import setup, test_database
+from .drivers import DRIVERS
+from .seed import PASSWORD, seed
+
+
+def login(driver, username='user0'):
+    status, body = driver.request('POST', '/accounts/login/', {
+        'username': username, 'password': PASSWORD})
+    return json.loads(body)['access']
+
+
+def create(driver, token, path, items, batch_size):
+    """
+    Create items, one per request without a batch size. Returns items/s.
+    """
+    start = time.perf_counter()
+    if batch_size is None:
+        for item in items:
+            driver.request('POST', path, item, token)
+    else:
+        for i in range(0, len(items), batch_size):
+            driver.request('POST', f'{path}batch/', items[i:i + batch_size],
+                           token)
+    return round(len(items) / (time.perf_counter() - start), 1)
+
+
+def run(driver_name, count, batch_sizes):
+    from posts.models import Post
+
+    seed('small')
+    driver = DRIVERS[driver_name]()
+    try:
+        token = login(driver)
+        post = Post.objects.order_by('id').first()
+        report = []
+        for batch_size in [None] + batch_sizes:
+            report.append({
+                'batch_size': batch_size or 1,
+                'endpoint': 'batch' if batch_size else 'single',
+                'posts_per_second': create(
+                    driver, token, '/posts/',
+                    [{'text': f'post {i}'} for i in range(count)], batch_size),
+                'comments_per_second': create(
+                    driver, token, f'/posts/{post.uuid}/comments/',
+                    [{'text': f'comment {i}'} for i in range(count)],
+                    batch_size),
+            })
+    finally:
+        driver.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--driver', choices=sorted(DRIVERS), default='client')
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--batch-sizes', nargs='+', type=int,
+                        default=[10, 100, 500])
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        print(json.dumps(run(args.driver, args.items, args.batch_sizes),
+                         indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Measures pins and comments written by concurrent clients through the threaded
+WSGI server, with SQLite's default configuration and with the production
+profile and serialized writes (see mysite/backends/sqlite3 and
+mysite/writes.py). Each configuration runs on a fresh database file, since
+the journal mode is stored in the file.
+
+    SECRET=somesecret python -m benchmarks.concurrency --threads 8 --seconds 10
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from . import percentile, setup, test_database
+from .bulk import login
+from .drivers import WSGIDriver
+from .seed import seed
+
+CONFIGURATIONS = {
+    'default': {'PROFILE': 'default', 'SERIALIZE_WRITES': False},
+    'production': {'PROFILE': 'production', 'SERIALIZE_WRITES': True},
+}
+
+
+def client(driver, token, paths, deadline, seed, results):
+    """
+    Pin, unpin and comment on the hot posts until the deadline.
+    """
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        if path.endswith('/pin/'):
+            method, data = rng.choice(['PUT', 'DELETE']), None
+        else:
+            method, data = 'POST', {'text': 'concurrent comment'}
+        start = time.perf_counter()
+        status, _ = driver.request(method, path, data, token)
+        results.append((status, (time.perf_counter() - start) * 1000))
+
+
+def run(threads, seconds):
+    from posts.models import Post
+
+    seed('small')
+    driver = WSGIDriver()
+    # failed writes are logged with a traceback each
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    try:
+        tokens = [login(driver, f'user{i}') for i in range(threads)]
+        paths = []
+        for uuid in Post.objects.order_by('-pins').values_list(
+                'uuid', flat=True)[:5]:
+            paths += [f'/posts/{uuid}/pin/', f'/posts/{uuid}/comments/']
+
+        results = []
+        deadline = time.perf_counter() + seconds
+        workers = [threading.Thread(target=client, args=(
+            driver, token, paths, deadline, i, results))
+            for i, token in enumerate(tokens)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        driver.close()
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    timings = [ms for status, ms in results if status < 500]
+    return {
+        'writes_per_second': round(len(timings) / seconds, 1),
+        'failed': sum(1 for status, _ in results if status >= 500),
+        'statuses': statuses,
+        'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+        'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--configurations', nargs='+',
+                        choices=sorted(CONFIGURATIONS),
+                        default=['default', 'production'])
+    args = parser.parse_args()
+
+    setup()
+    from django.test import override_settings
+
+    report = {}
+    for name in args.configurations:
+        directory = tempfile.mkdtemp()
+        database = os.path.join(directory, 'benchmark.sqlite3')
+        with override_settings(SQLITE=CONFIGURATIONS[name]), \
+                test_database(name=database):
+            report[name] = run(args.threads, args.seconds)
+        shutil.rmtree(directory)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
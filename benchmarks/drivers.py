@@ -0,0 +1,156 @@
+"""
+Ways of sending requests to the API. Every driver has the same interface:
+
+    driver.request(method, path, data=None, token=None) -> (status, body)
+
+ClientDriver goes through the Django test client and also counts the queries
+each request runs. WSGIDriver and ASGIDriver go through the real entry points
+in mysite/wsgi.py and mysite/asgi.py over an in-process server.
+"""
+import asyncio
+import http.client
+import json
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from socketserver import ThreadingMixIn
+
+
+class ClientDriver:
+    name = 'client'
+    counts_queries = True
+
+    def __init__(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+
+    def request(self, method, path, data=None, token=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method.lower())(
+                path, data=data, format='json', **extra)
+        self.last_queries = len(queries)
+        return res.status_code, res.content
+
+    def close(self):
+        pass
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class HTTPDriver:
+    """
+    Sends requests over HTTP to a server listening on host:port.
+    """
+    counts_queries = False
+    host = '127.0.0.1'
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Host': 'testserver', 'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data) if data is not None else None
+
+        conn = http.client.HTTPConnection(self.host, self.port)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            res = conn.getresponse()
+            return res.status, res.read()
+        finally:
+            conn.close()
+
+
+class WSGIDriver(HTTPDriver):
+    name = 'wsgi'
+
+    def __init__(self):
+        from mysite.wsgi import application
+
+        self.server = make_server(self.host, 0, application,
+                                  server_class=ThreadingWSGIServer,
+                                  handler_class=QuietHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ASGIDriver:
+    """
+    Calls the ASGI application directly on an event loop, the way an ASGI
+    server would.
+    """
+    name = 'asgi'
+    counts_queries = False
+
+    def __init__(self):
+        from mysite.asgi import application
+
+        self.application = application
+        self.loop = asyncio.new_event_loop()
+
+    async def call(self, method, path, body, headers):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode('ascii'),
+            'query_string': query.encode('ascii'),
+            'headers': [(k.lower().encode('latin1'), v.encode('latin1'))
+                        for k, v in headers.items()],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {'type': 'http.disconnect'}
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        response = {'status': None, 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'] += message.get('body', b'')
+
+        await self.application(scope, receive, send)
+        return response['status'], response['body']
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        headers['Content-Length'] = str(len(body))
+        return self.loop.run_until_complete(
+            self.call(method, path, body, headers))
+
+    def close(self):
+        self.loop.close()
+
+
+DRIVERS = {driver.name: driver
+           for driver in (ClientDriver, WSGIDriver, ASGIDriver)}
@@ -0,0 +1,265 @@
+"""
+Drives every route in posts/urls.py, users/urls.py and search/urls.py against
+a seeded database and reports latency percentiles, throughput and query counts
+as JSON.
+
+    SECRET=somesecret python -m benchmarks --driver client --scale small
+    SECRET=somesecret python -m benchmarks --output baseline.json
+    SECRET=somesecret python -m benchmarks --baseline baseline.json
+
+When a baseline is given the run fails if any endpoint got slower than the
+baseline p95 by more than --tolerance, or runs more queries than it did.
+"""
+import argparse
+import itertools
+import json
+import logging
+import sys
+import time
+
+from . import percentile, setup, test_database
+from .drivers import DRIVERS
+from .seed import PASSWORD, seed
+
+
+class Context:
+    """
+    Objects from the seeded database the scenarios pick from.
+    """
+
+    def __init__(self, driver, requests):
+        from django.contrib.auth import get_user_model
+        from django.db.models import Count, F
+        from posts.models import Comment, Mention, Post, Tag
+        from posts.timeline import backfill
+
+        User = get_user_model()
+        self.driver = driver
+        self.user = User.objects.order_by('id').first()
+        self.other = User.objects.order_by('id')[1]
+        self.token, self.refresh = self.login(driver, self.user.username)
+        # changing the password revokes the tokens, keep it to another user
+        self.password_token, _ = self.login(driver, self.other.username)
+
+        # seeding skips timelines, fill in the one being read
+        for followee_id in self.user.following.values_list(
+                'followee_id', flat=True):
+            backfill(self.user.pk, followee_id)
+
+        popular = Post.objects.order_by('-comment_count', '-pins')
+        self.post = popular.first()
+        self.own_post = Post.objects.filter(author=self.user).first()
+        self.comment = Comment.objects.filter(post=self.post).first()
+        self.tag = Tag.objects.order_by('-post_count').first()
+        self.mentioned = User.objects.get(pk=Mention.objects.values(
+            'user').annotate(count=Count('id')).order_by(
+            '-count').values_list('user', flat=True)[0])
+        self.batch_uuids = ','.join(
+            str(uuid) for uuid in popular.values_list('uuid', flat=True)[:50])
+
+        # rows the destructive scenarios use up, one per request
+        self.deletable_posts = iter(Post.objects.bulk_create(
+            Post(text='delete me', author=self.user) for _ in range(requests)))
+        Post.objects.filter(pk=self.post.pk).update(
+            comment_count=F('comment_count') + requests)
+        self.deletable_comments = iter(Comment.objects.bulk_create(
+            Comment(text='delete me', author=self.user, post=self.post)
+            for _ in range(requests)))
+        self.counter = itertools.count()
+
+    def login(self, driver, username):
+        status, body = driver.request('POST', '/accounts/login/', {
+            'username': username, 'password': PASSWORD})
+        data = json.loads(body)
+        return data['access'], data['refresh']
+
+    def next_name(self):
+        return f'bench{next(self.counter)}'
+
+
+def post_url(ctx, post=None):
+    return f'/posts/{(post or ctx.post).uuid}/'
+
+
+# (name, method, auth, path(ctx), data(ctx)), auth is True for the main
+# users token or a function returning the token to use
+SCENARIOS = [
+    ('posts.list', 'GET', True, lambda ctx: '/posts/', None),
+    ('posts.create', 'POST', True, lambda ctx: '/posts/',
+     lambda ctx: {'text': 'benchmark post'}),
+    ('posts.batch_read', 'GET', False,
+     lambda ctx: f'/posts/batch/?uuids={ctx.batch_uuids}', None),
+    ('posts.batch_create', 'POST', True, lambda ctx: '/posts/batch/',
+     lambda ctx: [{'text': 'benchmark post'}] * 10),
+    ('posts.detail', 'GET', False, post_url, None),
+    ('posts.update', 'PUT', True, lambda ctx: post_url(ctx, ctx.own_post),
+     lambda ctx: {'text': 'edited'}),
+    ('posts.delete', 'DELETE', True,
+     lambda ctx: post_url(ctx, next(ctx.deletable_posts)), None),
+    ('posts.pin', 'PUT', True, lambda ctx: post_url(ctx) + 'pin/', None),
+    ('posts.unpin', 'DELETE', True, lambda ctx: post_url(ctx) + 'pin/', None),
+    ('posts.comments', 'GET', False,
+     lambda ctx: post_url(ctx) + 'comments/', None),
+    ('posts.comment_create', 'POST', True,
+     lambda ctx: post_url(ctx) + 'comments/',
+     lambda ctx: {'text': 'benchmark comment'}),
+    ('posts.comment_batch_create', 'POST', True,
+     lambda ctx: post_url(ctx) + 'comments/batch/',
+     lambda ctx: [{'text': 'benchmark comment'}] * 10),
+    ('posts.comment_detail', 'GET', False,
+     lambda ctx: f'{post_url(ctx)}comments/{ctx.comment.uuid}/', None),
+    ('posts.comment_delete', 'DELETE', True,
+     lambda ctx: (f'{post_url(ctx)}comments/'
+                  f'{next(ctx.deletable_comments).uuid}/'), None),
+    ('posts.recent', 'GET', False, lambda ctx: '/posts/recent/', None),
+    ('posts.user', 'GET', False,
+     lambda ctx: f'/posts/user/{ctx.post.author.uuid}/', None),
+    ('posts.timeline', 'GET', True, lambda ctx: '/posts/timeline/', None),
+    ('posts.trending', 'GET', False, lambda ctx: '/posts/trending/', None),
+    ('posts.trending_tags', 'GET', False,
+     lambda ctx: '/posts/trending/tags/', None),
+    ('posts.tag', 'GET', False,
+     lambda ctx: f'/posts/tags/{ctx.tag.name}/', None),
+    ('posts.mentions', 'GET', False,
+     lambda ctx: f'/posts/user/{ctx.mentioned.uuid}/mentions/', None),
+    # every seeded post and comment contains the term
+    ('search', 'GET', False, lambda ctx: '/search/?q=post', None),
+    ('accounts.me', 'GET', True, lambda ctx: '/accounts/me/', None),
+    ('accounts.register', 'POST', False, lambda ctx: '/accounts/register/',
+     lambda ctx: {'username': ctx.next_name(), 'password': PASSWORD,
+                  'confirm_password': PASSWORD}),
+    ('accounts.login', 'POST', False, lambda ctx: '/accounts/login/',
+     lambda ctx: {'username': ctx.user.username, 'password': PASSWORD}),
+    ('accounts.token_refresh', 'POST', False,
+     lambda ctx: '/accounts/token/refresh/',
+     lambda ctx: {'refresh': ctx.refresh}),
+    ('accounts.token_verify', 'POST', False,
+     lambda ctx: '/accounts/token/verify/', lambda ctx: {'token': ctx.token}),
+    ('accounts.details', 'GET', False,
+     lambda ctx: f'/accounts/{ctx.other.username}/', None),
+    ('accounts.password_change', 'POST', lambda ctx: ctx.password_token,
+     lambda ctx: '/accounts/password/change/',
+     lambda ctx: {'password': PASSWORD, 'confirm_password': PASSWORD}),
+    ('accounts.logout', 'POST',
+     lambda ctx: ctx.login(ctx.driver, ctx.user.username)[0],
+     lambda ctx: '/accounts/logout/', None),
+    ('accounts.follow', 'PUT', True,
+     lambda ctx: f'/accounts/{ctx.other.username}/follow/', None),
+    ('accounts.unfollow', 'DELETE', True,
+     lambda ctx: f'/accounts/{ctx.other.username}/follow/', None),
+]
+
+# called with the response body of each request
+AFTER = {
+    'accounts.password_change': lambda ctx, body: setattr(
+        ctx, 'password_token', json.loads(body)['access']),
+}
+
+
+def run_scenario(driver, ctx, scenario, requests):
+    name, method, auth, path, data = scenario
+    after = AFTER.get(name)
+
+    timings, queries, statuses = [], [], {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        token = auth(ctx) if callable(auth) else ctx.token if auth else None
+        args = (method, path(ctx), data(ctx) if data else None, token)
+        began = time.perf_counter()
+        status, body = driver.request(*args)
+        timings.append((time.perf_counter() - began) * 1000)
+        if after:
+            after(ctx, body)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if driver.counts_queries:
+            queries.append(driver.last_queries)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'statuses': statuses,
+    }
+    if queries:
+        result['queries'] = max(queries)
+    return name, result
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a list of regressions against a baseline report.
+    """
+    regressions = []
+    for name, result in results['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {result["p95_ms"]}ms > {base["p95_ms"]}ms')
+        if result.get('queries', 0) > base.get('queries', sys.maxsize):
+            regressions.append(
+                f'{name}: {result["queries"]} queries > {base["queries"]}')
+    return regressions
+
+
+def run(driver_name, scale, requests, only=None):
+    counts = seed(scale)
+    driver = DRIVERS[driver_name]()
+    # expected 4xx responses would otherwise be logged for every request,
+    # after the driver since loading an application reconfigures logging
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    try:
+        ctx = Context(driver, requests)
+        endpoints = dict(
+            run_scenario(driver, ctx, scenario, requests)
+            for scenario in SCENARIOS
+            if not only or any(scenario[0].startswith(o) for o in only))
+    finally:
+        driver.close()
+
+    return {
+        'driver': driver_name,
+        'scale': scale,
+        'requests': requests,
+        'rows': counts,
+        'endpoints': endpoints,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--driver', choices=sorted(DRIVERS), default='client')
+    parser.add_argument('--scale', choices=['small', 'medium', 'large'],
+                        default='small')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='requests per endpoint')
+    parser.add_argument('--only', nargs='+',
+                        help='only run endpoints starting with these names')
+    parser.add_argument('--output', help='write the report to this file')
+    parser.add_argument('--baseline', help='compare against this report')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    setup()
+    with test_database():
+        results = run(args.driver, args.scale, args.requests, args.only)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,84 @@
+"""
+Measures login throughput against the number of password hashing workers
+while a reader keeps requesting the trending feed, to show how much a burst of
+logins slows down everything else served by the same process.
+
+    SECRET=somesecret python -m benchmarks.login --workers 0 1 2 4
+"""
+import argparse
+import json
+import threading
+import time
+
+from . import percentile, setup, test_database
+from .drivers import WSGIDriver
+from .seed import PASSWORD, seed
+
+
+def hammer(driver, username, deadline, results):
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        status, _ = driver.request('POST', '/accounts/login/', {
+            'username': username, 'password': PASSWORD})
+        results.append((status, (time.perf_counter() - began) * 1000))
+
+
+def read(driver, deadline, timings):
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        driver.request('GET', '/posts/trending/')
+        timings.append((time.perf_counter() - began) * 1000)
+
+
+def measure(workers, concurrency, duration):
+    from django.test import override_settings
+    from users import hashing
+
+    with override_settings(PASSWORD_HASHING={'WORKERS': workers}):
+        hashing.shutdown()
+        hashing.make_password(PASSWORD)  # start the workers
+        driver = WSGIDriver()
+        try:
+            logins, reads = [], []
+            deadline = time.perf_counter() + duration
+            threads = [threading.Thread(target=hammer, args=(
+                driver, f'user{i}', deadline, logins))
+                for i in range(concurrency)]
+            threads.append(threading.Thread(
+                target=read, args=(driver, deadline, reads)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            driver.close()
+            hashing.shutdown()
+
+    ok = [ms for status, ms in logins if status == 200]
+    return {
+        'workers': workers,
+        'logins_per_second': round(len(ok) / duration, 1),
+        'login_p95_ms': round(percentile(ok, 95), 3) if ok else None,
+        'rejected': sum(status == 503 for status, _ in logins),
+        'read_p95_ms': round(percentile(reads, 95), 3) if reads else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', nargs='+', type=int, default=[0, 1, 2, 4])
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='clients logging in at once')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='seconds per worker count')
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        seed('small')
+        print(json.dumps([measure(workers, args.concurrency, args.duration)
+                          for workers in args.workers], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures how long it takes to turn a page of serialized posts and comments
+into JSON with DRF's JSONRenderer and with FastJSONRenderer, and checks both
+produce the same bytes.
+
+    SECRET=somesecret python -m benchmarks.renderers --page-sizes 20 100 500
+"""
+import argparse
+import json
+
+from . import percentile, setup, test_database, timed
+from .seed import seed
+
+
+def pages(size):
+    from posts.models import Comment, Post
+    from posts.serializers import CommentSerializer, PostSerializer
+
+    posts = Post.objects.with_summary().order_by('-id')[:size]
+    comments = Comment.objects.select_related('author', 'post')[:size]
+    return {
+        'posts': {'next': None,
+                  'results': PostSerializer(posts, many=True).data},
+        'comments': {'next': None,
+                     'results': CommentSerializer(comments, many=True).data},
+    }
+
+
+def run(page_sizes, samples):
+    from rest_framework.renderers import JSONRenderer
+    from mysite.renderers import FastJSONRenderer, orjson
+
+    renderers = {'json': JSONRenderer(), 'fast': FastJSONRenderer()}
+    report = []
+    for size in page_sizes:
+        for name, page in pages(size).items():
+            rendered = {key: renderer.render(page)
+                        for key, renderer in renderers.items()}
+            result = {'page': name, 'items': len(page['results']),
+                      'bytes': len(rendered['json']),
+                      'identical': rendered['json'] == rendered['fast']}
+            for key, renderer in renderers.items():
+                timings = [timed(renderer.render, page) for _ in range(samples)]
+                result[f'{key}_p50_ms'] = round(percentile(timings, 50), 4)
+                result[f'{key}_p95_ms'] = round(percentile(timings, 95), 4)
+            result['speedup'] = round(
+                result['json_p50_ms'] / result['fast_p50_ms'], 1)
+            report.append(result)
+    return {'orjson': orjson is not None, 'results': report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-sizes', nargs='+', type=int,
+                        default=[20, 100, 500])
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        seed('small')
+        print(json.dumps(run(args.page_sizes, args.samples), indent=2))
+
+
+if __name__ == '__main__':
+    main()
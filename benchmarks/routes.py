@@ -0,0 +1,91 @@
+"""
+Measures how requests with malformed and unknown IDs are handled. Malformed
+IDs are rejected by the typed URL converters before any view runs, so they
+must not run a single query. Unknown but well formed IDs are looked up on
+the unique UUID indexes.
+
+    SECRET=somesecret python -m benchmarks.routes --requests 500
+"""
+import argparse
+import json
+import logging
+import time
+from uuid import uuid4
+
+from . import percentile, setup, test_database
+from .drivers import ClientDriver
+from .seed import seed
+
+
+def paths():
+    from posts.models import Post
+
+    post = Post.objects.first()
+    missing = uuid4()
+    return {
+        'malformed': [
+            '/posts/not-a-uuid/',
+            '/posts/1234/comments/',
+            f'/posts/{str(post.uuid)[:-1]}/',
+            f'/posts/{post.uuid}/comments/nope/',
+            '/posts/user/nope/',
+        ],
+        'unknown': [
+            f'/posts/{missing}/',
+            f'/posts/{missing}/comments/',
+            f'/posts/user/{missing}/',
+        ],
+        'existing': [
+            f'/posts/{post.uuid}/',
+            f'/posts/{post.uuid}/comments/',
+            '/posts/recent/',
+        ],
+    }
+
+
+def run(requests):
+    from django.core.cache import cache
+
+    driver = ClientDriver()
+    # every 404 is logged as a warning
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    report = []
+    for kind, group in paths().items():
+        for path in group:
+            timings, queries, statuses = [], [], {}
+            for _ in range(requests):
+                cache.clear()  # measure the database, not the post cache
+                began = time.perf_counter()
+                status, _ = driver.request('GET', path)
+                timings.append((time.perf_counter() - began) * 1000)
+                queries.append(driver.last_queries)
+                statuses[status] = statuses.get(status, 0) + 1
+            report.append({
+                'kind': kind,
+                'path': path,
+                'statuses': statuses,
+                'queries': max(queries),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--scale', default='small')
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        seed(args.scale)
+        report = run(args.requests)
+        print(json.dumps(report, indent=2))
+
+    if any(row['queries'] for row in report if row['kind'] == 'malformed'):
+        raise SystemExit('malformed IDs ran queries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Measures search latency as the number of posts grows, for every search
+backend and for a naive icontains scan. Post texts are drawn from a Zipf
+distributed vocabulary, so the common terms are in a large share of the posts
+and the rare ones in a handful.
+
+    SECRET=somesecret python -m benchmarks.search --sizes 10000 100000 1000000
+"""
+import argparse
+import itertools
+import json
+import random
+
+from . import percentile, setup, test_database, timed
+from .seed import BATCH_SIZE, PASSWORD
+
+VOCABULARY = 50000
+WORDS_PER_POST = 12
+BACKENDS = ('FTS5Backend', 'InvertedIndexBackend')
+
+
+def word(rank):
+    # the x keeps word 1 from being a substring of word 10 for icontains
+    return f'w{rank}x'
+
+
+def texts(count, rng):
+    ranks = range(VOCABULARY)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in ranks))
+    for _ in range(count):
+        yield ' '.join(word(rank) for rank in rng.choices(
+            ranks, cum_weights=cum_weights, k=WORDS_PER_POST))
+
+
+def grow(author, start, stop, rng):
+    """
+    Insert posts until there are stop of them and index the new ones with
+    every backend.
+    """
+    from django.db import transaction
+    from django.db.models import Max
+    from django.utils.module_loading import import_string
+
+    from posts.models import Post
+    from search.models import Posting
+
+    backends = [import_string(f'search.backends.{name}')()
+                for name in BACKENDS]
+    generated = texts(stop - start, rng)
+    for offset in range(start, stop, BATCH_SIZE):
+        last_id = Post.objects.aggregate(last=Max('id'))['last'] or 0
+        with transaction.atomic():
+            # bulk_create sends no signals, index the batch here
+            Post.objects.bulk_create(
+                Post(author=author, text=next(generated))
+                for _ in range(min(BATCH_SIZE, stop - offset)))
+            documents = list(Post.objects.filter(
+                id__gt=last_id).values_list('id', 'text'))
+            for backend in backends:
+                backend.index(Posting.POST, documents)
+
+
+def queries(count):
+    """
+    A rare, a common and a multi term query.
+    """
+    return {
+        'rare': [word(count // 20)],
+        'common': [word(0)],
+        'multi': [word(1), word(10)],
+    }
+
+
+def search(backend_name, terms):
+    from django.utils.module_loading import import_string
+
+    from search.models import Posting
+
+    backend = import_string(f'search.backends.{backend_name}')()
+    return backend.search(terms, [Posting.POST])
+
+
+def icontains(terms):
+    from posts.models import Post
+
+    queryset = Post.objects.all()
+    for term in terms:
+        queryset = queryset.filter(text__icontains=term)
+    return list(queryset.order_by('-id').values_list('id', flat=True)[:20])
+
+
+def measure(func, *args, repeat):
+    timings = [timed(func, *args) for _ in range(repeat)]
+    return {'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3)}
+
+
+def run(sizes, repeat):
+    from django.contrib.auth import get_user_model
+
+    author = get_user_model().objects.create_user(
+        username='search', password=PASSWORD)
+    rng = random.Random(0)
+    report, count = [], 0
+    for size in sorted(sizes):
+        grow(author, count, size, rng)
+        count = size
+        for kind, terms in queries(count).items():
+            row = {'posts': count, 'query': kind, 'terms': terms}
+            for name in BACKENDS:
+                row[name] = measure(search, name, terms, repeat=repeat)
+            row['icontains'] = measure(icontains, terms, repeat=repeat)
+            report.append(row)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        print(json.dumps(run(args.sizes, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Seeds the database with realistic volumes of users, posts, comments, pins and
+follows using bulk inserts. Activity is skewed the way real social data is: a
+few users write most posts and a few posts get most comments and pins. Some
+posts carry a #tag or @mention, again mostly of a few tags and users, and the
+search index covers everything.
+"""
+import random
+
+SCALES = {
+    'small': {'users': 200, 'posts': 2000, 'comments': 5000, 'pins': 5000,
+              'follows': 2000},
+    'medium': {'users': 2000, 'posts': 50000, 'comments': 100000,
+               'pins': 100000, 'follows': 40000},
+    'large': {'users': 20000, 'posts': 500000, 'comments': 1000000,
+              'pins': 1000000, 'follows': 400000},
+}
+
+PASSWORD = 'benchmark-password'
+BATCH_SIZE = 5000
+TAGS = 500
+TAGGED = 0.3  # share of posts with a tag
+MENTIONING = 0.1  # share of posts mentioning a user
+
+
+def skewed(count, rng, alpha=1.2):
+    """
+    Return an index in range(count) drawn from a long tailed distribution so
+    low indexes are picked far more often.
+    """
+    return min(int(rng.paretovariate(alpha)) - 1, count - 1)
+
+
+def post_text(i, user_count, rng):
+    words = [f'post {i}']
+    if rng.random() < TAGGED:
+        words.append(f'#tag{skewed(TAGS, rng)}')
+    if rng.random() < MENTIONING:
+        words.append(f'@user{skewed(user_count, rng)}')
+    return ' '.join(words)
+
+
+def batched(objects, model):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def seed(scale='small', seed=0):
+    """
+    Fill the database and return the counts that were inserted.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db.models import Count
+
+    from posts import tags
+    from posts.models import Comment, Mention, Post, PostPin, Tag
+    from posts.trending import refresh
+    from search.indexing import rebuild
+    from users.models import Follow
+
+    User = get_user_model()
+    counts = SCALES[scale]
+    rng = random.Random(seed)
+
+    # hashing is slow on purpose, every user shares one hash
+    password = make_password(PASSWORD)
+    batched((User(username=f'user{i}', password=password)
+             for i in range(counts['users'])), User)
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+    batched((Post(text=post_text(i, len(user_ids), rng),
+                  author_id=user_ids[skewed(len(user_ids), rng)])
+             for i in range(counts['posts'])), Post)
+    post_ids = list(Post.objects.order_by('-id').values_list('id', flat=True))
+
+    batched((Comment(text=f'comment {i}',
+                     author_id=rng.choice(user_ids),
+                     post_id=post_ids[skewed(len(post_ids), rng)])
+             for i in range(counts['comments'])), Comment)
+    batched((PostPin(user_id=rng.choice(user_ids),
+                     post_id=post_ids[skewed(len(post_ids), rng)])
+             for _ in range(counts['pins'])), PostPin)
+    follows = ((rng.choice(user_ids), user_ids[skewed(len(user_ids), rng)])
+               for _ in range(counts['follows']))
+    batched((Follow(follower_id=follower, followee_id=followee)
+             for follower, followee in follows if follower != followee), Follow)
+
+    # bring the denormalized counters in line with the rows above
+    Post.objects.recount_comments()
+    for post_id, pins in PostPin.objects.values_list('post').annotate(
+            pins=Count('id')).iterator():
+        Post.objects.filter(pk=post_id).update(pins=pins)
+    for user_id, followers in Follow.objects.values_list('followee').annotate(
+            followers=Count('id')).iterator():
+        User.objects.filter(pk=user_id).update(follower_count=followers)
+    # bulk_create sends no signals, extract tags and mentions and index here
+    posts = Post.objects.only('id', 'text', 'date_created').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        tags.sync(batch)
+        last_id = batch[-1].pk
+    rebuild()
+    refresh()
+
+    return {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'pins': PostPin.objects.count(),
+        'follows': Follow.objects.count(),
+        'tags': Tag.objects.count(),
+        'mentions': Mention.objects.count(),
+    }
@@ -0,0 +1,91 @@
+"""
+Measures how many pages of posts and comments per second can be fetched and
+serialized with the model serializers and with the .values() serializers used
+by the list endpoints on GET, and checks both produce the same output.
+
+    SECRET=somesecret python -m benchmarks.serializers --page-sizes 20 100
+"""
+import argparse
+import json
+import time
+
+from . import percentile, setup, test_database, timed
+from .seed import seed
+
+
+def cases():
+    from posts.models import Comment, Post
+    from posts.serializers import (
+        CommentSerializer,
+        CommentValuesSerializer,
+        PostSerializer,
+        PostValuesSerializer,
+    )
+
+    post = Post.objects.order_by('-comment_count').first()
+    return {
+        'posts': (Post.objects.with_summary(),
+                  PostSerializer, PostValuesSerializer),
+        'comments': (Comment.objects.select_related('author', 'post')
+                     .filter(post=post),
+                     CommentSerializer, CommentValuesSerializer),
+    }
+
+
+def serialize(queryset, serializer_class, size):
+    queryset = queryset.order_by('-date_created', '-id')
+    if hasattr(serializer_class, 'values'):
+        queryset = serializer_class.values(queryset)
+    return serializer_class(queryset[:size], many=True).data
+
+
+def measure(queryset, serializer_class, size, duration):
+    timings = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        timings.append(timed(serialize, queryset, serializer_class, size))
+    return {
+        'pages_per_second': round(len(timings) / duration, 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+    }
+
+
+def run(page_sizes, duration):
+    from rest_framework.renderers import JSONRenderer
+
+    render = JSONRenderer().render
+    report = []
+    for size in page_sizes:
+        for name, (queryset, model, values) in cases().items():
+            result = {
+                'page': name,
+                'size': size,
+                'identical': (render(serialize(queryset, model, size)) ==
+                              render(serialize(queryset, values, size))),
+                'model': measure(queryset, model, size, duration),
+                'values': measure(queryset, values, size, duration),
+            }
+            result['speedup'] = round(
+                result['values']['pages_per_second'] /
+                result['model']['pages_per_second'], 1)
+            report.append(result)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-sizes', nargs='+', type=int, default=[20, 100])
+    parser.add_argument('--duration', type=float, default=2,
+                        help='seconds per serializer and page size')
+    parser.add_argument('--scale', default='small')
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        seed(args.scale)
+        print(json.dumps(run(args.page_sizes, args.duration), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measures how long it takes to fetch posts, comments and users by UUID as the
+tables grow. With the unique UUID indexes the lookup latency should stay flat
+instead of growing with the row count.
+
+    SECRET=somesecret python -m benchmarks.uuid_lookup --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import random
+from uuid import uuid4
+
+from . import percentile, setup, test_database, timed
+
+
+def grow(size, author):
+    """
+    Bulk insert users, posts and comments until each table has size rows.
+    """
+    from django.contrib.auth import get_user_model
+    from posts.models import Comment, Post
+
+    User = get_user_model()
+    batch = 5000
+    while Post.objects.count() < size:
+        count = min(batch, size - Post.objects.count())
+        offset = User.objects.count()
+        User.objects.bulk_create(
+            User(username=f'user{offset + i}') for i in range(count))
+        Post.objects.bulk_create(
+            Post(text='benchmark', author=author) for _ in range(count))
+        post = Post.objects.latest('id')
+        Comment.objects.bulk_create(
+            Comment(text='benchmark', author=author, post=post)
+            for _ in range(count))
+
+
+def lookups(model, lookup, samples):
+    uuids = list(model.objects.values_list('uuid', flat=True)
+                 .order_by('?')[:samples])
+    # include misses, they must not scan the table either
+    uuids += [uuid4() for _ in range(samples // 10)]
+    random.shuffle(uuids)
+    return [timed(lambda u: model.objects.filter(**{lookup: u}).first(), u)
+            for u in uuids]
+
+
+def query_plan(model, lookup):
+    from django.db import connection
+
+    sql, params = model.objects.filter(**{lookup: uuid4()}).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}' if connection.vendor == 'sqlite'
+                       else f'EXPLAIN {sql}', params)
+        return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+
+def run(sizes, samples):
+    from django.contrib.auth import get_user_model
+    from posts.models import Comment, Post
+
+    User = get_user_model()
+    author = User.objects.create_user(username='bench', password='bench')
+
+    report = []
+    for size in sorted(sizes):
+        grow(size, author)
+        for model in (Post, Comment, User):
+            timings = lookups(model, 'uuid', samples)
+            report.append({
+                'model': model.__name__,
+                'rows': model.objects.count(),
+                'p50_ms': round(percentile(timings, 50), 4),
+                'p99_ms': round(percentile(timings, 99), 4),
+                'plan': query_plan(model, 'uuid'),
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--samples', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        print(json.dumps(run(args.sizes, args.samples), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from . import models
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at']
+    list_filter = ['status', 'name']
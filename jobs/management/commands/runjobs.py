@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import get_config, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty')
+        parser.add_argument('--batch-size', type=int,
+                            help='Jobs claimed per batch')
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending(options['batch_size'])
+            if count:
+                self.stdout.write(f'Ran {count} jobs')
+            elif options['once']:
+                return
+            else:
+                time.sleep(get_config()['POLL_INTERVAL'])
@@ -0,0 +1,36 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work waiting in the queue. Jobs are deleted once
+    their handler succeeds, failed jobs are kept for inspection.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    name = models.CharField(max_length=100, null=False)
+    payload = models.TextField(default='{}', null=False)  # JSON
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=PENDING, null=False)
+    attempts = models.IntegerField(default=0, null=False)
+    run_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'<Job id={self.id} name={self.name} status={self.status}>'
@@ -0,0 +1,166 @@
+"""
+A small database backed job queue.
+
+Handlers are registered with the task decorator, usually in an apps tasks.py
+module, and receive a list of payloads so jobs of the same type are handled
+in batches:
+
+    @task('posts.fan_out')
+    def fan_out(payloads):
+        ...
+
+    enqueue('posts.fan_out', post_id=post.pk)
+
+Jobs are rows in the Job table written in the same transaction as the change
+that caused them, and are run by `python manage.py runjobs`. When a batch fails
+its jobs are run again one at a time, so only the jobs that fail are retried
+with exponential backoff until MAX_ATTEMPTS is reached.
+"""
+import json
+import logging
+from datetime import timedelta
+from itertools import groupby
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EAGER': False,
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 2,  # seconds before the first retry, doubled every attempt
+    'MAX_BACKOFF': 600,
+    'CLAIM_TIMEOUT': 300,  # requeue jobs claimed by a worker that died
+    'POLL_INTERVAL': 1,
+}
+
+registry = {}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'JOBS', {}))
+    return config
+
+
+def task(name):
+    """
+    Register a job handler under name.
+    """
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, **payload):
+    """
+    Queue a job. With JOBS['EAGER'] set the handler runs straight away instead.
+    """
+    if get_config()['EAGER']:
+        registry[name]([payload])
+        return None
+
+    return Job.objects.create(name=name, payload=json.dumps(payload))
+
+
+def enqueue_many(name, payloads):
+    """
+    Queue a job per payload with a single INSERT.
+    """
+    payloads = list(payloads)
+    if get_config()['EAGER']:
+        registry[name](payloads)
+        return []
+
+    return Job.objects.bulk_create(
+        Job(name=name, payload=json.dumps(payload)) for payload in payloads)
+
+
+def get_backoff(attempts):
+    config = get_config()
+    return min(config['BACKOFF'] * 2 ** (attempts - 1), config['MAX_BACKOFF'])
+
+
+def requeue_stale(now):
+    stale = now - timedelta(seconds=get_config()['CLAIM_TIMEOUT'])
+    return Job.objects.filter(status=Job.RUNNING, claimed_at__lt=stale).update(
+        status=Job.PENDING, claimed_by='', claimed_at=None)
+
+
+def claim(limit, now):
+    """
+    Mark up to limit due jobs as running and return them. The conditional
+    UPDATE makes sure two workers never claim the same job.
+    """
+    due = Job.objects.filter(status=Job.PENDING, run_at__lte=now).order_by(
+        'id').values_list('pk', flat=True)[:limit]
+    token = uuid4().hex
+    Job.objects.filter(pk__in=list(due), status=Job.PENDING).update(
+        status=Job.RUNNING, claimed_by=token, claimed_at=now)
+    return list(Job.objects.filter(claimed_by=token, status=Job.RUNNING)
+                .order_by('name', 'id'))
+
+
+def fail(jobs, error):
+    now = timezone.now()
+    max_attempts = get_config()['MAX_ATTEMPTS']
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = error
+        job.claimed_by = ''
+        job.claimed_at = None
+        if job.attempts >= max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.PENDING
+            job.run_at = now + timedelta(seconds=get_backoff(job.attempts))
+        job.save()
+
+
+def run_pending(limit=None):
+    """
+    Claim and run one batch of due jobs. Returns the number of jobs run.
+    """
+    now = timezone.now()
+    requeue_stale(now)
+    jobs = claim(limit or get_config()['BATCH_SIZE'], now)
+
+    for name, group in groupby(jobs, key=lambda job: job.name):
+        group = list(group)
+        handler = registry.get(name)
+        if handler is None:
+            fail(group, f'No handler registered for {name}')
+            continue
+
+        run(name, handler, group)
+
+    return len(jobs)
+
+
+def run(name, handler, jobs):
+    """
+    Run jobs of the same type in one call to their handler. If a batch of
+    several jobs fails they are run again one at a time, so a bad payload
+    doesn't use up the attempts of the jobs batched with it.
+    """
+    try:
+        with transaction.atomic():
+            handler([json.loads(job.payload) for job in jobs])
+    except Exception as e:
+        if len(jobs) > 1:
+            logger.warning('Batch of %d %s jobs failed, running them one at a '
+                           'time', len(jobs), name)
+            for job in jobs:
+                run(name, handler, [job])
+        else:
+            logger.exception('Job %s failed', name)
+            fail(jobs, repr(e))
+    else:
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
@@ -0,0 +1,137 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from datetime import timedelta
+from io import StringIO
+import json
+
+from .models import Job
+from .queue import enqueue, enqueue_many, run_pending, task
+
+calls = []
+
+
+@task('tests.record')
+def record(payloads):
+    calls.append(payloads)
+
+
+@task('tests.explode')
+def explode(payloads):
+    raise ValueError('boom')
+
+
+@task('tests.picky')
+def picky(payloads):
+    if any(payload.get('bad') for payload in payloads):
+        raise ValueError('bad payload')
+    calls.append(payloads)
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue(self):
+        job = enqueue('tests.record', value=1)
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertDictEqual(json.loads(job.payload), {'value': 1})
+        self.assertListEqual(calls, [])
+
+    def test_enqueue_many(self):
+        enqueue_many('tests.record', [{'value': i} for i in range(3)])
+        self.assertEqual(Job.objects.filter(name='tests.record').count(), 3)
+
+        self.assertEqual(run_pending(), 3)
+        self.assertListEqual(calls, [[{'value': 0}, {'value': 1}, {'value': 2}]])
+
+    def test_run_batches_same_type(self):
+        for i in range(3):
+            enqueue('tests.record', value=i)
+
+        self.assertEqual(run_pending(), 3)
+        self.assertListEqual(calls, [[{'value': 0}, {'value': 1}, {'value': 2}]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_batch_size(self):
+        for i in range(3):
+            enqueue('tests.record', value=i)
+
+        self.assertEqual(run_pending(limit=2), 2)
+        self.assertEqual(run_pending(limit=2), 1)
+        self.assertEqual(run_pending(limit=2), 0)
+        self.assertEqual(len(calls), 2)
+
+    def test_retry_with_backoff(self):
+        enqueue('tests.explode')
+        before = timezone.now()
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, before)
+
+        # not due yet
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreater(job.run_at - timezone.now(), timedelta(seconds=3))
+
+    def test_failed_batch_runs_jobs_one_at_a_time(self):
+        enqueue('tests.picky', value=0)
+        bad = enqueue('tests.picky', bad=True)
+        enqueue('tests.picky', value=2)
+
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(run_pending(), 3)
+        self.assertListEqual(calls, [[{'value': 0}], [{'value': 2}]])
+
+        job = Job.objects.get()
+        self.assertEqual(job.pk, bad.pk)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('bad payload', job.last_error)
+
+    @override_settings(JOBS={'MAX_ATTEMPTS': 2, 'BACKOFF': 0})
+    def test_max_attempts(self):
+        enqueue('tests.explode')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+            run_pending()
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(run_pending(), 0)
+
+    def test_unknown_handler(self):
+        Job.objects.create(name='tests.missing')
+        run_pending()
+        self.assertIn('No handler', Job.objects.get().last_error)
+
+    def test_requeue_stale_claims(self):
+        job = enqueue('tests.record', value=1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, claimed_by='dead',
+            claimed_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(run_pending(), 1)
+        self.assertListEqual(calls, [[{'value': 1}]])
+
+    @override_settings(JOBS={'EAGER': True})
+    def test_eager(self):
+        self.assertIsNone(enqueue('tests.record', value=1))
+        self.assertListEqual(calls, [[{'value': 1}]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_command(self):
+        enqueue('tests.record', value=1)
+        call_command('runjobs', once=True, stdout=StringIO())
+        self.assertListEqual(calls, [[{'value': 1}]])
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class MetricsConfig(AppConfig):
+    name = 'metrics'
+
+    def ready(self):
+        from .profiling import get_config, install_query_recorder
+
+        if get_config()['ENABLED']:
+            connection_created.connect(install_query_recorder)
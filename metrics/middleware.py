@@ -0,0 +1,50 @@
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from .profiling import Profile, current, get_config, record
+
+
+class ProfilingMiddleware:
+    """
+    Profiles every request, recording the result in the metrics histograms and
+    a Server-Timing header for staff users. Should be first in MIDDLEWARE so
+    the total covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.server_timing = config['SERVER_TIMING']
+
+    def __call__(self, request):
+        profile = Profile()
+        token = current.set(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        profile.durations['total'] = time.perf_counter() - start
+
+        match = request.resolver_match
+        record(match.view_name if match else '<unmatched>', profile)
+        # timings say too much about the backend to show everyone
+        user = getattr(request, 'user', None)
+        if self.server_timing and user is not None and user.is_staff:
+            response['Server-Timing'] = profile.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered straight after this hook
+        profile = current.get()
+        start = time.perf_counter()
+
+        def rendered(response):
+            profile.add('render', time.perf_counter() - start)
+
+        response.add_post_render_callback(rendered)
+        return response
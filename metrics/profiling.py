@@ -0,0 +1,229 @@
+"""
+Per request profiling.
+
+ProfilingMiddleware starts a Profile for every request and each phase of the
+request adds the time it took to it:
+
+    with timer('serialize'):
+        ...
+
+Database time and query counts are recorded by an execute wrapper installed on
+every connection, authentication time by the authentication classes in
+users/authentication.py, serializer time by serializers using
+TimedSerializerMixin and render time around the response being rendered.
+Phases can overlap: queries run while serializing count towards both db and
+serialize.
+
+Finished profiles are added to per view histograms, which are rendered in the
+Prometheus text format by the metrics endpoint. The histograms live in the
+process so every worker process reports its own.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from rest_framework import serializers
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,  # send the phases to staff users as a header
+    # upper bounds of the histogram buckets
+    'BUCKETS': (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+                2.5, 5),  # seconds
+    'QUERY_BUCKETS': (0, 1, 2, 3, 5, 10, 20, 50, 100),
+}
+
+PHASES = ('db', 'auth', 'serialize', 'render', 'total')
+
+current = ContextVar('profile', default=None)
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+class Profile:
+    """
+    Time spent in each phase of one request, in seconds.
+    """
+    __slots__ = ('durations', 'queries')
+
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    def server_timing(self):
+        metrics = []
+        for phase, seconds in self.durations.items():
+            metric = f'{phase};dur={seconds * 1000:.3f}'
+            if phase == 'db':
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timer(phase):
+    """
+    Add the time spent in the block to phase of the current request.
+    """
+    profile = current.get()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(phase, time.perf_counter() - start)
+
+
+def timed(phase):
+    """
+    Decorator version of timer.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimedAuthenticationMixin:
+    """
+    Adds the time spent authenticating to the auth phase.
+    """
+
+    def authenticate(self, request):
+        with timer('auth'):
+            return super().authenticate(request)
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent building .data to the serialize phase. Serializers
+    used with many=True should set Meta.list_serializer_class to
+    TimedListSerializer.
+    """
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Connection execute wrapper counting and timing queries.
+    """
+    profile = current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add('db', time.perf_counter() - start)
+        profile.queries += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver, wrappers outlive reconnects so only add once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+class Histogram:
+    """
+    A Prometheus histogram with a series per set of label values.
+    """
+
+    def __init__(self, name, description, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, values, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                # a count per bucket plus +Inf, and the sum
+                series = self.series[values] = [
+                    [0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}',
+                 f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((values, list(counts), total)
+                            for values, (counts, total) in self.series.items())
+
+        for values, counts, total in series:
+            labels = ','.join(f'{label}="{escape(value)}"'
+                              for label, value in zip(self.labels, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+durations = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling requests by view and phase.',
+    ('view', 'phase'), get_config()['BUCKETS'])
+queries = Histogram(
+    'http_request_queries',
+    'Database queries run per request by view.',
+    ('view',), get_config()['QUERY_BUCKETS'])
+
+
+def record(view, profile):
+    for phase, seconds in profile.durations.items():
+        durations.observe((view, phase), seconds)
+    queries.observe((view,), profile.queries)
+
+
+def render():
+    """
+    All the histograms in the Prometheus text format.
+    """
+    return '\n'.join(histogram.render()
+                     for histogram in (durations, queries)) + '\n'
@@ -0,0 +1,112 @@
+from rest_framework.test import APITestCase
+from rest_framework import status as s
+from django.test import TestCase
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from posts.models import Post
+from . import profiling
+from .profiling import Histogram
+
+User = get_user_model()
+
+
+class HistogramTest(TestCase):
+
+    def test_render_cumulative_buckets(self):
+        h = Histogram('test_seconds', 'Test.', ('view',), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            h.observe(('a',), value)
+
+        self.assertEqual(h.render(), '\n'.join([
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a",le="0.1"} 2',
+            'test_seconds_bucket{view="a",le="1"} 3',
+            'test_seconds_bucket{view="a",le="+Inf"} 4',
+            'test_seconds_sum{view="a"} 2.65',
+            'test_seconds_count{view="a"} 4',
+        ]))
+
+    def test_escape_labels(self):
+        h = Histogram('test_seconds', 'Test.', ('view',), (1,))
+        h.observe(('say "hi"\n',), 0)
+        self.assertIn(r'view="say \"hi\"\n"', h.render())
+
+
+class ProfilingMiddlewareTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='password')
+        cls.admin = User.objects.create_user(
+            username='admin', password='password', is_staff=True)
+        cls.post = Post.objects.create(text='post', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        profiling.durations.clear()
+        profiling.queries.clear()
+
+    def test_server_timing_header(self):
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(
+            reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+
+        timing = dict(metric.split(';', 1)
+                      for metric in res['Server-Timing'].split(', '))
+        self.assertListEqual(list(timing), list(profiling.PHASES))
+        # finding the post for its cache generation and loading it
+        self.assertIn('desc="2 queries"', timing['db'])
+        self.assertNotEqual(timing['serialize'], 'dur=0.000')
+
+    def test_server_timing_staff_only(self):
+        url = reverse('post_detail', kwargs={'uuid': self.post.uuid})
+        res = self.client.get(url)
+        self.assertNotIn('Server-Timing', res)
+
+        self.client.force_authenticate(self.user)
+        res = self.client.get(url)
+        self.assertNotIn('Server-Timing', res)
+
+    def test_times_auth(self):
+        res = self.client.post(reverse('token_login'), data={
+            'username': 'test', 'password': 'password'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {res.data["access"]}')
+        self.client.get(reverse('current_user_details'))
+
+        _, total = profiling.durations.series[('current_user_details', 'auth')]
+        self.assertGreater(total, 0)
+
+    def test_records_per_view(self):
+        self.client.get(reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.client.get(reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+
+        for phase in profiling.PHASES:
+            counts, _ = profiling.durations.series[('post_detail', phase)]
+            self.assertEqual(sum(counts), 2)
+        # the second request is served from the post cache
+        counts, total = profiling.queries.series[('post_detail',)]
+        self.assertEqual(total, 2)
+
+    def test_metrics_admin_only(self):
+        self.client.force_authenticate(self.user)
+        res = self.client.get(reverse('metrics'))
+        self.assertEqual(res.status_code, s.HTTP_403_FORBIDDEN)
+
+    def test_metrics(self):
+        self.client.get(reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(reverse('metrics'))
+
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="post_detail",phase="total"} 1', body)
+        self.assertIn('http_request_queries_sum{view="post_detail"} 2', body)
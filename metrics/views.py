@@ -0,0 +1,36 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import profiling
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # error responses
+            return str(data.get('detail', data))
+        return data
+
+
+class MetricsAPIView(APIView):
+    """
+    Request latency and query histograms per view in the Prometheus text
+    format. Only available to admin users.
+
+    EXAMPLE:
+        # HELP http_request_duration_seconds Time spent handling requests...
+        # TYPE http_request_duration_seconds histogram
+        http_request_duration_seconds_bucket{view="post_detail",phase="db",le="0.001"} 12
+        ...
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request, *args, **kwargs):
+        return Response(profiling.render())
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# the hot read endpoints are served on the event loop (see posts/asgi.py)
+from posts.asgi import ReadApplication  # noqa: E402 needs the app registry
+
+application = ReadApplication(django_application)
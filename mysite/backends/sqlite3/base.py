@@ -0,0 +1,55 @@
+"""
+SQLite backend tuned for serving concurrent requests.
+
+Every new connection runs the PRAGMAs of the SQLITE['PROFILE'] profile, with
+SQLITE['PRAGMAS'] overriding them. The production profile switches to WAL so
+readers never block the writer (or each other), only fsyncs at checkpoints
+with synchronous=NORMAL, maps the file into memory, grows the page cache and
+makes writers wait for the lock instead of failing with "database is locked".
+
+    DATABASES = {'default': {'ENGINE': 'mysite.backends.sqlite3', ...}}
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+PROFILES = {
+    # SQLite's own defaults
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,  # bytes
+        'cache_size': -64 * 1024,  # KiB when negative, so 64MB
+        'busy_timeout': 5000,  # milliseconds
+        'temp_store': 'MEMORY',
+    },
+}
+
+DEFAULTS = {
+    'PROFILE': 'default',
+    'PRAGMAS': {},
+    'SERIALIZE_WRITES': False,  # see mysite/writes.py
+    'WRITE_TIMEOUT': 5,  # seconds
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'SQLITE', {}))
+    return config
+
+
+def get_pragmas():
+    config = get_config()
+    pragmas = dict(PROFILES[config['PROFILE']])
+    pragmas.update(config['PRAGMAS'])
+    return pragmas
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in get_pragmas().items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
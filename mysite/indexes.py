@@ -0,0 +1,30 @@
+"""
+Index operations for hand-written migrations.
+"""
+from django.db import migrations
+
+
+def unique_index(table, column, name):
+    """
+    Build a unique index without rewriting the table. On PostgreSQL the index
+    is built concurrently so reads and writes continue while it builds, the
+    migration has to set atomic = False for that.
+    """
+
+    def concurrently(schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return 'CONCURRENTLY '
+        return ''
+
+    def forwards(apps, schema_editor):
+        quote = schema_editor.quote_name
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX {concurrently(schema_editor)}{quote(name)} '
+            f'ON {quote(table)} ({quote(column)})')
+
+    def backwards(apps, schema_editor):
+        quote = schema_editor.quote_name
+        schema_editor.execute(
+            f'DROP INDEX {concurrently(schema_editor)}{quote(name)}')
+
+    return migrations.RunPython(forwards, backwards)
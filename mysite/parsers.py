@@ -0,0 +1,32 @@
+"""
+JSON parsing with orjson when it is installed.
+
+Bodies orjson rejects are parsed again by DRF's JSONParser, which either
+accepts them (integers over 64 bits) or raises the same ParseError as before.
+"""
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+                body = body.decode(encoding).encode()
+            return orjson.loads(body)
+        except (ValueError, UnicodeError):  # includes orjson.JSONDecodeError
+            return super().parse(io.BytesIO(body), media_type, parser_context)
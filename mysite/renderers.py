@@ -0,0 +1,47 @@
+"""
+JSON rendering with orjson when it is installed.
+
+FastJSONRenderer produces the same bytes as DRF's JSONRenderer for the
+serializers in this project: orjson writes the same compact separators and
+unescaped unicode, datetimes are passed to DRF's encoder so they keep the "Z"
+suffix and U+2028/U+2029 are escaped the same way. Anything orjson can't do
+falls back to JSONRenderer: indented output (the browsable API), the
+UNICODE_JSON/COMPACT_JSON settings turned off and objects orjson fails to
+encode, such as integers over 64 bits.
+
+Floats in exponent notation are written as 1e16 rather than 1e+16, and NaN
+as null, no serializer here outputs either.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def __init__(self):
+        self.encoder = self.encoder_class()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or self.ensure_ascii or not self.compact or
+                self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default,
+                               option=OPTIONS)
+        except TypeError:  # includes orjson.JSONEncodeError
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same escaping as JSONRenderer, so the output is valid javascript
+        return (ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+                .replace(b'\xe2\x80\xa9', b'\\u2029'))
@@ -0,0 +1,116 @@
+"""
+Read replica routing.
+
+Writes always go to the default (primary) database. Reads go to a randomly
+picked alias from DATABASE_REPLICAS['ALIASES'] while a ReplicaMiddleware
+request with a safe method (GET, HEAD, OPTIONS) is being handled, so the list
+and detail GETs are served by the replicas. Everything else, including write
+requests, management commands and jobs, reads from the primary.
+
+Replicas lag behind the primary, so after a successful write the middleware
+sets a short lived cookie that keeps the clients reads on the primary for
+STICKY_SECONDS, letting users read their own writes. Anything built from reads
+and cached for every client has to be read inside primary(), or a lagging
+replica would cache the data from before the write for everyone.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULTS = {
+    'ALIASES': [],
+    'STICKY_SECONDS': 10,
+    'COOKIE': 'read_primary',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# whether reads in the current context may go to a replica
+use_replicas = ContextVar('use_replicas', default=False)
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'DATABASE_REPLICAS', {}))
+    return config
+
+
+def allows_replicas(request):
+    """
+    Whether the reads of a request may go to the replicas.
+    """
+    return (request.method in SAFE_METHODS and
+            get_config()['COOKIE'] not in request.COOKIES)
+
+
+@contextmanager
+def primary():
+    """
+    Read from the primary inside the block, for reads whose result is shared
+    with other clients, like the post cache, and must not be behind it.
+    """
+    token = use_replicas.set(False)
+    try:
+        yield
+    finally:
+        use_replicas.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Routes reads to the replicas when the current request allows it, see
+    ReplicaMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = get_config()['ALIASES']
+        # database caches, a late token revocation lets the token through
+        if model._meta.app_label == 'django_cache':
+            return None
+        if aliases and use_replicas.get():
+            return random.choice(aliases)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *get_config()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copied from the primary, never migrated themselves
+        if db in get_config()['ALIASES']:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Lets the reads of safe method requests go to the replicas, unless the
+    client sends the cookie set after its last write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        safe = request.method in SAFE_METHODS
+        token = use_replicas.set(allows_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+
+        if not safe and config['ALIASES'] and response.status_code < 400:
+            response.set_cookie(config['COOKIE'], '1',
+                                max_age=config['STICKY_SECONDS'],
+                                httponly=True, samesite='Lax')
+        return response
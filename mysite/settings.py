@@ -45,9 +45,14 @@ INSTALLED_APPS = [
 
     'users',
     'posts',
+    'jobs',
+    'metrics',
+    'search',
 ]
 
 MIDDLEWARE = [
+    'metrics.middleware.ProfilingMiddleware',
+    'mysite.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,11 +88,97 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'mysite.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # seconds to keep connections open between requests, 0 closes them
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 0)),
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICAS=/data/replica1.sqlite3,... adds the
+# aliases replica1, ... Tests read them from the default test database.
+for i, name in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{i}'] = {
+        **DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'}}
+
+# SQLite tuning applied to every new connection (see mysite/backends/sqlite3)
+SQLITE = {
+    # 'production' runs WAL with tuned pragmas, 'default' keeps SQLite's own
+    'PROFILE': os.environ.get('SQLITE_PROFILE', 'production'),
+    'PRAGMAS': {},  # override single pragmas of the profile
+    # pins and comments wait for a per process lock (see mysite/writes.py)
+    'SERIALIZE_WRITES': True,
+    'WRITE_TIMEOUT': 5,  # seconds before giving up with a 503
+}
+
+# GET requests read from the replicas (see mysite/routers.py)
+DATABASE_ROUTERS = ['mysite.routers.ReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    # clients read from the primary for this long after writing
+    'STICKY_SECONDS': 10,
+    'COOKIE': 'read_primary',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Use a shared backend (memcached, redis) in production so every worker sees
+# the same cached posts and pin buffer.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    # revoked tokens (see users/authentication.py), must be shared by every
+    # process and never evict live entries. A table created by the migrations
+    # by default, which costs one query per authenticated request; point it at
+    # for example redis without eviction to save that query
+    'revocations': {
+        'BACKEND': os.environ.get(
+            'REVOCATION_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get(
+            'REVOCATION_CACHE_LOCATION', 'jwt_revocations'),
+        'OPTIONS': {
+            # culling drops expired entries first, keep this well above the
+            # revocations made within a refresh tokens lifetime
+            'MAX_ENTRIES': 1000000,
+        },
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.0/topics/auth/passwords/
+# New passwords use the first hasher, passwords stored with the others are
+# rehashed with it when the user next logs in.
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',  # needs argon2-cffi
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'users.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHER = {
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+}.get(os.environ.get('PASSWORD_HASHER'))
+if PASSWORD_HASHER:
+    PASSWORD_HASHERS.remove(PASSWORD_HASHER)
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHER)
+
+# Hash passwords in a pool of worker processes (see users/hashing.py)
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('HASH_WORKERS', 0)),  # 0 hashes inline
+    'MAX_PENDING': 64,  # requests get a 503 while this many are waiting
+    'TIMEOUT': 10,  # seconds
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -135,15 +226,27 @@ LOGIN_REDIRECT_URL = '/'
 # Rest Config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        # builds request.user from the token claims (see users/authentication.py)
+        'users.authentication.StatelessJWTAuthentication',
+        # DRF's, timed by the metrics profiling
+        'users.authentication.SessionAuthentication',
+        'users.authentication.BasicAuthentication',
+    ],
+    # use orjson when it is installed (see mysite/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'mysite.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'mysite.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 if not DEBUG:
     # remove browsable API when not in debug
     REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
-        'rest_framework.renderers.JSONRenderer'
+        'mysite.renderers.FastJSONRenderer'
     ]
 
 
@@ -153,9 +256,93 @@ SIMPLE_JWT = {
 }
 
 
+# Async read endpoints under ASGI (see posts/asgi.py)
+ASYNC_READS = {
+    'ENABLED': os.environ.get('ASYNC_READS', 'on') == 'on',
+    'DB_THREADS': 16,  # threads loading rows for the event loop
+}
+
+# Read-through cache of post payloads (see posts/cache.py)
+POST_CACHE = {
+    'TIMEOUT': 60,  # seconds
+    'GENERATION_TIMEOUT': 60 * 60,  # seconds, at least TIMEOUT
+    'LOCK_TIMEOUT': 5,  # how long readers wait for another request to fill it
+}
+
+
+# Write-behind pin counts (see posts/pins.py). Needs a shared CACHES backend,
+# with the default local memory cache the buffer is per process and is lost
+# when the process crashes.
+PIN_BUFFER = {
+    'ENABLED': os.environ.get('PIN_BUFFER') == 'on',
+    'FLUSH_INTERVAL': 5,  # seconds between flushes
+    'MAX_PENDING': 1000,  # flush early once this many pins are buffered
+}
+
+
+# Background job queue (see jobs/queue.py), run with `manage.py runjobs`
+JOBS = {
+    'EAGER': os.environ.get('JOBS_EAGER') == 'on',  # run jobs inline
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 2,  # seconds, doubled after every failed attempt
+}
+
+
+# Batch endpoints (see posts/bulk.py)
+BULK = {
+    'MAX_BATCH_SIZE': 500,  # items created per request
+    'MAX_READ_SIZE': 100,  # posts fetched per request
+}
+
+
+# Full text search (see search/backends.py), rebuild the index with
+# `manage.py rebuild_search_index`
+SEARCH = {
+    'BACKEND': None,  # FTS5 on SQLite, the generic inverted index otherwise
+    'BATCH_SIZE': 1000,  # documents indexed at once when rebuilding
+}
+
+
+# Home timelines (see posts/timeline.py)
+TIMELINE = {
+    # authors with this many followers are merged in when timelines are read
+    # instead of being written to every followers timeline
+    'CELEBRITY_FOLLOWERS': 10000,
+    'BATCH_SIZE': 1000,  # timeline entries per INSERT
+    'BACKFILL': 50,  # posts added to a timeline when following a user
+}
+
+
+# Trending feed (see posts/trending.py), refresh with
+# `manage.py refresh_trending`
+TRENDING = {
+    'WINDOW_HOURS': 48,  # only posts this new can trend
+    'GRAVITY': 1.8,  # how fast scores decay with age
+    'COMMENT_WEIGHT': 2,  # a comment counts as this many pins
+}
+
+
+# Hashtags and mentions (see posts/tags.py)
+TAGS = {
+    'TRENDING_HOURS': 24,  # trending tags count the posts this new
+    'TRENDING_LIMIT': 20,  # tags listed at /posts/trending/tags/
+    'BATCH_SIZE': 1000,  # rows per INSERT and posts per backfill batch
+}
+
+
+# Per request profiling (see metrics/profiling.py), histograms are served to
+# admins at /metrics/ in the Prometheus text format
+METRICS = {
+    'ENABLED': os.environ.get('METRICS') != 'off',
+    # send phase timings to staff users in a Server-Timing header
+    'SERVER_TIMING': True,
+}
+
+
 # NOSE config
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
 NOSE_ARGS = [
     '--with-coverage',
-    '--cover-package=users,posts'
+    '--cover-package=users,posts,jobs,metrics,search'
 ]
@@ -0,0 +1,285 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from collections import OrderedDict
+from decimal import Decimal
+from io import BytesIO
+import os
+import tempfile
+import threading
+from unittest import mock, skipIf
+from uuid import uuid4
+
+from posts.models import Comment, Post
+from posts.serializers import CommentSerializer, PostSerializer
+from . import parsers, renderers
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .backends.sqlite3.base import DatabaseWrapper
+from .routers import ReplicaRouter
+from .writes import WriteBusy, serialized
+
+User = get_user_model()
+
+
+@skipIf(renderers.orjson is None, 'orjson is not installed')
+class FastJSONRendererTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='tést', password='password')
+        texts = ['plain', 'ünïcode ✓ 🎉', 'quotes " and \\ slashes',
+                 'line\u2028separators\u2029', 'control \x00\x1f\t\n']
+        for text in texts:
+            post = Post.objects.create(text=text, author=user)
+            Comment.objects.create(text=text, author=user, post=post)
+
+    def assertSameBytes(self, data, **kwargs):
+        self.assertEqual(FastJSONRenderer().render(data, **kwargs),
+                         JSONRenderer().render(data, **kwargs))
+
+    def test_post_serializer(self):
+        data = PostSerializer(Post.objects.with_summary(), many=True).data
+        self.assertSameBytes(data)
+        self.assertSameBytes(OrderedDict([('next', None), ('results', data)]))
+
+    def test_comment_serializer(self):
+        comments = Comment.objects.select_related('author', 'post')
+        self.assertSameBytes(CommentSerializer(comments, many=True).data)
+
+    def test_python_types(self):
+        self.assertSameBytes({
+            'datetime': timezone.now(),
+            'date': timezone.now().date(),
+            'uuid': uuid4(),
+            'decimal': Decimal('1.10'),
+            'tuple': (1, 2),
+            1: 'int key',
+            'none': None,
+        })
+
+    def test_falls_back(self):
+        self.assertSameBytes({'big': 2 ** 70})
+        self.assertSameBytes({'a': [1]}, accepted_media_type='application/json; indent=4')
+        self.assertSameBytes(None)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameBytes({'a': 1})
+
+
+class FastJSONParserTest(TestCase):
+
+    def parse(self, body, parser=FastJSONParser):
+        return parser().parse(BytesIO(body))
+
+    def test_parse(self):
+        body = '{"text": "ünïcode", "n": [1, 2.5, null, true]}'.encode()
+        self.assertEqual(self.parse(body), self.parse(body, JSONParser))
+
+    def test_falls_back(self):
+        self.assertEqual(self.parse(b'{"big": 1180591620717411303424}'),
+                         {'big': 2 ** 70})
+        with mock.patch.object(parsers, 'orjson', None):
+            self.assertEqual(self.parse(b'[1]'), [1])
+
+    def test_errors(self):
+        for body in (b'{"text": ', b'{"n": NaN}', b'\xff'):
+            with self.assertRaises(ParseError):
+                self.parse(body)
+
+
+@override_settings(DATABASE_REPLICAS={'ALIASES': ['replica']})
+class ReplicaRouterTest(APITestCase):
+    """
+    Runs against a second SQLite file standing in for a replica, with rows
+    the primary doesn't have so it's clear which database a read went to.
+    """
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.replica_name = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        connections.databases['replica'] = {
+            **connections.databases['default'], 'NAME': cls.replica_name}
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Post)
+        call_command('createcachetable', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        delattr(connections._connections, 'replica')
+        del connections.databases['replica']
+        os.remove(cls.replica_name)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='pw')
+        replica_user = User.objects.db_manager('replica').create_user(
+            username='test', password='pw')
+        Post.objects.using('replica').create(text='replica',
+                                             author=replica_user)
+
+    def setUp(self):
+        self.url = reverse('recent_posts')
+
+    def texts(self):
+        return [p['text'] for p in self.client.get(self.url).data['results']]
+
+    def test_reads_from_replica(self):
+        Post.objects.create(text='primary', author=self.user)
+        self.assertListEqual(self.texts(), ['replica'])
+
+    def test_sticky_after_write(self):
+        self.client.force_authenticate(self.user)
+        res = self.client.post(reverse('post_list_create'),
+                               data={'text': 'written'})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.cookies['read_primary']['max-age'], 10)
+
+        # the client reads its own write until the cookie expires
+        self.assertListEqual(self.texts(), ['written'])
+        del self.client.cookies['read_primary']
+        self.assertListEqual(self.texts(), ['replica'])
+
+    def test_failed_write_not_sticky(self):
+        self.client.force_authenticate(self.user)
+        res = self.client.post(reverse('post_list_create'), data={})
+        self.assertEqual(res.status_code, 400)
+        self.assertNotIn('read_primary', res.cookies)
+
+    def test_cache_built_from_primary(self):
+        cache.clear()
+        post = Post.objects.create(text='post', author=self.user)
+        Post.objects.using('replica').create(
+            uuid=post.uuid, text='post',
+            author=User.objects.using('replica').get())
+        url = reverse('post_detail', kwargs={'uuid': post.uuid})
+
+        self.client.force_authenticate(self.user)
+        res = self.client.post(
+            reverse('comment_list_create', kwargs={'uuid': post.uuid}),
+            data={'text': 'comment'})
+        self.assertEqual(res.status_code, 201)
+
+        # another client fills the cache while the replica lags
+        other = self.client_class()
+        res = other.get(url)
+        self.assertEqual(res.data['comments'], 1)
+        self.assertEqual(self.client.get(url).data['comments'], 1)
+
+    def test_revocations_from_primary(self):
+        access = str(AccessToken.for_user(self.user))
+        self.client.post(reverse('logout'),
+                         HTTP_AUTHORIZATION=f'Bearer {access}')
+        del self.client.cookies['read_primary']
+        # the replica has a revocations table too, without the revocation
+        res = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(res.status_code, 401)
+
+    def test_outside_requests(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(router.allow_migrate('default', 'posts'))
+        self.assertListEqual(
+            list(Post.objects.values_list('text', flat=True)), [])
+
+
+class SQLiteProfileTest(TestCase):
+
+    def setUp(self):
+        fd, self.name = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, self.name)
+
+    def pragmas(self, *names):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.name}, alias='profile')
+        try:
+            with wrapper.cursor() as cursor:
+                values = {}
+                for name in names:
+                    cursor.execute(f'PRAGMA {name}')
+                    values[name] = cursor.fetchone()[0]
+                return values
+        finally:
+            wrapper.close()
+
+    @override_settings(SQLITE={'PROFILE': 'production',
+                               'PRAGMAS': {'cache_size': -1024}})
+    def test_production(self):
+        self.assertDictEqual(
+            self.pragmas('journal_mode', 'synchronous', 'mmap_size',
+                         'cache_size', 'busy_timeout'),
+            {'journal_mode': 'wal', 'synchronous': 1,
+             'mmap_size': 256 * 1024 * 1024, 'cache_size': -1024,
+             'busy_timeout': 5000})
+
+    @override_settings(SQLITE={'PROFILE': 'default'})
+    def test_default(self):
+        self.assertDictEqual(self.pragmas('journal_mode', 'synchronous'),
+                             {'journal_mode': 'delete', 'synchronous': 2})
+
+
+@override_settings(SQLITE={'SERIALIZE_WRITES': True, 'WRITE_TIMEOUT': 0.05})
+class SerializedWritesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='pw')
+        cls.post = Post.objects.create(text='post', author=cls.user)
+
+    def hold_lock(self):
+        """
+        Hold the write lock in another thread until the test ends.
+        """
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with serialized():
+                held.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    def test_reentrant(self):
+        with serialized():
+            with serialized():
+                pass
+
+    def test_busy(self):
+        self.hold_lock()
+        with self.assertRaises(WriteBusy):
+            with serialized():
+                pass
+
+        self.client.force_authenticate(self.user)
+        res = self.client.put(reverse('pin_post',
+                                      kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 0)
+
+    @override_settings(SQLITE={'SERIALIZE_WRITES': False})
+    def test_disabled(self):
+        self.hold_lock()
+        with serialized():
+            pass
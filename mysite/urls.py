@@ -20,6 +20,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('users.urls')),
     path('posts/', include('posts.urls')),
+    path('metrics/', include('metrics.urls')),
+    path('search/', include('search.urls')),
 ]
 
 handler500 = 'rest_framework.exceptions.server_error'
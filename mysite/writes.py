@@ -0,0 +1,52 @@
+"""
+Serialized writes.
+
+SQLite lets one connection write at a time. When several request threads try
+at once the losers spin in the busy handler, and a transaction that read
+before writing can fail straight away with "database is locked". The hot
+write views run their transactions inside serialized() so writes from the
+same process queue up on a lock instead, and only contend with other
+processes in SQLite.
+
+Requests that wait longer than SQLITE['WRITE_TIMEOUT'] fail with a 503. With
+SQLITE['SERIALIZE_WRITES'] off, or on other databases, serialized() does
+nothing.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .backends.sqlite3.base import get_config
+
+# reentrant so serialized writes can nest
+lock = threading.RLock()
+
+
+class WriteBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many writes, try again shortly.')
+    default_code = 'write_busy'
+    wait = 1  # sent as Retry-After
+
+
+@contextmanager
+def serialized(using=DEFAULT_DB_ALIAS):
+    """
+    Hold the process wide write lock for the block, which should contain the
+    whole transaction.
+    """
+    config = get_config()
+    if not config['SERIALIZE_WRITES'] or connections[using].vendor != 'sqlite':
+        yield
+        return
+
+    if not lock.acquire(timeout=config['WRITE_TIMEOUT']):
+        raise WriteBusy()
+    try:
+        yield
+    finally:
+        lock.release()
@@ -0,0 +1,361 @@
+"""
+Async read endpoints.
+
+Under ASGI Django 3.0 runs every request through its sync handler in one
+shared thread, so requests queue behind each other no matter how many
+connections are open. ReadApplication wraps the Django ASGI application and
+answers the GETs of the hot read endpoints itself, on the event loop:
+
+    /posts/recent/, /posts/user/<uuid>/, /posts/<uuid>/ and
+    /posts/<uuid>/comments/
+
+Routing, conditional GET and rendering stay on the loop. Loading the rows and
+serializing them (which reads the cache, see posts/cache.py and the pin
+buffer) runs in a pool of ASYNC_READS['DB_THREADS'] threads through db(),
+since the ORM has no async API in this version of Django. Responses are the
+same as the sync views', which still serve writes, the browsable API and
+every other endpoint. That includes errors: API exceptions get their status
+and unexpected ones are logged to django.request and answered with DRF's 500.
+
+The request checks and response headers of the security, common and
+clickjacking middleware in settings.MIDDLEWARE still apply: requests they
+would turn away or redirect, like ones with a host not in ALLOWED_HOSTS, are
+passed on to Django to answer. Requests served here are profiled like
+metrics.middleware does.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.urls import Resolver404, resolve
+from django.utils.http import http_date, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from metrics import profiling
+from mysite.routers import allows_replicas, use_replicas
+from . import cache
+from .conditional import (
+    get_not_modified,
+    get_post_validators,
+    is_conditional,
+    page_validators,
+    post_validators
+)
+from .models import Comment, Post
+from .pagination import KeysetPagination
+from .serializers import (
+    CommentValuesSerializer,
+    PostSerializer,
+    PostValuesSerializer
+)
+
+request_logger = logging.getLogger('django.request')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DB_THREADS': 16,
+}
+
+# middleware run around the requests served here too, when installed
+MIDDLEWARE = (
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+executor = None
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'ASYNC_READS', {}))
+    return config
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(get_config()['DB_THREADS'],
+                                      thread_name_prefix='async-reads')
+    return executor
+
+
+def run(func):
+    # what the request_started and request_finished signals do for views
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def db(func, *args, **kwargs):
+    """
+    Call func in the database thread pool, in the current context so the
+    database router sees it.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), context.run, run, partial(func, *args, **kwargs))
+
+
+def post_page(request, queryset):
+    """
+    Return a page of posts and its validators, like the views using
+    PostPageMixin.
+    """
+    paginator = KeysetPagination()
+    page = paginator.page(list(paginator.get_page_queryset(
+        PostValuesSerializer.values(queryset), request)))
+    validators = page_validators(
+        [(row['id'], row['date_modified'], row['pins']) for row in page],
+        paginator.has_next)
+    data = paginator.get_paginated_response(
+        PostValuesSerializer(page, many=True).data).data
+    return data, validators
+
+
+def recent_posts(request):
+    return post_page(request, Post.objects.with_summary())
+
+
+def user_posts(request, uuid):
+    return post_page(request, Post.objects.with_summary().filter(
+        author__uuid=uuid))
+
+
+def post_detail(request, uuid):
+    """
+    Same as PostDetailAPIView.retrieve.
+    """
+    def compute():
+        post = get_object_or_404(Post.objects.with_summary(), uuid=uuid)
+        data = PostSerializer(post).data
+        cache.set_value(uuid, 'validators:pins', post_validators(
+            post.pk, post.date_modified, data['pins']))
+        return data
+
+    data = cache.get_or_set(uuid, 'detail', compute)
+    return data, get_post_validators(uuid, 'pins')
+
+
+def comments(request, uuid):
+    """
+    Same as CommentListCreateAPIView.list.
+    """
+    validators = None
+
+    def compute():
+        nonlocal validators
+        paginator = KeysetPagination()
+        page = paginator.page(list(paginator.get_page_queryset(
+            CommentValuesSerializer.values(
+                Comment.objects.filter(post__uuid=uuid)), request)))
+        if page:
+            row = page[0]
+            validators = post_validators(
+                row['post_id'], row['post__date_modified'],
+                row['post__comment_count'])
+            cache.set_value(uuid, 'validators:comment_count', validators)
+        return paginator.get_paginated_response(
+            CommentValuesSerializer(page, many=True).data).data
+
+    data = cache.get_or_set(uuid, f'comments:{cache.url_key(request)}',
+                            compute)
+    return data, validators or get_post_validators(uuid, 'comment_count')
+
+
+def post_detail_validators(request, uuid):
+    return get_post_validators(uuid, 'pins')
+
+
+def comments_validators(request, uuid):
+    return get_post_validators(uuid, 'comment_count')
+
+
+# url name -> (loader, loader of the validators for conditional requests)
+HANDLERS = {
+    'recent_posts': (recent_posts, None),
+    'get_user_posts': (user_posts, None),
+    'post_detail': (post_detail, post_detail_validators),
+    'comment_list_create': (comments, comments_validators),
+}
+
+
+@lru_cache(maxsize=None)
+def get_allow(view_class):
+    """
+    The Allow header the sync view sends.
+    """
+    view = view_class()
+    if hasattr(view, 'get') and not hasattr(view, 'head'):
+        view.head = view.get  # as View.setup() does for each request
+    return ', '.join(view.allowed_methods)
+
+
+def accepts_json(request):
+    """
+    Leave the browsable API and any other format to DRF.
+    """
+    accept = request.META.get('HTTP_ACCEPT', '*/*')
+    return (api_settings.URL_FORMAT_OVERRIDE not in request.GET and
+            'text/html' not in accept and
+            ('*/*' in accept or 'application/json' in accept))
+
+
+class ReadApplication:
+    """
+    ASGI application serving the hot read endpoints natively and everything
+    else with the wrapped Django application.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        self.middleware = [import_string(path)() for path in settings.MIDDLEWARE
+                           if path in MIDDLEWARE]
+
+    async def __call__(self, scope, receive, send):
+        match = None
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            match = self.get_match(scope)
+        if match is None:
+            return await self.application(scope, receive, send)
+
+        request = ASGIRequest(scope, BytesIO())
+        if not accepts_json(request) or not self.passes_middleware(request):
+            return await self.application(scope, receive, send)
+
+        profile = None
+        if profiling.get_config()['ENABLED']:
+            profile = profiling.Profile()
+        profile_token = profiling.current.set(profile)
+        replicas_token = use_replicas.set(allows_replicas(request))
+        start = time.perf_counter()
+        try:
+            load, load_validators = HANDLERS[match.url_name]
+            status, data, validators = await self.handle(
+                request, load, load_validators, match.kwargs)
+            response = self.get_response(request, match, status, data,
+                                         validators)
+        finally:
+            use_replicas.reset(replicas_token)
+            profiling.current.reset(profile_token)
+        if profile is not None:
+            profile.durations['total'] = time.perf_counter() - start
+            profiling.record(match.view_name, profile)
+        await self.send_response(request, send, response)
+
+    def get_match(self, scope):
+        if not get_config()['ENABLED']:
+            return None
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return None
+        if match.url_name not in HANDLERS:
+            return None
+        return match
+
+    def passes_middleware(self, request):
+        """
+        Whether the request gets past the request checks of the middleware
+        without being turned away or redirected.
+        """
+        try:
+            request.get_host()
+            return all(middleware.process_request(request) is None
+                       for middleware in self.middleware
+                       if hasattr(middleware, 'process_request'))
+        except (SuspiciousOperation, PermissionDenied):
+            return False
+
+    async def handle(self, request, load, load_validators, kwargs):
+        """
+        Return the status, data and validators of the response.
+        """
+        drf_request = Request(request)
+        try:
+            if load_validators and is_conditional(request):
+                validators = await db(load_validators, drf_request, **kwargs)
+                if get_not_modified(request, *validators) is not None:
+                    return 304, None, validators
+
+            data, validators = await db(load, drf_request, **kwargs)
+        except Exception as exc:
+            status, data = self.handle_exception(request, exc)
+            return status, data, (None, None)
+
+        if get_not_modified(request, *validators) is not None:
+            return 304, None, validators
+        return 200, data, validators
+
+    def handle_exception(self, request, exc):
+        """
+        Return the status and data of the error response the sync views would
+        send, logging unexpected errors like Django does.
+        """
+        if isinstance(exc, Http404):
+            exc = NotFound()
+        elif isinstance(exc, PermissionDenied):
+            exc = exceptions.PermissionDenied()
+        if isinstance(exc, APIException):
+            if isinstance(exc.detail, (list, dict)):
+                return exc.status_code, exc.detail
+            return exc.status_code, {'detail': exc.detail}
+        if isinstance(exc, SuspiciousOperation):
+            return 400, None
+
+        signals.got_request_exception.send(sender=None, request=request)
+        request_logger.error(
+            'Internal Server Error: %s', request.path, exc_info=exc,
+            extra={'status_code': 500, 'request': request})
+        # as rest_framework.exceptions.server_error
+        return 500, {'error': 'Server Error (500)'}
+
+    def get_response(self, request, match, status, data, validators):
+        if status == 304:
+            response = HttpResponseNotModified()
+        else:
+            body = b''
+            if data is not None:
+                with profiling.timer('render'):
+                    body = self.renderer.render(data)
+            response = HttpResponse(body, status=status,
+                                    content_type=self.renderer.media_type)
+            response['Content-Length'] = str(len(body))
+        response['Vary'] = 'Accept'
+        response['Allow'] = get_allow(match.func.cls)
+        etag, last_modified = validators
+        if status in (200, 304) and etag is not None:
+            response['ETag'] = quote_etag(etag)
+        if status in (200, 304) and last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+
+        for middleware in reversed(self.middleware):
+            response = middleware.process_response(request, response)
+        return response
+
+    async def send_response(self, request, send, response):
+        await send({'type': 'http.response.start',
+                    'status': response.status_code,
+                    'headers': [(name.encode('ascii'), value.encode('latin1'))
+                                for name, value in response.items()]})
+        await send({'type': 'http.response.body',
+                    'body': b'' if request.method == 'HEAD' else
+                    response.content})
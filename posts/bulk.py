@@ -0,0 +1,127 @@
+"""
+Creating and reading many objects in one request.
+
+Views using BulkCreateMixin accept a JSON list, validate every item with a
+many=True serializer and pass the valid ones to perform_bulk_create, which
+inserts them with bulk_create in one transaction. The response has a result
+per item in the order they were sent:
+
+    {"results": [{"status": 201, "data": {...}},
+                 {"status": 400, "errors": {"text": [...]}}]}
+
+The response status is 201 when every item was created, 400 when none were
+and 207 when some were.
+
+get_uuids reads a comma separated list of UUIDs to fetch from the query
+string.
+"""
+from uuid import UUID
+
+from django.conf import settings
+from rest_framework import status as s
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'MAX_BATCH_SIZE': 500,
+    'MAX_READ_SIZE': 100,
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'BULK', {}))
+    return config
+
+
+def set_pks(model, objects):
+    """
+    Fill in primary keys after bulk_create on backends that don't return them,
+    using the UUIDs generated when the objects were built.
+    """
+    if all(obj.pk is not None for obj in objects):
+        return
+
+    pks = dict(model.objects.filter(
+        uuid__in=[obj.uuid for obj in objects]).values_list('uuid', 'pk'))
+    for obj in objects:
+        obj.pk = pks[obj.uuid]
+
+
+def get_uuids(request, param='uuids'):
+    """
+    Return the distinct UUIDs in a comma separated query parameter, in the
+    order they were given.
+    """
+    values = [value.strip()
+              for value in request.query_params.get(param, '').split(',')]
+    values = list(dict.fromkeys(value for value in values if value))
+    if not values:
+        raise ValidationError({param: 'A comma separated list of UUIDs is '
+                                      'required.'})
+
+    max_read_size = get_config()['MAX_READ_SIZE']
+    if len(values) > max_read_size:
+        raise ValidationError({param: (
+            f'At most {max_read_size} items can be fetched at once.')})
+
+    uuids = []
+    for value in values:
+        try:
+            uuids.append(UUID(value))
+        except ValueError:
+            raise ValidationError({param: f'"{value}" is not a valid UUID.'})
+    return list(dict.fromkeys(uuids))
+
+
+class BulkCreateMixin:
+    """
+    Create a list of objects. Subclasses implement perform_bulk_create to save
+    the validated serializer and return the created objects.
+    """
+
+    def bulk_create(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'detail': 'Expected a list of items.'})
+
+        max_batch_size = get_config()['MAX_BATCH_SIZE']
+        if len(items) > max_batch_size:
+            raise ValidationError({'detail': (
+                f'At most {max_batch_size} items can be created at once.')})
+
+        serializer = self.get_serializer(data=items, many=True)
+        if serializer.is_valid():
+            errors = [{}] * len(items)
+        else:
+            # validate again without the invalid items, they can't be told
+            # apart once the list serializer has failed
+            errors = serializer.errors
+            valid = [item for item, error in zip(items, errors) if not error]
+            serializer = self.get_serializer(data=valid, many=True)
+            serializer.is_valid(raise_exception=True)
+
+        created = (self.perform_bulk_create(serializer)
+                   if serializer.validated_data else [])
+        created = iter(self.get_serializer(created, many=True).data)
+        results = []
+        for error in errors:
+            if error:
+                results.append({'status': s.HTTP_400_BAD_REQUEST,
+                                'errors': error})
+            else:
+                results.append({'status': s.HTTP_201_CREATED,
+                                'data': next(created)})
+
+        failed = sum(bool(error) for error in errors)
+        if not failed:
+            status = s.HTTP_201_CREATED
+        elif failed == len(errors):
+            status = s.HTTP_400_BAD_REQUEST
+        else:
+            status = s.HTTP_207_MULTI_STATUS
+        return Response({'results': results}, status=status)
+
+    def perform_bulk_create(self, serializer):
+        raise NotImplementedError(
+            'subclasses of BulkCreateMixin must provide perform_bulk_create()')
@@ -0,0 +1,148 @@
+"""
+Read-through cache of serialized post payloads.
+
+Entries are keyed by post UUID and a per post generation token. Invalidating a
+post replaces its generation, which orphans every payload cached for it (the
+post detail and every page of its comments) in one cache write. Orphaned
+entries expire after TIMEOUT seconds. Generations expire after
+GENERATION_TIMEOUT seconds (at least TIMEOUT). A missing generation is only
+created once a query finds the post, so reads of posts that don't exist cache
+nothing, and deleting a post drops its generation.
+
+Entries are always built from the primary database, an entry built from a
+lagging replica after the post was invalidated would serve the post from
+before the write until it expires, even to the client that wrote it.
+
+Only one request rebuilds a missing entry at a time. Others wait up to
+LOCK_TIMEOUT seconds for it to appear before computing it themselves, so a
+popular post being invalidated doesn't stampede the database.
+"""
+import hashlib
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from mysite.routers import primary
+from .models import Post
+
+DEFAULTS = {
+    'TIMEOUT': 60,
+    'GENERATION_TIMEOUT': 60 * 60,
+    'LOCK_TIMEOUT': 5,
+    'LOCK_POLL_INTERVAL': 0.02,
+    'KEY_PREFIX': 'post',
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'POST_CACHE', {}))
+    return config
+
+
+def generation_key(post_uuid):
+    return f'{get_config()["KEY_PREFIX"]}:{post_uuid}:gen'
+
+
+def get_generation_timeout():
+    config = get_config()
+    return max(config['GENERATION_TIMEOUT'], config['TIMEOUT'])
+
+
+def get_generation(post_uuid):
+    """
+    Return the current generation of a post, or None if the post doesn't
+    exist.
+    """
+    key = generation_key(post_uuid)
+    generation = cache.get(key)
+    if generation is None:
+        with primary():
+            if not Post.objects.filter(uuid=post_uuid).exists():
+                return None
+        cache.add(key, uuid4().hex, timeout=get_generation_timeout())
+        generation = cache.get(key)
+    return generation
+
+
+def make_key(post_uuid, name):
+    """
+    Return the key of the payload called name for a post, or None if the post
+    doesn't exist.
+    """
+    generation = get_generation(post_uuid)
+    if generation is None:
+        return None
+    return f'{get_config()["KEY_PREFIX"]}:{post_uuid}:{generation}:{name}'
+
+
+def url_key(request):
+    """
+    Name a cache entry after the full request URL.
+    """
+    url = request.build_absolute_uri().encode('utf-8')
+    return hashlib.md5(url).hexdigest()
+
+
+def get_or_set(post_uuid, name, compute):
+    """
+    Return the cached payload called name for a post, calling compute to build
+    it when it is missing.
+    """
+    config = get_config()
+    key = make_key(post_uuid, name)
+    if key is None:
+        with primary():
+            return compute()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=config['LOCK_TIMEOUT']):
+        try:
+            with primary():
+                value = compute()
+            cache.set(key, value, timeout=config['TIMEOUT'])
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # another request is building the entry, wait for it
+    deadline = time.monotonic() + config['LOCK_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(config['LOCK_POLL_INTERVAL'])
+        value = cache.get(key)
+        if value is not None:
+            return value
+    with primary():
+        return compute()
+
+
+def set_value(post_uuid, name, value):
+    """
+    Cache a payload called name for a post that was built anyway.
+    """
+    key = make_key(post_uuid, name)
+    if key is not None:
+        cache.set(key, value, timeout=get_config()['TIMEOUT'])
+
+
+def invalidate(post_uuid, deleted=False):
+    """
+    Drop everything cached for a post, deleted when the post itself was. The
+    post is invalidated again once the current transaction commits so a read
+    racing the write can't cache the old payload.
+    """
+    def new_generation():
+        if deleted:
+            cache.delete(generation_key(post_uuid))
+        else:
+            cache.set(generation_key(post_uuid), uuid4().hex,
+                      timeout=get_generation_timeout())
+
+    new_generation()
+    transaction.on_commit(new_generation)
@@ -0,0 +1,149 @@
+"""
+Conditional GET for posts and comments.
+
+Responses from views using ConditionalGetMixin carry an ETag, and where it
+makes sense a Last-Modified date, computed from a few columns instead of the
+serialized payload. Requests sending If-None-Match or If-Modified-Since are
+checked against validators fetched with one small query (or none, when they
+are cached) and answered with 304 Not Modified if they still match, before
+anything is serialized.
+
+Post details and comment lists are validated by the posts date_modified,
+which is bumped by every change to the post, its pins or comments, along with
+its pin or comment count. Their validators are cached with the rest of the
+posts payloads (see posts/cache.py), so they are invalidated together.
+
+Pages of posts are validated by the id, date_modified and pins of every post
+on the page. They don't get a Last-Modified date, removing a post from a page
+doesn't make the page any newer.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import cache, pins
+from .models import Post
+
+
+def make_etag(*parts):
+    return hashlib.md5(
+        '|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def is_conditional(request):
+    return ('HTTP_IF_NONE_MATCH' in request.META or
+            'HTTP_IF_MODIFIED_SINCE' in request.META)
+
+
+def post_validators(pk, date_modified, count):
+    """
+    Validators of a post detail or comment list, count is the pins or comments
+    of the post.
+    """
+    return make_etag(pk, date_modified.isoformat(), count), date_modified
+
+
+def get_post_validators(uuid, field):
+    """
+    Return the validators of the post with the UUID using field ('pins' or
+    'comment_count') as the count, from the cache or one query.
+    """
+    def compute():
+        post = Post.objects.filter(uuid=uuid).values_list(
+            'id', 'date_modified', field).first()
+        if post is None:
+            return None
+
+        pk, date_modified, count = post
+        if field == 'pins':
+            count = pins.add_unflushed(pk, count)
+        return post_validators(pk, date_modified, count)
+
+    validators = cache.get_or_set(uuid, f'validators:{field}', compute)
+    return validators or (None, None)
+
+
+def page_validators(rows, has_next):
+    """
+    Validators of a page of (id, date_modified, pins) post rows.
+    """
+    unflushed = pins.get_unflushed([pk for pk, _, _ in rows])
+    return make_etag(has_next, *(
+        (pk, date_modified.isoformat(), count + unflushed.get(pk, 0))
+        for pk, date_modified, count in rows)), None
+
+
+def get_not_modified(request, etag, last_modified):
+    """
+    Return a 304 Not Modified response if the validators match the request.
+    """
+    if etag is None and last_modified is None:
+        return None
+    return get_conditional_response(
+        request, etag=etag and quote_etag(etag),
+        last_modified=last_modified and int(last_modified.timestamp()))
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with 304 Not Modified when the validators returned by
+    get_validators match the request. Views can set self.validators while
+    building a response from the rows they loaded, to spare get_validators a
+    query.
+    """
+    validators = None
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        Return an (etag, last_modified) pair, either can be None.
+        """
+        raise NotImplementedError(
+            'subclasses of ConditionalGetMixin must provide get_validators()')
+
+    def get(self, request, *args, **kwargs):
+        if is_conditional(request):
+            self.validators = self.get_validators(request, *args, **kwargs)
+            response = self.get_not_modified(request, *self.validators)
+            if response is not None:
+                return self.add_validators(response, *self.validators)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            if self.validators is None:
+                self.validators = self.get_validators(
+                    request, *args, **kwargs)
+            self.add_validators(response, *self.validators)
+        return response
+
+    def get_not_modified(self, request, etag, last_modified):
+        return get_not_modified(request, etag, last_modified)
+
+    def add_validators(self, response, etag, last_modified):
+        if etag is not None:
+            response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+
+class PostPageMixin(ConditionalGetMixin):
+    """
+    Conditional GET for keyset paginated pages of posts served from .values()
+    rows, see ValuesListMixin.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        rows = list(self.paginator.get_page_queryset(
+            self.get_queryset().values_list('id', 'date_modified', 'pins'),
+            request))
+        limit = self.paginator.limit
+        return page_validators(rows[:limit], len(rows) > limit)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and all(isinstance(row, dict) for row in page):
+            self.validators = page_validators(
+                [(row['id'], row['date_modified'], row['pins'])
+                 for row in page], self.paginator.has_next)
+        return page
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Extract the tags and mentions of every existing post in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=tags.get_config()['BATCH_SIZE'],
+                            help='Posts read per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Post.objects.only('id', 'text', 'date_created').order_by('id')
+
+        synced, last_id = 0, 0
+        while True:
+            batch = list(posts.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            tags.sync(batch)
+            synced += len(batch)
+            last_id = batch[-1].pk
+
+        self.stdout.write(f'Synced tags and mentions of {synced} posts')
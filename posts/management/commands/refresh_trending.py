@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import tags, trending
+
+
+class Command(BaseCommand):
+    help = ('Recompute the trending scores of recent posts and drop tag '
+            'activity too old to trend')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int,
+                            help='Keep refreshing every EVERY seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            count = trending.refresh()
+            self.stdout.write(f'Scored {count} posts')
+            pruned = tags.prune()
+            self.stdout.write(f'Pruned {pruned} old tag activity rows')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
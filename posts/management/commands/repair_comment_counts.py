@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized comment count of every post in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Posts updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Post.objects.aggregate(last=Max('id'))['last'] or 0
+
+        updated = 0
+        for start in range(0, last_id + 1, batch_size):
+            updated += Post.objects.filter(
+                id__gte=start, id__lt=start + batch_size).recount_comments()
+
+        self.stdout.write(f'Recounted comments on {updated} posts')
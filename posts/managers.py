@@ -0,0 +1,37 @@
+from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class PostQuerySet(models.QuerySet):
+    """
+    Custom post queryset.
+    """
+
+    def with_summary(self):
+        """
+        Join the author so a page of posts can be serialized with a single
+        query.
+        """
+        return self.select_related('author')
+
+    def increment(self, **deltas):
+        """
+        Atomically add the given deltas to counter columns in the database,
+        e.g. increment(pins=1), without reading the rows first. Bumps
+        date_modified.
+        """
+        return self.update(date_modified=timezone.now(), **{
+            field: models.F(field) + delta for field, delta in deltas.items()})
+
+    def recount_comments(self):
+        """
+        Recompute the denormalized comment_count of these posts from the
+        comments table.
+        """
+        from .models import Comment
+
+        counts = Comment.objects.filter(post=models.OuterRef('pk')).order_by(
+            ).values('post').annotate(count=models.Count('pk')).values('count')
+        return self.update(comment_count=Coalesce(
+            models.Subquery(counts, output_field=models.IntegerField()), 0))
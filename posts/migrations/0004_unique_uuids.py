@@ -0,0 +1,35 @@
+from django.db import migrations, models
+import uuid
+
+from mysite.indexes import unique_index
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('posts', '0003_delete_postreport'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                unique_index('posts_post', 'uuid', 'posts_post_uuid_uniq'),
+                unique_index('posts_comment', 'uuid', 'posts_comment_uuid_uniq'),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='comment',
+                    name='uuid',
+                    field=models.UUIDField(default=uuid.uuid4, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='uuid',
+                    field=models.UUIDField(default=uuid.uuid4, unique=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.0.8 on 2026-10-18 10:38
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    """
+    Fill in comment_count for existing posts, a batch of ids at a time so the
+    posts table isn't locked for one long UPDATE.
+    """
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    counts = Comment.objects.filter(post=models.OuterRef('pk')).order_by(
+        ).values('post').annotate(count=models.Count('pk')).values('count')
+    last_id = Post.objects.aggregate(last=models.Max('id'))['last'] or 0
+    batch_size = 1000
+    for start in range(0, last_id + 1, batch_size):
+        Post.objects.filter(id__gte=start, id__lt=start + batch_size).update(
+            comment_count=Coalesce(
+                models.Subquery(counts, output_field=models.IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    # commit each batch of count_comments on its own
+    atomic = False
+
+    dependencies = [
+        ('posts', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop,
+                             atomic=False),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+def copy_date_created(apps, schema_editor):
+    """
+    Start existing posts off as last modified when they were created.
+    """
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(date_modified=models.F('date_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_trendingscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_date_created, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from uuid import uuid4
 
+from .managers import PostQuerySet
+
 
 class Post(models.Model):
 
@@ -10,22 +12,28 @@ class Post(models.Model):
             models.Index(fields=['author_id', 'date_created'])
         ]
 
-    uuid = models.UUIDField(default=uuid4, null=False)
+    uuid = models.UUIDField(default=uuid4, null=False, unique=True)
     text = models.CharField(max_length=250, null=False)
     pins = models.IntegerField(default=0, null=False)  # likes
+    comment_count = models.IntegerField(default=0, null=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    # bumped by every change to the post, its pins or comments
+    date_modified = models.DateTimeField(auto_now=True)
     visible = models.BooleanField(default=True, null=False)
     edited = models.BooleanField(default=False, null=False)
 
     author = models.ForeignKey(
         'users.User', related_name='posts', on_delete=models.CASCADE)
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return f'<Post uuid={self.uuid} author={self.author}>'
 
     def get_comment_count(self):
         """
-        Return the number of comments on this post.
+        Return the number of comments on this post. Prefer the denormalized
+        comment_count column, this counts the comments table.
         """
         return self.comments.count()
 
@@ -37,7 +45,7 @@ class Comment(models.Model):
             models.Index(fields=['post_id', 'date_created']),
         ]
 
-    uuid = models.UUIDField(default=uuid4, null=False)
+    uuid = models.UUIDField(default=uuid4, null=False, unique=True)
     text = models.CharField(max_length=100, null=False)
     date_created = models.DateTimeField(auto_now_add=True)
 
@@ -45,3 +53,146 @@ class Comment(models.Model):
         'users.User', related_name='comments', on_delete=models.CASCADE)
     post = models.ForeignKey(
         'Post', related_name='comments', on_delete=models.CASCADE)
+
+
+class PostPin(models.Model):
+    """
+    A user pinning a post. A user can only pin a post once, the post keeps a
+    denormalized count of its pins in Post.pins.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'],
+                                    name='unique_post_pin'),
+        ]
+
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    user = models.ForeignKey(
+        'users.User', related_name='pins', on_delete=models.CASCADE)
+    post = models.ForeignKey(
+        'Post', related_name='post_pins', on_delete=models.CASCADE)
+
+
+class TimelineEntry(models.Model):
+    """
+    A post in a users home timeline. Entries are written when a post is created
+    (fan-out-on-write) and carry a copy of the posts date_created so a page of
+    the timeline is read from the (owner, date_created, post) index alone.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner_id', 'date_created', 'post_id']),
+        ]
+
+    date_created = models.DateTimeField()
+
+    owner = models.ForeignKey(
+        'users.User', related_name='timeline', on_delete=models.CASCADE)
+    post = models.ForeignKey(
+        'Post', related_name='timeline_entries', on_delete=models.CASCADE)
+
+
+class TrendingScore(models.Model):
+    """
+    Precomputed trending score of a recent post. The table is rebuilt
+    periodically by `manage.py refresh_trending` so the trending feed is read
+    in score order straight from the (score, post) index.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score', 'post_id']),
+        ]
+
+    post = models.OneToOneField(
+        'Post', primary_key=True, related_name='trending',
+        on_delete=models.CASCADE)
+    score = models.FloatField(null=False)
+
+
+class Tag(models.Model):
+    """
+    A #hashtag, stored lower case. post_count is kept up to date as posts are
+    tagged and untagged (see posts/tags.py).
+    """
+    name = models.CharField(max_length=64, null=False, unique=True)
+    post_count = models.IntegerField(default=0, null=False)
+
+    def __str__(self):
+        return f'<Tag name={self.name}>'
+
+
+class PostTag(models.Model):
+    """
+    A post carrying a tag. Rows carry a copy of the posts date_created so the
+    posts of a tag are read from the (tag, date_created, post) index alone.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'post'],
+                                    name='unique_post_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag_id', 'date_created', 'post_id']),
+        ]
+
+    date_created = models.DateTimeField()
+
+    tag = models.ForeignKey(
+        'Tag', related_name='post_tags', on_delete=models.CASCADE)
+    post = models.ForeignKey(
+        'Post', related_name='post_tags', on_delete=models.CASCADE)
+
+
+class Mention(models.Model):
+    """
+    A post mentioning a user with @username. Like PostTag rows carry a copy of
+    the posts date_created for the (user, date_created, post) index.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_mention'),
+        ]
+        indexes = [
+            models.Index(fields=['user_id', 'date_created', 'post_id']),
+        ]
+
+    date_created = models.DateTimeField()
+
+    user = models.ForeignKey(
+        'users.User', related_name='mentions', on_delete=models.CASCADE)
+    post = models.ForeignKey(
+        'Post', related_name='mentions', on_delete=models.CASCADE)
+
+
+class TagActivity(models.Model):
+    """
+    The number of posts created in an hour that carry a tag. Counts are
+    updated as posts are tagged and untagged, trending tags are summed over
+    the latest hours from the (hour, tag, count) index.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'hour'],
+                                    name='unique_tag_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'tag_id', 'count']),
+        ]
+
+    hour = models.DateTimeField()
+    count = models.IntegerField(default=0, null=False)
+
+    tag = models.ForeignKey(
+        'Tag', related_name='activity', on_delete=models.CASCADE)
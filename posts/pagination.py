@@ -0,0 +1,149 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination keyed on a (value, id) pair. Each page is fetched
+    with a range filter on the ordering columns so page N costs the same as the
+    first page, and the id column keeps the ordering stable when values tie.
+
+    EXAMPLE:
+        GET -> /posts/recent/?limit=50 -> first 50 posts and a next link
+        GET -> /posts/recent/?cursor=<next> -> the following page
+    """
+    ordering = ('-date_created', '-id')
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    page_size = 20
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the rows of the requested page, plus the first row of the next
+        page if there is one.
+        """
+        self.prepare(request)
+        queryset = queryset.order_by(*self.ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_position_filter(self.position))
+        return queryset[:self.limit + 1]
+
+    def prepare(self, request):
+        """
+        Read the limit and cursor position from the request.
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.position = self.decode_cursor(request)
+
+    def page(self, rows):
+        """
+        Trim a list of up to limit + 1 ordered rows down to a page and remember
+        where the next page starts.
+        """
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_position = None
+        if self.has_next:
+            self.next_position = self.get_position(rows[-1])
+        return rows
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if limit <= 0:
+            return self.page_size
+        return min(limit, self.max_page_size)
+
+    def get_position(self, row):
+        """
+        Return the (value, id) pair of an object or values() row.
+        """
+        fields = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            return tuple(row[field] for field in fields)
+        return tuple(getattr(row, field) for field in fields)
+
+    def get_position_filter(self, position):
+        value_field, id_field = [field.lstrip('-') for field in self.ordering]
+        lookup = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        value, pk = position
+        return (Q(**{f'{value_field}__{lookup}': value}) |
+                Q(**{value_field: value, f'{id_field}__{lookup}': pk}))
+
+    def encode_value(self, value):
+        return value.isoformat()
+
+    def decode_value(self, value):
+        decoded = parse_datetime(value)
+        if decoded is None:
+            raise ValueError(value)
+        return decoded
+
+    def encode_cursor(self, position):
+        value, pk = position
+        raw = f'{self.encode_value(value)}|{pk}'.encode('ascii')
+        return urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            raw = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            value, pk = raw.rsplit('|', 1)
+            return self.decode_value(value), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class ScorePagination(KeysetPagination):
+    """
+    Keyset pagination over rows ranked by a float score, highest first.
+    """
+    ordering = ('-score', '-post_id')
+
+    def encode_value(self, value):
+        return repr(value)
+
+    def decode_value(self, value):
+        return float(value)
@@ -11,4 +11,5 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        return obj.author == request.user
+        # compare ids so neither user has to be loaded
+        return obj.author_id == request.user.pk
@@ -0,0 +1,214 @@
+"""
+Write-behind buffer for post pin counts.
+
+When enabled with settings.PIN_BUFFER['ENABLED'] pins no longer update the
+post row on every request. The change is added to a per post delta in the
+cache instead and a background timer applies the summed deltas with a single
+bulk UPDATE every FLUSH_INTERVAL seconds. Reads add the unflushed delta so
+clients still see up to date counts.
+
+The deltas live in the cache so every process sees them, but each process
+only flushes the posts it buffered itself. At most FLUSH_INTERVAL seconds or
+MAX_PENDING pins (whichever comes first) are waiting to be written when a
+process dies, after which a shared cache still holds them and they are written
+with the next pin on that post.
+
+That needs a cache shared by the processes, like memcached or redis. With the
+default local memory CACHES the buffer is per process: readers in other
+processes don't see its pins and they are lost if the process crashes.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Post
+
+DEFAULTS = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL': 5,
+    'MAX_PENDING': 1000,
+    'KEY_PREFIX': 'pins',
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'PIN_BUFFER', {}))
+    return config
+
+
+def is_enabled():
+    return get_config()['ENABLED']
+
+
+class PinBuffer:
+    """
+    Buffers pin count deltas per post and flushes them in bulk.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.pending = 0
+        self.timer = None
+
+    def key(self, post_id):
+        return f'{get_config()["KEY_PREFIX"]}:{post_id}'
+
+    def add(self, post_id, delta):
+        """
+        Buffer a change to a posts pin count.
+        """
+        config = get_config()
+        self._incr(self.key(post_id), delta)
+
+        with self.lock:
+            self.dirty.add(post_id)
+            self.pending += 1
+            flush_now = self.pending >= config['MAX_PENDING']
+            interval = config['FLUSH_INTERVAL']
+            if not flush_now and self.timer is None and interval:
+                self.timer = threading.Timer(interval,
+                                             self._flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+
+        if flush_now:
+            self.flush()
+
+    def get_delta(self, post_id):
+        """
+        Return the unflushed change to a posts pin count.
+        """
+        return cache.get(self.key(post_id), 0)
+
+    def get_deltas(self, post_ids):
+        """
+        Return the unflushed changes to the pin counts of posts as
+        {post_id: delta} with a single cache read.
+        """
+        keys = {self.key(post_id): post_id for post_id in post_ids}
+        return {keys[key]: delta
+                for key, delta in cache.get_many(keys).items()}
+
+    def flush(self):
+        """
+        Apply the buffered deltas of every post this process pinned in a single
+        UPDATE. Returns the applied {post_id: delta}.
+        """
+        with self.lock:
+            post_ids, self.dirty = self.dirty, set()
+            self.pending = 0
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        deltas = {}
+        for post_id in post_ids:
+            delta = self._claim(self.key(post_id))
+            if delta:
+                deltas[post_id] = delta
+
+        if deltas:
+            try:
+                self.apply(deltas)
+            except Exception:
+                # give the claimed deltas back so the next flush retries them
+                for post_id, delta in deltas.items():
+                    self._incr(self.key(post_id), delta)
+                with self.lock:
+                    self.dirty.update(deltas)
+                raise
+
+        return deltas
+
+    def apply(self, deltas):
+        Post.objects.filter(pk__in=deltas).update(
+            date_modified=timezone.now(),
+            pins=F('pins') + Case(
+                *[When(pk=pk, then=Value(delta))
+                  for pk, delta in deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()))
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # the timer thread has its own connection, don't leak it
+            connection.close()
+
+    def _claim(self, key):
+        """
+        Take the buffered delta out of key and return it. Pins buffered from
+        now on are left for the next flush.
+        """
+        delta = cache.get(key)
+        if not delta:
+            return 0
+        try:
+            remaining = cache.decr(key, delta)
+        except ValueError:
+            return 0
+        # another process flushing the same post may have taken some of the
+        # delta between the get and the decr, keep only what was still there
+        # and give back the rest
+        found = remaining + delta
+        if delta > 0:
+            claimed = min(max(found, 0), delta)
+        else:
+            claimed = max(min(found, 0), delta)
+        if claimed != delta:
+            self._incr(key, delta - claimed)
+        return claimed
+
+    def _incr(self, key, delta):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+
+buffer = PinBuffer()
+
+
+def pin(post_id, delta):
+    """
+    Change a posts pin count, buffered when write-behind is enabled. Buffered
+    changes are only added once the current transaction commits.
+    """
+    if is_enabled():
+        transaction.on_commit(lambda: buffer.add(post_id, delta))
+    else:
+        Post.objects.filter(pk=post_id).increment(pins=delta)
+
+
+def get_pins(post):
+    """
+    Return the posts pin count including any unflushed pins.
+    """
+    return add_unflushed(post.pk, post.pins)
+
+
+def add_unflushed(post_id, pins):
+    """
+    Add any unflushed pins to a pin count read from the database.
+    """
+    if is_enabled():
+        return pins + buffer.get_delta(post_id)
+    return pins
+
+
+def get_unflushed(post_ids):
+    """
+    Return the unflushed pins of posts as {post_id: pins}, for adding to a
+    page of pin counts read from the database at once.
+    """
+    if is_enabled() and post_ids:
+        return buffer.get_deltas(post_ids)
+    return {}
@@ -1,10 +1,13 @@
 from rest_framework import serializers
 
-from . import models
+from metrics.profiling import TimedListSerializer, TimedSerializerMixin
 from users.serializers import UserSerializer
+from . import models, pins
 
+datetime_field = serializers.DateTimeField()
 
-class CommentSerializer(serializers.ModelSerializer):
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Comment Serializer
     """
@@ -15,19 +18,109 @@ class CommentSerializer(serializers.ModelSerializer):
         model = models.Comment
         fields = ['uuid', 'text', 'date_created', 'post', 'author']
         read_only_fields = ['date_created', 'uuid']
+        list_serializer_class = TimedListSerializer
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer that provides an overview of the Post model. This serializer
     summarises the comments and author models.
     """
     author = serializers.ReadOnlyField(source='author.username')
-    comments = serializers.IntegerField(
-        source='get_comment_count', read_only=True)
+    pins = serializers.SerializerMethodField()
+    comments = serializers.IntegerField(source='comment_count', read_only=True)
 
     class Meta:
         model = models.Post
         fields = ['uuid', 'text', 'author', 'pins',
                   'comments', 'date_created', 'edited']
         read_only_fields = ['uuid', 'author', 'date_created', 'pins', 'edited']
+        list_serializer_class = TimedListSerializer
+
+    def get_pins(self, obj):
+        """
+        Include pins still waiting in the write-behind buffer.
+        """
+        return pins.get_pins(obj)
+
+
+class ValuesSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    Read only serializer for the rows of queryset.values(*fields). Subclasses
+    build each representation straight from the row dict, skipping the per
+    field machinery of the ModelSerializer they stand in for, and must return
+    exactly what it would.
+    """
+    fields = ()
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.fields)
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    """
+    Same output as CommentSerializer.
+    """
+    fields = ('id', 'uuid', 'text', 'date_created', 'post__uuid',
+              'author__uuid', 'author__username', 'author__date_joined',
+              # for the conditional GET validators
+              'post_id', 'post__date_modified', 'post__comment_count')
+
+    def to_representation(self, row):
+        return {
+            'uuid': str(row['uuid']),
+            'text': row['text'],
+            'date_created': datetime_field.to_representation(
+                row['date_created']),
+            'post': row['post__uuid'],
+            'author': {
+                'uuid': str(row['author__uuid']),
+                'username': row['author__username'],
+                'date_joined': datetime_field.to_representation(
+                    row['author__date_joined']),
+            },
+        }
+
+
+class PostValuesListSerializer(TimedListSerializer):
+    """
+    Reads the unflushed pins of the whole list in one cache lookup instead of
+    one per post.
+    """
+
+    def to_representation(self, data):
+        rows = list(data)
+        self.child.unflushed = pins.get_unflushed([row['id'] for row in rows])
+        return super().to_representation(rows)
+
+
+class PostValuesSerializer(ValuesSerializer):
+    """
+    Same output as PostSerializer.
+    """
+    fields = ('id', 'uuid', 'text', 'author__username', 'pins',
+              'comment_count', 'date_created', 'edited', 'date_modified')
+    unflushed = None  # {post_id: pins}, set by PostValuesListSerializer
+
+    class Meta:
+        list_serializer_class = PostValuesListSerializer
+
+    def to_representation(self, row):
+        if self.unflushed is None:
+            post_pins = pins.add_unflushed(row['id'], row['pins'])
+        else:
+            post_pins = row['pins'] + self.unflushed.get(row['id'], 0)
+        return {
+            'uuid': str(row['uuid']),
+            'text': row['text'],
+            'author': row['author__username'],
+            'pins': post_pins,
+            'comments': row['comment_count'],
+            'date_created': datetime_field.to_representation(
+                row['date_created']),
+            'edited': row['edited'],
+        }
@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from users.models import Follow
+from . import cache, pins, tags
+from .models import Comment, Post, PostPin
+
+
+def get_post_uuid(instance):
+    """
+    Return the UUID of the post a comment or pin belongs to, without loading
+    the post when it is already attached.
+    """
+    if type(instance).post.is_cached(instance):
+        return instance.post.uuid
+    return Post.objects.filter(pk=instance.post_id).values_list(
+        'uuid', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    cache.invalidate(instance.uuid)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    cache.invalidate(instance.uuid, deleted=True)
+
+
+@receiver(pre_delete, sender=Post)
+def remove_tags(sender, instance, **kwargs):
+    # however the post is deleted, including cascades from its author
+    tags.remove([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    # however the comment is deleted, including cascades from its author, the
+    # admin and QuerySet.delete(); also bumps date_modified for the ETag
+    Post.objects.filter(pk=instance.post_id).increment(comment_count=-1)
+
+
+@receiver(post_delete, sender=PostPin)
+def decrement_pins(sender, instance, **kwargs):
+    # however the pin is deleted, including cascades from its user
+    pins.pin(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=PostPin)
+@receiver(post_delete, sender=PostPin)
+def invalidate_parent_post(sender, instance, **kwargs):
+    post_uuid = get_post_uuid(instance)
+    if post_uuid is not None:
+        cache.invalidate(post_uuid)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def sync_timeline(sender, instance, **kwargs):
+    enqueue('posts.sync_timeline', follower_id=instance.follower_id,
+            followee_id=instance.followee_id)
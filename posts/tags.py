@@ -0,0 +1,243 @@
+"""
+Hashtags and mentions.
+
+Post text is scanned for #tags and @usernames when posts are written and every
+one found is stored as a PostTag or Mention row carrying a copy of the posts
+date_created, so the posts of a tag or mentioning a user are read newest first
+from the (tag, date_created, post) and (user, date_created, post) indexes
+instead of scanning post text.
+
+The same writes keep the tag counters up to date: Tag.post_count and the per
+hour TagActivity counts that trending tags are summed from. sync() only
+writes the difference between what a post carries and what its text says, so
+running it again over the same posts changes nothing.
+"""
+import re
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Mention, Post, PostTag, Tag, TagActivity
+from .timeline import after
+
+User = get_user_model()
+
+DEFAULTS = {
+    'TRENDING_HOURS': 24,
+    'TRENDING_LIMIT': 20,
+    'BATCH_SIZE': 1000,
+}
+
+TAG_RE = re.compile(r'(?<![\w#])#(\w{1,64})(?!\w)')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]*\w)')
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'TAGS', {}))
+    return config
+
+
+def extract_tags(text):
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def extract_mentions(text):
+    return set(MENTION_RE.findall(text))
+
+
+def get_hour(date):
+    return date.replace(minute=0, second=0, microsecond=0)
+
+
+def add_rows(model, rows):
+    rows = list(rows)
+    if not rows:
+        return
+    # some backends cap how many rows fit in one INSERT
+    batch_size = min(get_config()['BATCH_SIZE'], connection.ops.bulk_batch_size(
+        model._meta.concrete_fields, rows))
+    model.objects.bulk_create(rows, batch_size=batch_size,
+                              ignore_conflicts=True)
+
+
+def remove_rows(model, field, pairs):
+    """
+    Delete the rows of model matching (post_id, <field>_id) pairs.
+    """
+    by_post = {}
+    for post_id, other_id in pairs:
+        by_post.setdefault(post_id, []).append(other_id)
+    if by_post:
+        model.objects.filter(reduce(or_, (
+            Q(post_id=post_id, **{f'{field}_id__in': ids})
+            for post_id, ids in by_post.items()))).delete()
+
+
+def get_tag_ids(names):
+    """
+    Return {name: id} for the tag names, creating the tags that don't exist.
+    """
+    if not names:
+        return {}
+    tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = set(names) - set(tag_ids)
+    if missing:
+        add_rows(Tag, (Tag(name=name) for name in missing))
+        tag_ids.update(Tag.objects.filter(name__in=missing).values_list(
+            'name', 'id'))
+    return tag_ids
+
+
+def count(deltas):
+    """
+    Apply {(tag_id, hour): delta} to the post counts and hourly activity of
+    the tags, with one UPDATE per distinct delta (and hour).
+    """
+    totals, hourly = {}, {}
+    for (tag_id, hour), delta in deltas.items():
+        totals[tag_id] = totals.get(tag_id, 0) + delta
+        if delta:
+            hourly.setdefault((hour, delta), []).append(tag_id)
+    by_delta = {}
+    for tag_id, delta in totals.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+
+    for delta, tag_ids in by_delta.items():
+        Tag.objects.filter(id__in=tag_ids).update(
+            post_count=F('post_count') + delta)
+    add_rows(TagActivity, (TagActivity(tag_id=tag_id, hour=hour)
+                           for (tag_id, hour), delta in deltas.items()
+                           if delta > 0))
+    for (hour, delta), tag_ids in hourly.items():
+        TagActivity.objects.filter(hour=hour, tag_id__in=tag_ids).update(
+            count=F('count') + delta)
+
+
+def sync_tags(rows, created):
+    wanted = {(pk, name): date_created
+              for pk, date_created, text in rows
+              for name in extract_tags(text)}
+    existing = {}
+    if not created:
+        existing = {
+            (post_id, name): (tag_id, date_created)
+            for post_id, name, tag_id, date_created in PostTag.objects.filter(
+                post_id__in=[pk for pk, _, _ in rows]).values_list(
+                'post_id', 'tag__name', 'tag_id', 'date_created')}
+
+    added = [key for key in wanted if key not in existing]
+    removed = [key for key in existing if key not in wanted]
+    tag_ids = get_tag_ids({name for _, name in added})
+
+    deltas = {}
+    for pk, name in added:
+        key = (tag_ids[name], get_hour(wanted[pk, name]))
+        deltas[key] = deltas.get(key, 0) + 1
+    for pk, name in removed:
+        tag_id, date_created = existing[pk, name]
+        key = (tag_id, get_hour(date_created))
+        deltas[key] = deltas.get(key, 0) - 1
+
+    remove_rows(PostTag, 'tag', ((pk, existing[pk, name][0])
+                                 for pk, name in removed))
+    add_rows(PostTag, (PostTag(post_id=pk, tag_id=tag_ids[name],
+                               date_created=wanted[pk, name])
+                       for pk, name in added))
+    count(deltas)
+
+
+def sync_mentions(rows, created):
+    usernames = {username for _, _, text in rows
+                 for username in extract_mentions(text)}
+    user_ids = {}
+    if usernames:
+        user_ids = dict(User.objects.filter(
+            username__in=usernames).values_list('username', 'id'))
+
+    wanted = {(pk, user_ids[username]): date_created
+              for pk, date_created, text in rows
+              for username in extract_mentions(text)
+              if username in user_ids}
+    existing = set()
+    if not created:
+        existing = set(Mention.objects.filter(
+            post_id__in=[pk for pk, _, _ in rows]).values_list(
+            'post_id', 'user_id'))
+
+    remove_rows(Mention, 'user', existing - set(wanted))
+    add_rows(Mention, (Mention(post_id=pk, user_id=user_id,
+                               date_created=date_created)
+                       for (pk, user_id), date_created in wanted.items()
+                       if (pk, user_id) not in existing))
+
+
+def sync(posts, created=False):
+    """
+    Bring the tags and mentions of the posts in line with their text. New
+    posts have none yet, pass created=True to skip looking them up so posts
+    without tags or mentions cost no queries.
+    """
+    rows = [(post.pk, post.date_created, post.text) for post in posts]
+    if created and not any(TAG_RE.search(text) or MENTION_RE.search(text)
+                           for _, _, text in rows):
+        return
+    with transaction.atomic():
+        sync_tags(rows, created)
+        sync_mentions(rows, created)
+
+
+def remove(posts):
+    """
+    Take posts that are about to be deleted off their tags counters, their
+    PostTag and Mention rows are deleted along with them. Called for every
+    deleted post by the pre_delete receiver in signals.py.
+    """
+    sync_tags([(post.pk, post.date_created, '') for post in posts], False)
+
+
+def read(entries, position=None, limit=20):
+    """
+    Return up to limit posts of the PostTag or Mention rows that come after
+    position, newest first.
+    """
+    if position is not None:
+        entries = entries.filter(after(position, 'post_id'))
+    post_ids = list(entries.order_by('-date_created', '-post_id').values_list(
+        'post_id', flat=True)[:limit])
+
+    posts = Post.objects.with_summary().in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def trending(now=None):
+    """
+    Return the tags on the most posts created in the last TRENDING_HOURS, as
+    {'name', 'count'} dicts, most posts first.
+    """
+    config = get_config()
+    now = now or timezone.now()
+    since = get_hour(now - timedelta(hours=config['TRENDING_HOURS']))
+    rows = TagActivity.objects.filter(hour__gte=since).values_list(
+        'tag__name').annotate(total=Sum('count')).filter(
+        total__gt=0).order_by('-total', 'tag__name')
+    return [{'name': name, 'count': total}
+            for name, total in rows[:config['TRENDING_LIMIT']]]
+
+
+def prune(now=None):
+    """
+    Delete the hourly activity that is too old to trend. Returns the number of
+    rows deleted.
+    """
+    now = now or timezone.now()
+    since = get_hour(now - timedelta(hours=get_config()['TRENDING_HOURS']))
+    deleted, _ = TagActivity.objects.filter(hour__lt=since).delete()
+    return deleted
@@ -0,0 +1,33 @@
+"""
+Background jobs for posts, run by the job queue in jobs/queue.py.
+"""
+from jobs.queue import task
+from users.models import Follow
+from . import timeline
+from .models import Post
+
+
+@task('posts.fan_out')
+def fan_out(payloads):
+    """
+    Write new posts to their authors followers timelines.
+    """
+    posts = Post.objects.filter(pk__in=[p['post_id'] for p in payloads])
+    for post in posts.order_by('id'):
+        timeline.fan_out(post)
+
+
+@task('posts.sync_timeline')
+def sync_timeline(payloads):
+    """
+    Backfill or clean up a timeline after a follow or unfollow. Jobs may run
+    out of order so the current follow decides which one to do.
+    """
+    for payload in payloads:
+        follower_id = payload['follower_id']
+        followee_id = payload['followee_id']
+        if Follow.objects.filter(follower_id=follower_id,
+                                 followee_id=followee_id).exists():
+            timeline.backfill(follower_id, followee_id)
+        else:
+            timeline.remove(follower_id, followee_id)
@@ -1,13 +1,47 @@
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status as s
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.renderers import JSONRenderer
 from django.test import TestCase
 import datetime as dt
+from io import StringIO
+from threading import Timer
+from unittest import mock
+import asyncio
+import json
 from uuid import uuid4
 from django.shortcuts import reverse
+from django.urls import resolve
 from django.contrib.auth import get_user_model
-
-from .models import Post, Comment
-from .serializers import PostSerializer, CommentSerializer
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.db.utils import IntegrityError
+
+from .models import (
+    Comment,
+    Mention,
+    Post,
+    PostPin,
+    PostTag,
+    Tag,
+    TagActivity,
+    TimelineEntry,
+    TrendingScore
+)
+from . import tags, trending
+from .serializers import (
+    CommentSerializer,
+    CommentValuesSerializer,
+    PostSerializer,
+    PostValuesSerializer
+)
+from metrics import profiling
+from .asgi import HANDLERS, ReadApplication
+from .pins import PinBuffer, buffer
+from jobs.models import Job
+from jobs.queue import run_pending
+from . import cache as post_cache
 
 User = get_user_model()
 
@@ -31,6 +65,11 @@ class PostModelTest(TestCase):
         self.assertEqual(p.edited, False)
         self.assertEqual(p.visible, True)
 
+    def test_post_uuid_unique(self):
+        p = Post.objects.create(text='post', author=self.author)
+        with self.assertRaises(IntegrityError):
+            Post.objects.create(text='post', author=self.author, uuid=p.uuid)
+
     def test_post_comment_count_none(self):
         p = Post.objects.create(text='post', author=self.author)
         self.assertEqual(p.get_comment_count(), 0)
@@ -63,10 +102,11 @@ class PostListCreateTest(APITestCase):
         res = self.client.get(reverse('post_list_create'),
                               HTTP_AUTHORIZATION=f'Bearer {self.token}')
         posts = PostSerializer(
-            instance=Post.objects.filter(author=self.author), many=True)
+            instance=Post.objects.filter(author=self.author).order_by(
+                '-date_created', '-id'), many=True)
 
         self.assertEqual(res.status_code, s.HTTP_200_OK)
-        self.assertListEqual(posts.data, res.data)
+        self.assertListEqual(posts.data, res.data['results'])
 
     def test_post_list_unauth(self):
         res = self.client.get(reverse('post_list_create'))
@@ -80,10 +120,11 @@ class PostListCreateTest(APITestCase):
         res = self.client.get(reverse('post_list_create'),
                               HTTP_AUTHORIZATION=f'Bearer {self.token}')
         posts = PostSerializer(
-            instance=Post.objects.filter(author=self.author), many=True)
+            instance=Post.objects.filter(author=self.author).order_by(
+                '-date_created', '-id'), many=True)
 
         self.assertEqual(res.status_code, s.HTTP_200_OK)
-        self.assertListEqual(posts.data, res.data)
+        self.assertListEqual(posts.data, res.data['results'])
 
     def test_create_new_post(self):
         res = self.client.post(
@@ -254,6 +295,55 @@ class PinPostViewTest(APITestCase):
         p = Post.objects.get(pk=1)
         self.assertEqual(p.pins, 0)
 
+    def test_pin_twice(self):
+        p = Post.objects.get(pk=1)
+        url = reverse('pin_post', kwargs={'uuid': p.uuid})
+
+        self.client.put(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        res = self.client.put(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+
+        self.assertEqual(Post.objects.get(pk=1).pins, 1)
+        self.assertEqual(PostPin.objects.filter(post=p).count(), 1)
+
+    def test_pin_many_users(self):
+        p = Post.objects.get(pk=1)
+        url = reverse('pin_post', kwargs={'uuid': p.uuid})
+
+        self.client.put(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.client.put(url, HTTP_AUTHORIZATION=f'Bearer {self.token2}')
+
+        self.assertEqual(Post.objects.get(pk=1).pins, 2)
+
+    def test_unpin(self):
+        p = Post.objects.get(pk=1)
+        url = reverse('pin_post', kwargs={'uuid': p.uuid})
+
+        self.client.put(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        res = self.client.delete(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(Post.objects.get(pk=1).pins, 0)
+
+        # unpinning again is a no-op
+        res = self.client.delete(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(Post.objects.get(pk=1).pins, 0)
+        self.assertFalse(PostPin.objects.filter(post=p).exists())
+
+    def test_delete_pinning_user(self):
+        p = Post.objects.get(pk=1)
+        user = User.objects.create_user(username='test3', password='pw')
+        PostPin.objects.create(post=p, user=user)
+        Post.objects.filter(pk=p.pk).update(pins=1)
+
+        user.delete()
+        self.assertEqual(Post.objects.get(pk=1).pins, 0)
+
+    def test_unpin_unauth(self):
+        p = Post.objects.get(pk=1)
+        res = self.client.delete(reverse('pin_post', kwargs={'uuid': p.uuid}))
+        self.assertEqual(res.status_code, s.HTTP_401_UNAUTHORIZED)
+
     def test_pin_404(self):
         res = self.client.put(reverse('pin_post', kwargs={'uuid': uuid4()}),
                               HTTP_AUTHORIZATION=f'Bearer {self.token}')
@@ -288,6 +378,7 @@ class CommentDetailViewTest(APITestCase):
 
         p = Post.objects.get(pk=1)
         self.assertEqual(p.comments.count(), 1)
+        self.assertEqual(p.comment_count, 1)
 
     def test_create_comment_unauth(self):
         self.assertEqual(self.post.comments.count(), 0)
@@ -311,8 +402,8 @@ class CommentDetailViewTest(APITestCase):
         res = self.client.get(
             reverse('comment_list_create', kwargs={'uuid': self.post.uuid}))
         self.assertEqual(res.status_code, s.HTTP_200_OK)
-        self.assertDictEqual(comments.data[0], res.data[0])
-        self.assertDictEqual(comments.data[1], res.data[1])
+        self.assertDictEqual(comments.data[0], res.data['results'][0])
+        self.assertDictEqual(comments.data[1], res.data['results'][1])
 
 
 class CommentRetrieveDestroyViewTest(APITestCase):
@@ -320,7 +411,7 @@ class CommentRetrieveDestroyViewTest(APITestCase):
     @classmethod
     def setUpTestData(cls):
         user = User.objects.create_user(username='test', password='password')
-        post = Post.objects.create(text='post1', author=user)
+        post = Post.objects.create(text='post1', author=user, comment_count=1)
         User.objects.create_user(username='test2', password='password')
         Comment.objects.create(text='comment', author=user, post=post)
 
@@ -348,6 +439,7 @@ class CommentRetrieveDestroyViewTest(APITestCase):
         res = self.client.delete(self.url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
         self.assertEqual(res.status_code, s.HTTP_204_NO_CONTENT)
         self.assertEqual(Post.objects.get(pk=1).get_comment_count(), 0)
+        self.assertEqual(Post.objects.get(pk=1).comment_count, 0)
 
     def test_delete_comment_unauth(self):
         res = self.client.delete(self.url)
@@ -364,6 +456,17 @@ class CommentRetrieveDestroyViewTest(APITestCase):
         res = self.client.get(self.url)
         self.assertDictEqual(comment.data, res.data)
 
+    def test_delete_commenter(self):
+        commenter = User.objects.create_user(username='test3', password='pw')
+        Comment.objects.create(text='comment', author=commenter, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=2)
+        url = reverse('comment_list_create', kwargs={'uuid': self.post.uuid})
+        etag = self.client.get(url)['ETag']
+
+        commenter.delete()
+        self.assertEqual(Post.objects.get(pk=1).comment_count, 1)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
 
 class UserPostListAPIViewTest(APITestCase):
 
@@ -385,17 +488,1161 @@ class UserPostListAPIViewTest(APITestCase):
         res = self.client.get(
             reverse('get_user_posts', kwargs={'uuid': self.user.uuid}))
 
-        self.assertDictEqual(posts.data[0], res.data[0])
-        self.assertDictEqual(posts.data[1], res.data[1])
-        self.assertDictEqual(posts.data[2], res.data[2])
+        self.assertDictEqual(posts.data[0], res.data['results'][0])
+        self.assertDictEqual(posts.data[1], res.data['results'][1])
+        self.assertDictEqual(posts.data[2], res.data['results'][2])
 
     def test_no_posts(self):
         res = self.client.get(
             reverse('get_user_posts', kwargs={'uuid': self.user2.uuid}))
 
-        self.assertEqual(res.data, [])
+        self.assertEqual(res.data['results'], [])
 
     def test_bad_uuid(self):
         res = self.client.get(
             reverse('get_user_posts', kwargs={'uuid': uuid4()}))
-        self.assertEqual(res.data, [])
+        self.assertEqual(res.data['results'], [])
+
+
+class QueryCountTest(APITestCase):
+    """
+    Regression tests making sure the post endpoints run a constant number of
+    queries no matter how many posts, comments or authors are on the page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='test', password='password')
+        user2 = User.objects.create_user(username='test2', password='password')
+        for i in range(5):
+            post = Post.objects.create(text=f'post{i}', author=user)
+            Post.objects.create(text=f'other{i}', author=user2)
+            for j in range(i):
+                Comment.objects.create(text='comment', post=post,
+                                       author=user2 if j % 2 else user)
+        call_command('repair_comment_counts', stdout=StringIO())
+
+    def setUp(self):
+        res = self.client.post(reverse('token_login'), data={
+            'username': 'test',
+            'password': 'password',
+        })
+        self.token = res.data.get('access')
+        self.user = User.objects.get(username='test')
+        self.post = Post.objects.filter(author=self.user).latest('id')
+
+    def test_post_list_queries(self):
+        # the user is built from the token claims, one query for the token
+        # revocations and one for the posts
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse('post_list_create'),
+                                  HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['comments'], 4)
+
+    def test_post_detail_queries(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(res.data['comments'], 4)
+
+    def test_comment_list_queries(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                reverse('comment_list_create', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 4)
+
+    def test_user_posts_queries(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                reverse('get_user_posts', kwargs={'uuid': self.user.uuid}))
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_recent_posts_queries(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(reverse('recent_posts'))
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
+        self.assertListEqual(
+            sorted(p['comments'] for p in res.data['results']),
+                             [0, 0, 0, 0, 0, 0, 1, 2, 3, 4])
+
+    def test_repair_comment_counts(self):
+        Post.objects.update(comment_count=100)
+        call_command('repair_comment_counts', batch_size=2, stdout=StringIO())
+
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, post.get_comment_count())
+
+
+class KeysetPaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='test', password='password')
+        for i in range(7):
+            Post.objects.create(text=f'post{i}', author=user)
+        # give a few posts the same timestamp to check ties are stable
+        Post.objects.filter(pk__in=[3, 4, 5]).update(
+            date_created=Post.objects.get(pk=3).date_created)
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.url = reverse('get_user_posts', kwargs={'uuid': self.user.uuid})
+
+    def test_pages(self):
+        expected = [str(p.uuid) for p in Post.objects.order_by(
+            '-date_created', '-id')]
+
+        seen = []
+        res = self.client.get(self.url, data={'limit': 2})
+        while True:
+            self.assertEqual(res.status_code, s.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            seen += [p['uuid'] for p in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertListEqual(expected, seen)
+
+    def test_page_query_count(self):
+        res = self.client.get(self.url, data={'limit': 2})
+        with self.assertNumQueries(1):
+            self.client.get(res.data['next'])
+
+    def test_default_limit(self):
+        res = self.client.get(self.url)
+        self.assertEqual(len(res.data['results']), 7)
+        self.assertIsNone(res.data['next'])
+
+    def test_limit_cap(self):
+        res = self.client.get(self.url, data={'limit': 10 ** 6})
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 7)
+
+    def test_bad_cursor(self):
+        res = self.client.get(self.url, data={'cursor': 'not-a-cursor'})
+        self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND)
+
+
+@override_settings(PIN_BUFFER={
+    'ENABLED': True, 'FLUSH_INTERVAL': 0, 'MAX_PENDING': 3})
+class PinBufferTest(APITransactionTestCase):
+    """
+    Pins with the write-behind buffer enabled. These run in real transactions
+    because buffered pins are only added once the pin is committed.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'test{i}',
+                                               password='password')
+                      for i in range(3)]
+        self.post = Post.objects.create(text='post', author=self.users[0])
+        self.url = reverse('pin_post', kwargs={'uuid': self.post.uuid})
+
+    def tearDown(self):
+        buffer.flush()
+
+    def test_page_reads_buffer_once(self):
+        for i in range(3):
+            Post.objects.create(text=f'post{i}', author=self.users[0])
+        self.client.force_authenticate(self.users[0])
+        self.client.put(self.url)
+
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many, \
+                mock.patch.object(buffer, 'get_delta') as get_delta:
+            res = self.client.get(reverse('recent_posts'))
+        get_delta.assert_not_called()
+        # once for the serializer and once for the ETag
+        self.assertEqual(get_many.call_count, 2)
+        pinned = [post for post in res.data['results']
+                  if post['uuid'] == str(self.post.uuid)]
+        self.assertEqual(pinned[0]['pins'], 1)
+
+    def test_pin_buffered(self):
+        self.client.force_authenticate(self.users[0])
+        res = self.client.put(self.url)
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+
+        # not written yet but visible to readers
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 0)
+        res = self.client.get(
+            reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.data['pins'], 1)
+
+        self.assertDictEqual(buffer.flush(), {self.post.pk: 1})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 1)
+        self.assertEqual(buffer.get_delta(self.post.pk), 0)
+
+    def test_unpin_buffered(self):
+        self.client.force_authenticate(self.users[0])
+        self.client.put(self.url)
+        buffer.flush()
+        self.client.delete(self.url)
+
+        self.assertDictEqual(buffer.flush(), {self.post.pk: -1})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 0)
+
+    def test_flush_when_full(self):
+        for user in self.users:
+            self.client.force_authenticate(user)
+            self.client.put(self.url)
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 3)
+        self.assertEqual(buffer.get_delta(self.post.pk), 0)
+
+    def test_flush_many_posts(self):
+        post2 = Post.objects.create(text='post2', author=self.users[0])
+        buffer.add(self.post.pk, 1)
+        buffer.add(post2.pk, -1)
+
+        with self.assertNumQueries(1):
+            buffer.flush()
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 1)
+        self.assertEqual(Post.objects.get(pk=post2.pk).pins, -1)
+
+    def test_concurrent_flush(self):
+        other = PinBuffer()
+        buffer.add(self.post.pk, 2)
+        other.add(self.post.pk, 3)
+        get, flushed = cache.get, []
+
+        def get_then_flush(key, *args):
+            # the other process flushes between this get and its decr
+            value = get(key, *args)
+            if not flushed:
+                flushed.append(key)
+                other.flush()
+            return value
+
+        with mock.patch.object(cache, 'get', get_then_flush):
+            self.assertDictEqual(buffer.flush(), {})
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).pins, 5)
+        self.assertEqual(buffer.get_delta(self.post.pk), 0)
+
+
+class PostCacheTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='test', password='password')
+        post = Post.objects.create(text='post', author=user, comment_count=1)
+        Comment.objects.create(text='comment', author=user, post=post)
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.post = Post.objects.get(pk=1)
+        self.detail_url = reverse('post_detail', kwargs={'uuid': self.post.uuid})
+        self.comments_url = reverse('comment_list_create',
+                                    kwargs={'uuid': self.post.uuid})
+        self.client.force_authenticate(self.user)
+
+    def test_detail_cached(self):
+        res = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.detail_url)
+        self.assertDictEqual(res.data, cached.data)
+
+    def test_comments_cached(self):
+        res = self.client.get(self.comments_url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.comments_url)
+        self.assertDictEqual(res.data, cached.data)
+
+    def test_update_invalidates(self):
+        self.client.get(self.detail_url)
+        self.client.put(self.detail_url, data={'text': 'edited'})
+
+        res = self.client.get(self.detail_url)
+        self.assertEqual(res.data['text'], 'edited')
+        self.assertTrue(res.data['edited'])
+
+    def test_delete_invalidates(self):
+        self.client.get(self.detail_url)
+        self.client.delete(self.detail_url)
+
+        res = self.client.get(self.detail_url)
+        self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND)
+
+    def test_comment_invalidates(self):
+        self.client.get(self.detail_url)
+        self.client.get(self.comments_url)
+        self.client.post(self.comments_url, data={'text': 'new comment'})
+
+        self.assertEqual(self.client.get(self.detail_url).data['comments'], 2)
+        res = self.client.get(self.comments_url)
+        self.assertEqual(res.data['results'][0]['text'], 'new comment')
+
+        comment = Comment.objects.get(text='comment')
+        self.client.delete(reverse('delete_comment', kwargs={
+            'post_uuid': self.post.uuid, 'comment_uuid': comment.uuid}))
+        self.assertEqual(self.client.get(self.detail_url).data['comments'], 1)
+
+    def test_pin_invalidates(self):
+        self.client.get(self.detail_url)
+        self.client.put(reverse('pin_post', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(self.client.get(self.detail_url).data['pins'], 1)
+
+    def test_missing_post_not_cached(self):
+        uuid = uuid4()
+        res = self.client.get(reverse('post_detail', kwargs={'uuid': uuid}))
+        self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND)
+        self.client.get(reverse('comment_list_create', kwargs={'uuid': uuid}))
+        self.assertIsNone(cache.get(post_cache.generation_key(uuid)))
+
+    def test_delete_drops_generation(self):
+        self.client.get(self.detail_url)
+        self.client.delete(self.detail_url)
+        self.assertIsNone(cache.get(post_cache.generation_key(self.post.uuid)))
+
+    @override_settings(POST_CACHE={'TIMEOUT': 60, 'GENERATION_TIMEOUT': 1})
+    def test_generation_timeout(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            post_cache.get_generation(uuid4())
+            add.assert_not_called()
+            cache.delete(post_cache.generation_key(self.post.uuid))
+            post_cache.get_generation(self.post.uuid)
+        self.assertEqual(add.call_args[1]['timeout'], 60)
+
+    @override_settings(POST_CACHE={
+        'LOCK_TIMEOUT': 1, 'LOCK_POLL_INTERVAL': 0.01})
+    def test_waits_for_lock(self):
+        """
+        While another request holds the lock readers wait for its result
+        instead of computing the payload again.
+        """
+        key = post_cache.make_key(self.post.uuid, 'test')
+        cache.add(f'{key}:lock', 1)
+
+        def fill():
+            cache.set(key, 'filled')
+
+        Timer(0.05, fill).start()
+        value = post_cache.get_or_set(self.post.uuid, 'test',
+                                      lambda: self.fail('computed twice'))
+        self.assertEqual(value, 'filled')
+
+    @override_settings(POST_CACHE={
+        'LOCK_TIMEOUT': 0.05, 'LOCK_POLL_INTERVAL': 0.01})
+    def test_lock_timeout(self):
+        key = post_cache.make_key(self.post.uuid, 'test')
+        cache.add(f'{key}:lock', 1)
+
+        value = post_cache.get_or_set(self.post.uuid, 'test', lambda: 'built')
+        self.assertEqual(value, 'built')
+
+
+class TimelineTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='reader', password='password')
+        User.objects.create_user(username='author', password='password')
+        User.objects.create_user(username='other', password='password')
+
+    def setUp(self):
+        self.reader = User.objects.get(username='reader')
+        self.author = User.objects.get(username='author')
+        self.other = User.objects.get(username='other')
+        self.url = reverse('timeline')
+
+    def follow(self, follower, followee):
+        self.client.force_authenticate(follower)
+        self.client.put(reverse('follow', kwargs={'username': followee.username}))
+        run_pending()
+
+    def create_post(self, author, text):
+        self.client.force_authenticate(author)
+        self.client.post(reverse('post_list_create'), data={'text': text})
+        run_pending()
+        return Post.objects.get(text=text)
+
+    def get_timeline(self, **params):
+        self.client.force_authenticate(self.reader)
+        return self.client.get(self.url, data=params)
+
+    def test_fan_out(self):
+        self.follow(self.reader, self.author)
+        post = self.create_post(self.author, 'followed')
+        self.create_post(self.other, 'not followed')
+
+        self.assertTrue(TimelineEntry.objects.filter(
+            owner=self.reader, post=post).exists())
+        res = self.get_timeline()
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertListEqual([p['text'] for p in res.data['results']],
+                             ['followed'])
+
+    def test_backfill_and_unfollow(self):
+        self.create_post(self.author, 'before follow')
+        self.follow(self.reader, self.author)
+        res = self.get_timeline()
+        self.assertListEqual([p['text'] for p in res.data['results']],
+                             ['before follow'])
+
+        self.client.force_authenticate(self.reader)
+        self.client.delete(
+            reverse('follow', kwargs={'username': self.author.username}))
+        run_pending()
+        self.assertListEqual(self.get_timeline().data['results'], [])
+
+    @override_settings(TIMELINE={'CELEBRITY_FOLLOWERS': 1})
+    def test_celebrity_fan_out_on_read(self):
+        self.follow(self.reader, self.author)
+        self.follow(self.reader, self.other)
+        self.follow(self.author, self.other)
+        self.create_post(self.other, 'celebrity 1')
+        self.create_post(self.author, 'celebrity 2')
+
+        # neither author is written to the timeline table
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        res = self.get_timeline()
+        self.assertListEqual([p['text'] for p in res.data['results']],
+                             ['celebrity 2', 'celebrity 1'])
+
+    @override_settings(TIMELINE={'CELEBRITY_FOLLOWERS': 2})
+    def test_mixed_pages(self):
+        self.follow(self.reader, self.author)
+        self.follow(self.reader, self.other)
+        self.follow(self.author, self.other)
+        for i in range(3):
+            self.create_post(self.author, f'author {i}')
+            self.create_post(self.other, f'other {i}')
+        expected = [p.text for p in Post.objects.order_by(
+            '-date_created', '-id')]
+
+        seen = []
+        res = self.get_timeline(limit=4)
+        seen += [p['text'] for p in res.data['results']]
+        self.client.force_authenticate(self.reader)
+        res = self.client.get(res.data['next'])
+        seen += [p['text'] for p in res.data['results']]
+
+        self.assertListEqual(expected, seen)
+        self.assertIsNone(res.data['next'])
+
+    def test_timeline_queries(self):
+        self.follow(self.reader, self.author)
+        for i in range(5):
+            self.create_post(self.author, f'post {i}')
+
+        self.client.force_authenticate(self.reader)
+        # entries, celebrity posts and the posts themselves
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_timeline_unauth(self):
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, s.HTTP_401_UNAUTHORIZED)
+
+
+class TrendingTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='test', password='password')
+        Post.objects.create(text='quiet', author=user)
+        Post.objects.create(text='pinned', author=user, pins=10)
+        Post.objects.create(text='discussed', author=user, pins=2,
+                            comment_count=10)
+        old = Post.objects.create(text='old', author=user, pins=100)
+        Post.objects.filter(pk=old.pk).update(
+            date_created=old.date_created - dt.timedelta(days=7))
+
+    def setUp(self):
+        self.url = reverse('trending_posts')
+
+    def test_score_decays(self):
+        fresh = trending.get_score(10, 0, dt.timedelta(hours=1))
+        stale = trending.get_score(10, 0, dt.timedelta(hours=24))
+        self.assertGreater(fresh, stale)
+
+    def test_refresh(self):
+        self.assertEqual(trending.refresh(), 3)
+        self.assertFalse(TrendingScore.objects.filter(
+            post__text='old').exists())
+
+        # refreshing replaces the old scores
+        self.assertEqual(trending.refresh(), 3)
+        self.assertEqual(TrendingScore.objects.count(), 3)
+
+    def test_trending_feed(self):
+        call_command('refresh_trending', stdout=StringIO())
+
+        with self.assertNumQueries(1):
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertListEqual([p['text'] for p in res.data['results']],
+                             ['discussed', 'pinned', 'quiet'])
+
+    def test_trending_pages(self):
+        trending.refresh()
+        res = self.client.get(self.url, data={'limit': 2})
+        self.assertEqual(len(res.data['results']), 2)
+
+        res = self.client.get(res.data['next'])
+        self.assertListEqual([p['text'] for p in res.data['results']],
+                             ['quiet'])
+        self.assertIsNone(res.data['next'])
+
+
+class BulkCreateTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='password')
+        cls.post = Post.objects.create(text='post', author=cls.user)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.url = reverse('post_batch')
+        self.comments_url = reverse('comment_batch',
+                                    kwargs={'uuid': self.post.uuid})
+
+    def test_create_posts(self):
+        res = self.client.post(self.url, data=[
+            {'text': 'one'}, {'text': 'two'}, {'text': 'three'},
+        ], format='json')
+        self.assertEqual(res.status_code, s.HTTP_201_CREATED)
+
+        results = res.data['results']
+        self.assertListEqual([r['status'] for r in results], [201] * 3)
+        self.assertListEqual([r['data']['text'] for r in results],
+                             ['one', 'two', 'three'])
+        for result in results:
+            post = Post.objects.get(uuid=result['data']['uuid'])
+            self.assertEqual(post.author, self.user)
+            self.assertDictEqual(result['data'], PostSerializer(post).data)
+        self.assertEqual(Job.objects.filter(name='posts.fan_out').count(), 3)
+
+    def test_constant_queries(self):
+        # insert the posts, fetch their ids and queue the fan out and search
+        # index jobs in a savepoint
+        with self.assertNumQueries(6):
+            self.client.post(self.url, data=[{'text': 'post'}] * 2,
+                             format='json')
+        with self.assertNumQueries(6):
+            self.client.post(self.url, data=[{'text': 'post'}] * 20,
+                             format='json')
+
+    def test_partial_success(self):
+        res = self.client.post(self.url, data=[
+            {'text': 'ok'}, {}, {'text': 'x' * 1000}, {'text': 'also ok'},
+        ], format='json')
+        self.assertEqual(res.status_code, s.HTTP_207_MULTI_STATUS)
+
+        results = res.data['results']
+        self.assertListEqual([r['status'] for r in results],
+                             [201, 400, 400, 201])
+        self.assertIn('text', results[1]['errors'])
+        self.assertEqual(Post.objects.filter(
+            text__in=['ok', 'also ok']).count(), 2)
+
+    def test_all_invalid(self):
+        res = self.client.post(self.url, data=[{}, 'text'], format='json')
+        self.assertEqual(res.status_code, s.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_not_a_list(self):
+        for data in ({'text': 'post'}, []):
+            res = self.client.post(self.url, data=data, format='json')
+            self.assertEqual(res.status_code, s.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK={'MAX_BATCH_SIZE': 2})
+    def test_max_batch_size(self):
+        res = self.client.post(self.url, data=[{'text': 'post'}] * 3,
+                               format='json')
+        self.assertEqual(res.status_code, s.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_unauth(self):
+        self.client.force_authenticate(None)
+        res = self.client.post(self.url, data=[{'text': 'post'}],
+                               format='json')
+        self.assertEqual(res.status_code, s.HTTP_401_UNAUTHORIZED)
+
+    def test_create_comments(self):
+        res = self.client.post(self.comments_url, data=[
+            {'text': 'one'}, {'text': ''}, {'text': 'two'},
+        ], format='json')
+        self.assertEqual(res.status_code, s.HTTP_207_MULTI_STATUS)
+        self.assertListEqual([r['status'] for r in res.data['results']],
+                             [201, 400, 201])
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.post.comments.count(), 2)
+        comment = Comment.objects.get(text='one')
+        self.assertDictEqual(res.data['results'][0]['data'],
+                             CommentSerializer(comment).data)
+
+    def test_comments_invalidate_cache(self):
+        res = self.client.get(reverse('post_detail',
+                                      kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.data['comments'], 0)
+
+        self.client.post(self.comments_url, data=[{'text': 'one'}],
+                         format='json')
+        res = self.client.get(reverse('post_detail',
+                                      kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(res.data['comments'], 1)
+
+    def test_comments_missing_post(self):
+        res = self.client.post(
+            reverse('comment_batch', kwargs={'uuid': uuid4()}),
+            data=[{'text': 'one'}], format='json')
+        self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND)
+
+
+class BatchReadTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='test', password='password')
+        cls.posts = [Post.objects.create(text=f'post{i}', author=user)
+                     for i in range(3)]
+
+    def setUp(self):
+        self.url = reverse('post_batch')
+
+    def get(self, *uuids):
+        return self.client.get(self.url, data={
+            'uuids': ','.join(str(uuid) for uuid in uuids)})
+
+    def test_keeps_order(self):
+        uuids = [self.posts[2].uuid, self.posts[0].uuid, self.posts[1].uuid]
+        with self.assertNumQueries(1):
+            res = self.get(*uuids)
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        self.assertListEqual([p['uuid'] for p in res.data['results']],
+                             [str(uuid) for uuid in uuids])
+        self.assertListEqual(res.data['missing'], [])
+
+    def test_matches_detail(self):
+        res = self.get(self.posts[0].uuid)
+        detail = self.client.get(
+            reverse('post_detail', kwargs={'uuid': self.posts[0].uuid}))
+        self.assertDictEqual(res.data['results'][0], detail.data)
+
+    def test_missing(self):
+        missing = uuid4()
+        res = self.get(missing, self.posts[0].uuid, self.posts[0].uuid)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertListEqual([str(uuid) for uuid in res.data['missing']],
+                             [str(missing)])
+
+    def test_invalid(self):
+        for uuids in ('', 'not-a-uuid', f'{self.posts[0].uuid},nope'):
+            res = self.client.get(self.url, data={'uuids': uuids})
+            self.assertEqual(res.status_code, s.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK={'MAX_READ_SIZE': 2})
+    def test_max_read_size(self):
+        res = self.get(*[post.uuid for post in self.posts])
+        self.assertEqual(res.status_code, s.HTTP_400_BAD_REQUEST)
+
+
+class ValuesSerializerTest(APITestCase):
+    """
+    Contract tests, the values serializers must render exactly the same bytes
+    as the model serializers they stand in for.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='tést', password='pw')
+        other = User.objects.create_user(username='other', password='pw')
+        cls.post = Post.objects.create(text='ünïcode ✓', author=cls.author,
+                                       pins=3, edited=True)
+        Post.objects.create(text='post "quoted"', author=other)
+        for i, user in enumerate([cls.author, other, other]):
+            Comment.objects.create(text=f'comment {i}', post=cls.post,
+                                   author=user)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameOutput(self, serializer, values_serializer, queryset):
+        queryset = queryset.order_by('-date_created', '-id')
+        expected = serializer(queryset, many=True).data
+        data = values_serializer(values_serializer.values(queryset),
+                                 many=True).data
+        self.assertEqual(JSONRenderer().render(data),
+                         JSONRenderer().render(expected))
+        return data
+
+    def test_post(self):
+        self.assertSameOutput(PostSerializer, PostValuesSerializer,
+                              Post.objects.with_summary())
+
+    def test_comment(self):
+        data = self.assertSameOutput(
+            CommentSerializer, CommentValuesSerializer,
+            Comment.objects.select_related('author', 'post'))
+        self.assertEqual(len(data), 3)
+
+    @override_settings(PIN_BUFFER={'ENABLED': True, 'FLUSH_INTERVAL': 0})
+    def test_unflushed_pins(self):
+        buffer.add(self.post.pk, 2)
+        try:
+            data = self.assertSameOutput(PostSerializer, PostValuesSerializer,
+                                         Post.objects.filter(pk=self.post.pk))
+        finally:
+            buffer.flush()
+        self.assertEqual(data[0]['pins'], 5)
+
+    def test_views(self):
+        urls = [
+            (reverse('recent_posts'), PostSerializer(
+                Post.objects.order_by('-date_created', '-id'), many=True)),
+            (reverse('get_user_posts', kwargs={'uuid': self.author.uuid}),
+             PostSerializer(Post.objects.filter(author=self.author),
+                            many=True)),
+            (reverse('comment_list_create', kwargs={'uuid': self.post.uuid}),
+             CommentSerializer(self.post.comments.order_by(
+                 '-date_created', '-id'), many=True)),
+        ]
+        for url, serializer in urls:
+            res = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(res.status_code, s.HTTP_200_OK)
+            self.assertEqual(res.content, JSONRenderer().render(
+                {'next': None, 'results': serializer.data}))
+
+    def test_writes_use_model_serializer(self):
+        self.client.force_authenticate(self.author)
+        res = self.client.post(
+            reverse('comment_list_create', kwargs={'uuid': self.post.uuid}),
+            data={'text': 'new'})
+        self.assertEqual(res.status_code, s.HTTP_201_CREATED)
+        self.assertEqual(res.data['author']['username'], 'tést')
+
+
+class ConditionalGetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='test', password='pw')
+        cls.post = Post.objects.create(text='post', author=cls.author)
+        Comment.objects.create(text='comment', post=cls.post, author=cls.author)
+        cls.detail_url = reverse('post_detail', kwargs={'uuid': cls.post.uuid})
+        cls.comments_url = reverse('comment_list_create',
+                                   kwargs={'uuid': cls.post.uuid})
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, queries, **headers):
+        with self.assertNumQueries(queries):
+            res = self.client.get(url, **headers)
+        self.assertEqual(res.status_code, s.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        return res
+
+    def test_detail(self):
+        res = self.client.get(self.detail_url)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        # validators are cached with the payload
+        self.assertNotModified(self.detail_url, 0,
+                               HTTP_IF_NONE_MATCH=res['ETag'])
+        # one query finds the post for a new cache generation
+        cache.clear()
+        not_modified = self.assertNotModified(
+            self.detail_url, 2, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(not_modified['ETag'], res['ETag'])
+        self.assertNotModified(self.detail_url, 0,
+                               HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.client.force_authenticate(self.author)
+        self.client.put(self.detail_url, data={'text': 'edited'})
+        self.client.force_authenticate(None)
+        changed = self.client.get(self.detail_url,
+                                  HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(changed.status_code, s.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], res['ETag'])
+
+    def test_pins_change_detail(self):
+        res = self.client.get(self.detail_url)
+        self.client.force_authenticate(self.author)
+        self.client.put(reverse('pin_post', kwargs={'uuid': self.post.uuid}))
+
+        changed = self.client.get(self.detail_url,
+                                  HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(changed.status_code, s.HTTP_200_OK)
+        self.assertEqual(changed.data['pins'], 1)
+
+    def test_comments(self):
+        res = self.client.get(self.comments_url)
+        self.assertIn('Last-Modified', res)
+        self.assertNotModified(self.comments_url, 0,
+                               HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.client.force_authenticate(self.author)
+        self.client.post(self.comments_url, data={'text': 'another'})
+        changed = self.client.get(self.comments_url,
+                                  HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(changed.status_code, s.HTTP_200_OK)
+        self.assertEqual(len(changed.data['results']), 2)
+
+    def test_page(self):
+        url = reverse('get_user_posts', kwargs={'uuid': self.author.uuid})
+        res = self.client.get(url)
+        self.assertNotIn('Last-Modified', res)
+        self.assertNotModified(url, 1, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        Post.objects.filter(pk=self.post.pk).increment(pins=1)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(changed.status_code, s.HTTP_200_OK)
+
+        # a new post changes the first page, an older one has its own ETag
+        Post.objects.create(text='newer', author=self.author)
+        newer = self.client.get(url, HTTP_IF_NONE_MATCH=changed['ETag'])
+        self.assertEqual(newer.status_code, s.HTTP_200_OK)
+
+    def test_recent(self):
+        res = self.client.get(reverse('recent_posts'))
+        self.assertNotModified(reverse('recent_posts'), 1,
+                               HTTP_IF_NONE_MATCH=res['ETag'])
+
+    def test_missing_post(self):
+        url = reverse('post_detail', kwargs={'uuid': uuid4()})
+        res = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
+
+
+class RoutingTest(APITestCase):
+
+    def test_recent_reachable(self):
+        self.assertEqual(resolve('/posts/recent/').url_name, 'recent_posts')
+        res = self.client.get('/posts/recent/')
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+
+    def test_malformed_ids(self):
+        uuid = uuid4()
+        paths = [
+            '/posts/not-a-uuid/',
+            '/posts/1234/pin/',
+            f'/posts/{str(uuid)[:-1]}/comments/',
+            f'/posts/{uuid}/comments/nope/',
+            '/posts/user/nope/',
+        ]
+        for path in paths:
+            with self.assertNumQueries(0):
+                res = self.client.get(path)
+            self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND, path)
+
+    def test_unknown_ids(self):
+        self.assertEqual(resolve(f'/posts/{uuid4()}/').url_name, 'post_detail')
+        res = self.client.get(f'/posts/{uuid4()}/')
+        self.assertEqual(res.status_code, s.HTTP_404_NOT_FOUND)
+
+
+class TagTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='pw')
+        cls.bob = User.objects.create_user(username='bob.b', password='pw')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, text):
+        res = self.client.post(reverse('post_list_create'), data={'text': text})
+        return Post.objects.get(uuid=res.data['uuid'])
+
+    def tag_texts(self, name, **params):
+        res = self.client.get(reverse('tag_posts', kwargs={'name': name}),
+                              data=params)
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        return [p['text'] for p in res.data['results']]
+
+    def test_extract(self):
+        self.assertSetEqual(
+            tags.extract_tags('#One #one two#three ##four #five!'),
+            {'one', 'five'})
+        self.assertSetEqual(tags.extract_tags('#' + 'x' * 65), set())
+        self.assertSetEqual(
+            tags.extract_mentions('hi @bob.b. and a@b.com @@al @x-y'),
+            {'bob.b', 'x-y'})
+
+    def test_tag_feed(self):
+        self.create_post('first #Django')
+        self.create_post('no tags')
+        self.create_post('second #django #python')
+
+        self.assertListEqual(self.tag_texts('DJANGO'),
+                             ['second #django #python', 'first #Django'])
+        self.assertListEqual(self.tag_texts('python'),
+                             ['second #django #python'])
+        self.assertListEqual(self.tag_texts('missing'), [])
+        self.assertEqual(Tag.objects.get(name='django').post_count, 2)
+
+    def test_tag_pages(self):
+        for i in range(5):
+            self.create_post(f'#paged {i}')
+        texts = []
+        res = self.client.get(reverse('tag_posts', kwargs={'name': 'paged'}),
+                              data={'limit': 2})
+        while True:
+            texts += [p['text'] for p in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+        self.assertListEqual(texts, [f'#paged {i}' for i in range(4, -1, -1)])
+
+    def test_tag_feed_queries(self):
+        for i in range(3):
+            self.create_post(f'#hot {i}')
+        # post tags and the posts themselves
+        with self.assertNumQueries(2):
+            self.client.get(reverse('tag_posts', kwargs={'name': 'hot'}))
+
+    def test_untagged_post_queries(self):
+        # the post and its fan out and search jobs, nothing for tags
+        with self.assertNumQueries(3):
+            self.client.post(reverse('post_list_create'),
+                             data={'text': 'plain text'})
+
+    def test_edit_and_delete(self):
+        post = self.create_post('#old #kept')
+        self.client.put(reverse('post_detail', kwargs={'uuid': post.uuid}),
+                        data={'text': '#new #kept'})
+        self.assertListEqual(self.tag_texts('old'), [])
+        self.assertListEqual(self.tag_texts('new'), ['#new #kept'])
+        counts = dict(Tag.objects.values_list('name', 'post_count'))
+        self.assertDictEqual(counts, {'old': 0, 'kept': 1, 'new': 1})
+
+        self.client.delete(reverse('post_detail', kwargs={'uuid': post.uuid}))
+        self.assertFalse(PostTag.objects.exists())
+        self.assertFalse(Tag.objects.filter(post_count__gt=0).exists())
+        self.assertListEqual(tags.trending(), [])
+
+    def test_cascaded_delete(self):
+        author = User.objects.create_user(username='author', password='pw')
+        self.client.force_authenticate(author)
+        self.create_post('#django')
+        self.create_post('#django #python')
+        self.create_post('#python')
+        Post.objects.filter(text='#python').delete()
+        counts = dict(Tag.objects.values_list('name', 'post_count'))
+        self.assertDictEqual(counts, {'django': 2, 'python': 1})
+
+        # deleting the author deletes their posts
+        author.delete()
+        self.assertFalse(Tag.objects.filter(post_count__gt=0).exists())
+        self.assertListEqual(tags.trending(), [])
+
+    def test_mentions(self):
+        post = self.create_post('hi @bob.b and @nobody')
+        url = reverse('mention_posts', kwargs={'uuid': self.bob.uuid})
+        res = self.client.get(url)
+        self.assertListEqual([p['text'] for p in res.data['results']],
+                             ['hi @bob.b and @nobody'])
+
+        self.client.put(reverse('post_detail', kwargs={'uuid': post.uuid}),
+                        data={'text': 'bye'})
+        self.assertFalse(Mention.objects.exists())
+        res = self.client.get(url)
+        self.assertListEqual(res.data['results'], [])
+
+    def test_bulk_create(self):
+        self.client.post(reverse('post_batch'), format='json', data=[
+            {'text': '#bulk one @bob.b'}, {'text': '#bulk two'},
+            {'text': 'untagged'}])
+        self.assertCountEqual(self.tag_texts('bulk'),
+                              ['#bulk one @bob.b', '#bulk two'])
+        self.assertEqual(Mention.objects.filter(user=self.bob).count(), 1)
+        self.assertEqual(Tag.objects.get(name='bulk').post_count, 2)
+
+    def test_trending_tags(self):
+        for text in ('#a #b', '#a', '#a #c', '#b'):
+            self.create_post(text)
+        old = self.create_post('#old #c')
+        hour = tags.get_hour(old.date_created - dt.timedelta(hours=48))
+        TagActivity.objects.filter(tag__name='old').update(hour=hour)
+
+        res = self.client.get(reverse('trending_tags'))
+        self.assertListEqual(res.data['results'], [
+            {'name': 'a', 'count': 3},
+            {'name': 'b', 'count': 2},
+            {'name': 'c', 'count': 2},
+        ])
+
+        self.assertEqual(tags.prune(), 1)
+        self.assertEqual(Tag.objects.get(name='old').post_count, 1)
+
+    def test_backfill(self):
+        author = self.user
+        Post.objects.bulk_create([
+            Post(text='#back @bob.b', author=author),
+            Post(text='#back #fill', author=author),
+            Post(text='plain', author=author)])
+        self.assertFalse(PostTag.objects.exists())
+
+        for _ in range(2):  # backfilling again changes nothing
+            out = StringIO()
+            call_command('backfill_tags', batch_size=2, stdout=out)
+            self.assertIn('3 posts', out.getvalue())
+            counts = dict(Tag.objects.values_list('name', 'post_count'))
+            self.assertDictEqual(counts, {'back': 2, 'fill': 1})
+            self.assertEqual(Mention.objects.count(), 1)
+        self.assertEqual(TagActivity.objects.get(tag__name='back').count, 2)
+
+
+class AsyncReadTest(APITransactionTestCase):
+    """
+    The read endpoints served on the event loop by posts/asgi.py. These run in
+    real transactions because rows are loaded by other threads.
+    """
+
+    def setUp(self):
+        from mysite.asgi import application
+
+        self.application = application
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='pw')
+        self.post = Post.objects.create(text='post', author=self.user)
+        for i in range(3):
+            Comment.objects.create(text=f'comment {i}', author=self.user,
+                                   post=self.post)
+        Post.objects.create(text='other', author=self.user)
+
+    def call(self, path, method='GET', **headers):
+        """
+        Return the status, headers and body of an ASGI request.
+        """
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path,
+            'query_string': query.encode('ascii'), 'root_path': '',
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1'))
+                        for name, value in headers.items()],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.application(scope, receive, send))
+        start, body = messages[0], b''.join(
+            message.get('body', b'') for message in messages[1:])
+        return start['status'], {name.decode('latin1').lower(): value.decode(
+            'latin1') for name, value in start['headers']}, body
+
+    def paths(self):
+        return [
+            reverse('recent_posts'),
+            reverse('recent_posts') + '?limit=1',
+            reverse('get_user_posts', kwargs={'uuid': self.user.uuid}),
+            reverse('post_detail', kwargs={'uuid': self.post.uuid}),
+            reverse('comment_list_create', kwargs={'uuid': self.post.uuid}),
+        ]
+
+    def test_same_as_sync(self):
+        for path in self.paths():
+            cache.clear()
+            status, headers, body = self.call(path)
+            res = self.client.get(path)
+            self.assertEqual(status, res.status_code, path)
+            self.assertEqual(json.loads(body), json.loads(res.content), path)
+            self.assertEqual(headers['etag'], res['ETag'], path)
+            for header in ('Allow', 'X-Frame-Options', 'X-Content-Type-Options'):
+                self.assertEqual(headers[header.lower()], res[header], path)
+
+    def test_not_modified(self):
+        for path in self.paths():
+            _, headers, _ = self.call(path)
+            status, _, body = self.call(path, If_None_Match=headers['etag'])
+            self.assertEqual(status, s.HTTP_304_NOT_MODIFIED, path)
+            self.assertEqual(body, b'')
+
+    def test_not_found(self):
+        status, _, body = self.call(
+            reverse('post_detail', kwargs={'uuid': uuid4()}))
+        self.assertEqual(status, s.HTTP_404_NOT_FOUND)
+        self.assertDictEqual(json.loads(body), {'detail': 'Not found.'})
+
+        status, _, body = self.call(reverse('recent_posts') + '?cursor=nope')
+        self.assertEqual(status, s.HTTP_404_NOT_FOUND)
+        self.assertDictEqual(json.loads(body), {'detail': 'Invalid cursor'})
+
+    def test_api_exception(self):
+        def load(request, uuid):
+            raise PermissionDenied()
+
+        with mock.patch.dict(HANDLERS, {'post_detail': (load, None)}):
+            status, _, body = self.call(
+                reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(status, s.HTTP_403_FORBIDDEN)
+        self.assertDictEqual(json.loads(body), {
+            'detail': 'You do not have permission to perform this action.'})
+
+    def test_server_error(self):
+        def load(request, uuid):
+            raise RuntimeError('boom')
+
+        profiling.durations.clear()
+        with mock.patch.dict(HANDLERS, {'post_detail': (load, None)}), \
+                self.assertLogs('django.request', 'ERROR') as logs:
+            status, _, body = self.call(
+                reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        self.assertEqual(status, s.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertDictEqual(json.loads(body), {'error': 'Server Error (500)'})
+        self.assertIn('boom', logs.output[0])
+        counts, _ = profiling.durations.series[('post_detail', 'total')]
+        self.assertEqual(sum(counts), 1)
+
+    def test_head(self):
+        status, headers, body = self.call(reverse('recent_posts'), 'HEAD')
+        self.assertEqual(status, s.HTTP_200_OK)
+        self.assertEqual(body, b'')
+        self.assertNotEqual(headers['content-length'], '0')
+
+    def test_disallowed_host(self):
+        for path in self.paths():
+            with self.assertLogs('django.security.DisallowedHost'):
+                status, _, _ = self.call(path, Host='evil.example.com')
+            self.assertEqual(status, s.HTTP_400_BAD_REQUEST, path)
+
+    def test_profiled(self):
+        profiling.durations.clear()
+        self.call(reverse('post_detail', kwargs={'uuid': self.post.uuid}))
+        counts, _ = profiling.durations.series[('post_detail', 'total')]
+        self.assertEqual(sum(counts), 1)
+        _, total = profiling.durations.series[('post_detail', 'db')]
+        self.assertGreater(total, 0)
+
+    def test_passes_through(self):
+        # writes, the browsable API and other endpoints go to Django
+        for path, method, headers in [
+                (reverse('post_list_create'), 'POST', {}),
+                (reverse('recent_posts'), 'GET', {'Accept': 'text/html'}),
+                (reverse('timeline'), 'GET', {})]:
+            with mock.patch.object(ReadApplication, 'handle') as handle:
+                self.call(path, method, **headers)
+            handle.assert_not_called()
+
+    @override_settings(ASYNC_READS={'ENABLED': False})
+    def test_disabled(self):
+        with mock.patch.object(ReadApplication, 'handle') as handle:
+            status, _, _ = self.call(reverse('recent_posts'))
+        handle.assert_not_called()
+        self.assertEqual(status, s.HTTP_200_OK)
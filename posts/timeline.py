@@ -0,0 +1,118 @@
+"""
+Precomputed home timelines.
+
+New posts are fanned out to a TimelineEntry row per follower when they are
+created (fan-out-on-write) so reading a timeline is a single range scan of the
+readers own entries. Authors with at least CELEBRITY_FOLLOWERS followers are
+not fanned out, their posts are merged into their followers timelines when
+the timeline is read (fan-out-on-read) instead.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+
+from users.models import Follow
+from .models import Post, TimelineEntry
+
+User = get_user_model()
+
+DEFAULTS = {
+    'CELEBRITY_FOLLOWERS': 10000,
+    'BATCH_SIZE': 1000,
+    'BACKFILL': 50,
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'TIMELINE', {}))
+    return config
+
+
+def is_celebrity(user_id):
+    return User.objects.filter(
+        pk=user_id,
+        follower_count__gte=get_config()['CELEBRITY_FOLLOWERS']).exists()
+
+
+def add_entries(entries):
+    entries = list(entries)
+    # some backends cap how many rows fit in one INSERT
+    batch_size = min(get_config()['BATCH_SIZE'], connection.ops.bulk_batch_size(
+        TimelineEntry._meta.concrete_fields, entries))
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=batch_size, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """
+    Add a new post to the timeline of each of its authors followers.
+    """
+    if is_celebrity(post.author_id):
+        return
+
+    follower_ids = Follow.objects.filter(
+        followee_id=post.author_id).values_list('follower_id', flat=True)
+    add_entries(TimelineEntry(owner_id=follower_id, post_id=post.pk,
+                              date_created=post.date_created)
+                for follower_id in follower_ids.iterator())
+
+
+def backfill(follower_id, followee_id):
+    """
+    Add the latest posts of a newly followed user to the followers timeline.
+    """
+    if is_celebrity(followee_id):
+        return
+
+    posts = Post.objects.filter(author_id=followee_id).order_by(
+        '-date_created', '-id').values_list('id', 'date_created')
+    add_entries(TimelineEntry(owner_id=follower_id, post_id=post_id,
+                              date_created=date_created)
+                for post_id, date_created in posts[:get_config()['BACKFILL']])
+
+
+def remove(follower_id, followee_id):
+    """
+    Remove an unfollowed users posts from the followers timeline.
+    """
+    TimelineEntry.objects.filter(
+        owner_id=follower_id, post__author_id=followee_id).delete()
+
+
+def after(position, id_field):
+    """
+    Filter rows that come after the (date_created, id) position, newest first.
+    """
+    date_created, pk = position
+    return (Q(date_created__lt=date_created) |
+            Q(date_created=date_created, **{f'{id_field}__lt': pk}))
+
+
+def read(user, position=None, limit=20):
+    """
+    Return up to limit posts from the users timeline that come after position,
+    newest first.
+    """
+    entries = TimelineEntry.objects.filter(owner=user)
+    if position is not None:
+        entries = entries.filter(after(position, 'post_id'))
+    rows = list(entries.order_by('-date_created', '-post_id').values_list(
+        'date_created', 'post_id')[:limit])
+
+    celebrities = Follow.objects.filter(
+        follower=user,
+        followee__follower_count__gte=get_config()['CELEBRITY_FOLLOWERS'],
+    ).values_list('followee_id', flat=True)
+    celebrity_posts = Post.objects.filter(author_id__in=celebrities)
+    if position is not None:
+        celebrity_posts = celebrity_posts.filter(after(position, 'id'))
+    rows += celebrity_posts.order_by('-date_created', '-id').values_list(
+        'date_created', 'id')[:limit]
+
+    post_ids = [post_id for _, post_id in sorted(set(rows), reverse=True)]
+    post_ids = post_ids[:limit]
+
+    posts = Post.objects.with_summary().in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
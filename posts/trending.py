@@ -0,0 +1,69 @@
+"""
+Trending posts.
+
+Posts from the last WINDOW_HOURS are scored by their pins and comments,
+decayed by age:
+
+    score = (pins + COMMENT_WEIGHT * comments) / (age_hours + 2) ** GRAVITY
+
+The scores are written to the TrendingScore table by refresh(), which should
+be run periodically with `manage.py refresh_trending`.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Post, TrendingScore
+
+DEFAULTS = {
+    'WINDOW_HOURS': 48,
+    'GRAVITY': 1.8,
+    'COMMENT_WEIGHT': 2,
+    'BATCH_SIZE': 1000,
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'TRENDING', {}))
+    return config
+
+
+def get_score(pins, comments, age, config=None):
+    """
+    Return the trending score of a post with age given as a timedelta.
+    """
+    config = config or get_config()
+    hours = max(age.total_seconds(), 0) / 3600
+    return ((pins + config['COMMENT_WEIGHT'] * comments) /
+            (hours + 2) ** config['GRAVITY'])
+
+
+def refresh(now=None):
+    """
+    Rescore the posts inside the trending window and replace the scores table.
+    Returns the number of posts scored.
+    """
+    config = get_config()
+    now = now or timezone.now()
+    posts = Post.objects.filter(
+        date_created__gte=now - timedelta(hours=config['WINDOW_HOURS']),
+    ).values_list('id', 'pins', 'comment_count', 'date_created')
+
+    scores = [
+        TrendingScore(post_id=post_id, score=get_score(
+            pins, comments, now - date_created, config))
+        for post_id, pins, comments, date_created in posts.iterator()
+    ]
+
+    # some backends cap how many rows fit in one INSERT
+    batch_size = min(config['BATCH_SIZE'], connection.ops.bulk_batch_size(
+        TrendingScore._meta.concrete_fields, scores))
+
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(scores, batch_size=batch_size)
+
+    return len(scores)
@@ -2,22 +2,40 @@ from django.urls import path
 
 from .views import (
     PostListCreateAPIView,
+    PostBatchAPIView,
     PostDetailAPIView,
     PinPostAPIView,
     CommentListCreateAPIView,
+    CommentBatchAPIView,
     CommentRetrieveDestroyAPIView,
     UserPostListAPIView,
-    RecentPostsAPIView
+    RecentPostsAPIView,
+    TimelineAPIView,
+    TagPostListAPIView,
+    MentionPostListAPIView,
+    TrendingTagsAPIView,
+    TrendingPostsAPIView
 )
 
 urlpatterns = [
     path('', PostListCreateAPIView.as_view(), name='post_list_create'),
-    path('<uuid>/', PostDetailAPIView.as_view(), name='post_detail'),
-    path('<uuid>/pin/', PinPostAPIView.as_view(), name='pin_post'),
-    path('<uuid>/comments/', CommentListCreateAPIView.as_view(),
+    path('batch/', PostBatchAPIView.as_view(), name='post_batch'),
+    path('recent/', RecentPostsAPIView.as_view(), name='recent_posts'),
+    path('timeline/', TimelineAPIView.as_view(), name='timeline'),
+    path('trending/', TrendingPostsAPIView.as_view(), name='trending_posts'),
+    path('trending/tags/', TrendingTagsAPIView.as_view(),
+         name='trending_tags'),
+    path('tags/<str:name>/', TagPostListAPIView.as_view(), name='tag_posts'),
+    path('user/<uuid:uuid>/', UserPostListAPIView.as_view(),
+         name='get_user_posts'),
+    path('user/<uuid:uuid>/mentions/', MentionPostListAPIView.as_view(),
+         name='mention_posts'),
+    path('<uuid:uuid>/', PostDetailAPIView.as_view(), name='post_detail'),
+    path('<uuid:uuid>/pin/', PinPostAPIView.as_view(), name='pin_post'),
+    path('<uuid:uuid>/comments/', CommentListCreateAPIView.as_view(),
          name='comment_list_create'),
-    path('<post_uuid>/comments/<comment_uuid>/',
+    path('<uuid:uuid>/comments/batch/', CommentBatchAPIView.as_view(),
+         name='comment_batch'),
+    path('<uuid:post_uuid>/comments/<uuid:comment_uuid>/',
          CommentRetrieveDestroyAPIView.as_view(), name='delete_comment'),
-    path('recent/', RecentPostsAPIView.as_view(), name='recent_posts'),
-    path('user/<uuid>/', UserPostListAPIView.as_view(), name='get_user_posts')
 ]
@@ -3,6 +3,7 @@ from rest_framework.permissions import (
     IsAuthenticatedOrReadOnly
 )
 from rest_framework.generics import (
+    GenericAPIView,
     ListAPIView,
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
@@ -11,100 +12,290 @@ from rest_framework.generics import (
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status as s
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 
-from .models import Post, Comment
-from .serializers import PostSerializer, CommentSerializer
+from jobs.queue import enqueue, enqueue_many
+from mysite.writes import serialized
+from . import cache, pins, tags, timeline
+from .bulk import BulkCreateMixin, get_uuids, set_pks
+from .conditional import (
+    ConditionalGetMixin,
+    PostPageMixin,
+    get_post_validators,
+    post_validators
+)
+from .models import Post, Comment, Mention, PostPin, PostTag, TrendingScore
+from .serializers import (
+    CommentSerializer,
+    CommentValuesSerializer,
+    PostSerializer,
+    PostValuesSerializer,
+    ValuesSerializer
+)
 from .permissions import IsAuthorOrReadOnly
+from .pagination import KeysetPagination, ScorePagination
+
+
+class ValuesListMixin:
+    """
+    Serves GET lists from queryset.values() with values_serializer_class, a
+    ValuesSerializer producing the same output as serializer_class without
+    building model instances. Other methods use serializer_class as usual.
+    """
+    values_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.values_serializer_class:
+            return self.values_serializer_class
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, ValuesSerializer):
+            queryset = serializer_class.values(queryset)
+        return queryset
 
 
 class PostListCreateAPIView(ListCreateAPIView):
     """
     Lists the currently logged in users posts with a GET and allows a user to 
-    create a new post with POST. Must be logged in to access this route.
+    create a new post with POST. Must be logged in to access this route. Posts
+    are listed newest first one page at a time.
 
     EXAMPLE:
-        GET -> /posts/ -> return a list of posts
+        GET -> /posts/ -> return a page of posts
         POST -> /posts/ -> create new post
     """
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
         Return all posts for logged in user.
         """
-        return Post.objects.filter(author=self.request.user)
+        return Post.objects.with_summary().filter(author=self.request.user)
 
     def perform_create(self, serializer):
-        return serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        tags.sync([post], created=True)
+        enqueue('posts.fan_out', post_id=post.pk)
+        return post
+
 
+class PostBatchAPIView(BulkCreateMixin, GenericAPIView):
+    """
+    Fetches many posts by UUID with one query, or creates a list of posts for
+    the logged in user in one request (see posts/bulk.py for the response
+    format). Anon users can fetch posts, must be logged in to create them.
+
+    Fetched posts are returned in the order they were asked for, along with
+    the UUIDs of posts that don't exist.
 
-class PostDetailAPIView(RetrieveUpdateDestroyAPIView):
+    EXAMPLE:
+        GET -> /posts/batch/?uuids=<uuid>,<uuid> -> returns the posts
+        POST -> /posts/batch/ -> create the posts in a list
+    """
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    queryset = Post.objects.with_summary()
+
+    def get(self, request, *args, **kwargs):
+        uuids = get_uuids(request)
+        posts = self.get_queryset().in_bulk(uuids, field_name='uuid')
+        serializer = self.get_serializer(
+            [posts[uuid] for uuid in uuids if uuid in posts], many=True)
+        return Response({
+            'results': serializer.data,
+            'missing': [uuid for uuid in uuids if uuid not in posts],
+        })
+
+    def post(self, request, *args, **kwargs):
+        return self.bulk_create(request, *args, **kwargs)
+
+    def perform_bulk_create(self, serializer):
+        posts = [Post(author=self.request.user, **data)
+                 for data in serializer.validated_data]
+        with transaction.atomic():
+            Post.objects.bulk_create(posts)
+            set_pks(Post, posts)
+            tags.sync(posts, created=True)
+            enqueue_many('posts.fan_out', ({'post_id': post.pk}
+                                           for post in posts))
+            # bulk_create sends no signals
+            enqueue_many('search.index', ({'kind': 'post', 'id': post.pk}
+                                          for post in posts))
+        return posts
+
+
+class PostDetailAPIView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     """
     Selects post by UUID and displays it's details. Anon users able to read post
     details with GET. Must be authenticated and be the owner of the post to make 
     PUT and DELETE requests.
 
+    Post details are served from the read-through cache in posts/cache.py, and
+    support conditional GET (see posts/conditional.py).
+
     EXAMPLE:
         GET -> /posts/<uuid>/ -> return post details
         PUT -> /posts/<uuid>/ -> make an edit to the post text (if owner)
         DELETE -> /posts/<uuid>/ -> delete post (if owner)
     """
-    queryset = Post.objects.all()
+    queryset = Post.objects.with_summary()
     lookup_field = 'uuid'
 
     serializer_class = PostSerializer
     permission_classes = [IsAuthorOrReadOnly]
 
+    def get_validators(self, request, *args, **kwargs):
+        return get_post_validators(kwargs['uuid'], 'pins')
+
+    def retrieve(self, request, *args, **kwargs):
+        def compute():
+            post = self.get_object()
+            data = self.get_serializer(post).data
+            self.validators = post_validators(
+                post.pk, post.date_modified, data['pins'])
+            cache.set_value(kwargs['uuid'], 'validators:pins',
+                            self.validators)
+            return data
+
+        return Response(cache.get_or_set(kwargs['uuid'], 'detail', compute))
+
     def perform_update(self, serializer):
-        return serializer.save(edited=True)
+        with transaction.atomic():
+            post = serializer.save(edited=True)
+            tags.sync([post])
+        return post
 
 
 class PinPostAPIView(APIView):
     """
-    Allows any authenticated user to pin (like) a post. This endpoint increments
-    a posts pins by 1.
-
-    NOTE:   Currently a user can pin the same post as many times as they like. 
-            This could be avoided by pulling the pins out into their own table 
-            with one to one FK to a post and user, would require a check before
-            pinning post (some indexing on the table would be a good idea too).
+    Allows any authenticated user to pin (like) a post once. Each pin is stored
+    in the PostPin table and the posts pin count is updated atomically in the
+    database, so concurrent pins never lose updates. Pinning and unpinning are
+    idempotent. With settings.PIN_BUFFER enabled the count is updated by the
+    write-behind buffer in posts/pins.py instead. Pins are written one at a
+    time per process on SQLite, see mysite/writes.py.
 
     EXAMPLE:
-        PUT -> /posts/<uuid>/pin/ -> increment post pins by 1
+        PUT -> /posts/<uuid>/pin/ -> pin the post
+        DELETE -> /posts/<uuid>/pin/ -> remove the users pin from the post
     """
     permission_classes = [IsAuthenticated]
 
     def put(self, request, uuid):
         """
-        Increment post pins by 1.
+        Pin the post, incrementing its pins by 1 if the user hasn't already
+        pinned it.
         """
-        post = get_object_or_404(Post, uuid=uuid)
-        post.pins += 1
-        post.save()
+        post = get_object_or_404(Post.objects.only('id', 'uuid'), uuid=uuid)
+        try:
+            with serialized(), transaction.atomic():
+                PostPin.objects.create(post=post, user=request.user)
+                pins.pin(post.pk, 1)
+        except IntegrityError:
+            pass  # already pinned by this user
+
         return Response(status=s.HTTP_200_OK)
 
+    def delete(self, request, uuid):
+        """
+        Unpin the post, decrementing its pins by 1 if the user had pinned it.
+        """
+        post = get_object_or_404(Post.objects.only('id', 'uuid'), uuid=uuid)
+        # the posts pins are decremented by posts/signals.py
+        with serialized(), transaction.atomic():
+            PostPin.objects.filter(post=post, user=request.user).delete()
 
-class CommentListCreateAPIView(ListCreateAPIView):
+        return Response(status=s.HTTP_200_OK)
+
+
+class CommentListCreateAPIView(ConditionalGetMixin, ValuesListMixin,
+                               ListCreateAPIView):
     """
-    Lists all the comments for a given post. Anon users can read comments. Must
-    be logged in to create comments on the post.
+    Lists the comments for a given post, newest first one page at a time. Anon
+    users can read comments. Must be logged in to create comments on the post.
+    Pages of comments are served from the read-through cache in posts/cache.py,
+    built from .values() rows and support conditional GET. Comments are
+    written one at a time per process on SQLite, see mysite/writes.py.
 
     EXAMPLE:
-        GET -> /posts/<uuid>/comments/ -> returns all comments for post with uuid
+        GET -> /posts/<uuid>/comments/ -> returns a page of comments for post
         POST -> /posts/<uuid>/comments/ -> create new comment on post with uuid
     """
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Comment.objects.order_by('-date_created').filter(
+        return Comment.objects.select_related('author', 'post').filter(
             post__uuid=self.kwargs['uuid'])
 
+    def get_validators(self, request, *args, **kwargs):
+        return get_post_validators(kwargs['uuid'], 'comment_count')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page and isinstance(page[0], dict):
+            row = page[0]
+            self.validators = post_validators(
+                row['post_id'], row['post__date_modified'],
+                row['post__comment_count'])
+            cache.set_value(self.kwargs['uuid'], 'validators:comment_count',
+                            self.validators)
+        return page
+
+    def list(self, request, *args, **kwargs):
+        data = cache.get_or_set(
+            kwargs['uuid'], f'comments:{cache.url_key(request)}',
+            lambda: super(CommentListCreateAPIView, self).list(
+                request, *args, **kwargs).data)
+        return Response(data)
+
     def perform_create(self, serializer):
         post = Post.objects.get(uuid=self.kwargs['uuid'])
-        return serializer.save(author=self.request.user, post=post)
+        with serialized(), transaction.atomic():
+            comment = serializer.save(author=self.request.user, post=post)
+            Post.objects.filter(pk=post.pk).increment(comment_count=1)
+        return comment
+
+
+class CommentBatchAPIView(BulkCreateMixin, GenericAPIView):
+    """
+    Creates a list of comments on a post in one request, see posts/bulk.py for
+    the response format. The posts comment count is updated once for the whole
+    list. Must be logged in.
+
+    EXAMPLE:
+        POST -> /posts/<uuid>/comments/batch/ -> create the comments in a list
+    """
+    serializer_class = CommentSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        self.post_object = get_object_or_404(
+            Post.objects.only('id', 'uuid'), uuid=kwargs['uuid'])
+        return self.bulk_create(request, *args, **kwargs)
+
+    def perform_bulk_create(self, serializer):
+        post = self.post_object
+        comments = [Comment(author=self.request.user, post=post, **data)
+                    for data in serializer.validated_data]
+        with serialized(), transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            set_pks(Comment, comments)
+            Post.objects.filter(pk=post.pk).increment(
+                comment_count=len(comments))
+            # bulk_create sends no signals
+            enqueue_many('search.index', ({'kind': 'comment', 'id': comment.pk}
+                                          for comment in comments))
+        cache.invalidate(post.uuid)
+        return comments
 
 
 class CommentRetrieveDestroyAPIView(RetrieveDestroyAPIView):
@@ -121,23 +312,143 @@ class CommentRetrieveDestroyAPIView(RetrieveDestroyAPIView):
     permission_classes = [IsAuthorOrReadOnly]
 
     def get_object(self):
-        comment = get_object_or_404(Comment, uuid=self.kwargs['comment_uuid'],
-                                    post__uuid=self.kwargs['post_uuid'])
+        comment = get_object_or_404(
+            Comment.objects.select_related('author', 'post'),
+            uuid=self.kwargs['comment_uuid'],
+            post__uuid=self.kwargs['post_uuid'])
         self.check_object_permissions(self.request, comment)
         return comment
 
+    def perform_destroy(self, instance):
+        # the posts comment count is updated by posts/signals.py
+        with transaction.atomic():
+            instance.delete()
 
-class UserPostListAPIView(ListAPIView):
+
+class UserPostListAPIView(PostPageMixin, ValuesListMixin,
+                          ListAPIView):
     """
+    Lists the posts of the user with the given UUID, newest first one page at a
+    time. Pages are built from .values() rows and support conditional GET.
+
+    EXAMPLE:
+        GET -> /posts/user/<uuid>/ -> returns a page of the users posts
     """
     serializer_class = PostSerializer
+    values_serializer_class = PostValuesSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Post.objects.order_by('-date_created').filter(author__uuid=self.kwargs['uuid'])
+        return Post.objects.with_summary().filter(
+            author__uuid=self.kwargs['uuid'])
+
+
+class RecentPostsAPIView(PostPageMixin, ValuesListMixin,
+                         ListAPIView):
+    """
+    Lists the most recent posts from all users, one page at a time. Pages are
+    built from .values() rows and support conditional GET.
 
+    EXAMPLE:
+        GET -> /posts/recent/ -> returns a page of the newest posts
+        GET -> /posts/recent/?cursor=<cursor>&limit=50 -> returns the next page
+    """
+    serializer_class = PostSerializer
+    values_serializer_class = PostValuesSerializer
+    pagination_class = KeysetPagination
+    queryset = Post.objects.with_summary()
 
-class RecentPostsAPIView(ListAPIView):
+
+class TimelineAPIView(ListAPIView):
     """
+    Lists the posts of the users the logged in user follows, newest first one
+    page at a time. The timeline is precomputed by a background job when posts
+    are created (see posts/timeline.py) so each page costs the same no matter
+    how many users are followed.
+
+    EXAMPLE:
+        GET -> /posts/timeline/ -> returns a page of the users home timeline
     """
     serializer_class = PostSerializer
-    queryset = Post.objects.order_by('-date_created').all()
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        paginator.prepare(request)
+        posts = timeline.read(request.user, paginator.position,
+                              paginator.limit + 1)
+        page = paginator.page(posts)
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data)
+
+
+class TagPostListAPIView(ListAPIView):
+    """
+    Lists the posts tagged with #<name>, newest first one page at a time.
+    Pages are read from the tags that were extracted when the posts were
+    written (see posts/tags.py), tag names are case insensitive.
+
+    EXAMPLE:
+        GET -> /posts/tags/<name>/ -> returns a page of posts tagged #name
+    """
+    serializer_class = PostSerializer
+    pagination_class = KeysetPagination
+
+    def get_entries(self):
+        return PostTag.objects.filter(tag__name=self.kwargs['name'].lower())
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        paginator.prepare(request)
+        posts = tags.read(self.get_entries(), paginator.position,
+                          paginator.limit + 1)
+        page = paginator.page(posts)
+        return paginator.get_paginated_response(
+            self.get_serializer(page, many=True).data)
+
+
+class MentionPostListAPIView(TagPostListAPIView):
+    """
+    Lists the posts mentioning the user with the given UUID as @username,
+    newest first one page at a time.
+
+    EXAMPLE:
+        GET -> /posts/user/<uuid>/mentions/ -> returns a page of posts
+    """
+
+    def get_entries(self):
+        return Mention.objects.filter(user__uuid=self.kwargs['uuid'])
+
+
+class TrendingTagsAPIView(APIView):
+    """
+    Lists the tags on the most posts created in the last TAGS['TRENDING_HOURS']
+    hours, with the number of those posts. The counts are kept up to date as
+    posts are written, see posts/tags.py.
+
+    EXAMPLE:
+        GET -> /posts/trending/tags/ -> returns the trending tags
+    """
+
+    def get(self, request):
+        return Response({'results': tags.trending()})
+
+
+class TrendingPostsAPIView(ListAPIView):
+    """
+    Lists recent posts ranked by a time decayed score of their pins and
+    comments, highest first one page at a time. Scores are precomputed by
+    `manage.py refresh_trending` (see posts/trending.py).
+
+    EXAMPLE:
+        GET -> /posts/trending/ -> returns a page of trending posts
+    """
+    serializer_class = PostSerializer
+    pagination_class = ScorePagination
+    queryset = TrendingScore.objects.select_related('post__author')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer([row.post for row in page], many=True)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,204 @@
+"""
+Full text search backends.
+
+Posts and comments are indexed as documents identified by their kind
+(Posting.POST or Posting.COMMENT) and id. Backends rank the documents matching
+every term of a query and return them best first, as dicts with:
+
+    kind, object_id, score (higher is better) and key (object_id * 2 + kind)
+
+Results are paginated with a (score, key) cursor, see search/pagination.py.
+
+FTS5Backend uses a SQLite FTS5 virtual table ranked with bm25.
+InvertedIndexBackend keeps its own inverted index in the Posting table and
+works on every database. SEARCH['BACKEND'] picks one, by default FTS5 is used
+on SQLite.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import (
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+    When
+)
+from django.utils.module_loading import import_string
+
+from .models import Posting
+
+DEFAULTS = {
+    'BACKEND': None,  # FTS5Backend on SQLite, InvertedIndexBackend otherwise
+    'BATCH_SIZE': 1000,  # documents indexed at once by rebuild_search_index
+}
+
+MAX_TERM_LENGTH = 64
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'SEARCH', {}))
+    return config
+
+
+def tokenize(text):
+    """
+    Split text into lower case terms without accents, the same way the FTS5
+    unicode61 tokenizer does.
+    """
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [term for term in re.findall(r'[^\W_]+', text)
+            if len(term) <= MAX_TERM_LENGTH]
+
+
+def make_key(kind, object_id):
+    return object_id * 2 + kind
+
+
+def make_result(key, score):
+    return {'kind': key % 2, 'object_id': key // 2, 'key': key,
+            'score': score}
+
+
+class BaseBackend:
+
+    def index(self, kind, documents):
+        """
+        Add or replace the (object_id, text) documents of a kind.
+        """
+        raise NotImplementedError
+
+    def remove(self, kind, object_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, terms, kinds, position=None, limit=20):
+        """
+        Return up to limit documents of the given kinds matching all terms,
+        best first, starting after the (score, key) position.
+        """
+        raise NotImplementedError
+
+
+class FTS5Backend(BaseBackend):
+    """
+    Index documents in a SQLite FTS5 table, created by the search app's
+    migrations, with the document key as rowid.
+    """
+    table = 'search_fts'
+
+    def index(self, kind, documents):
+        rows = [(make_key(kind, object_id), text)
+                for object_id, text in documents]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s',
+                               [(key,) for key, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                rows)
+
+    def remove(self, kind, object_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(make_key(kind, object_id),) for object_id in object_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def search(self, terms, kinds, position=None, limit=20):
+        # quoting every term keeps FTS5 query syntax out of user input
+        sql = [f'SELECT rowid, -rank FROM {self.table} '
+               f'WHERE {self.table} MATCH %s']
+        params = [' '.join(f'"{term}"' for term in terms)]
+        if len(kinds) == 1:
+            sql.append('AND rowid %% 2 = %s')
+            params.append(kinds[0])
+        if position is not None:
+            score, key = position
+            sql.append('AND (-rank < %s OR (-rank = %s AND rowid < %s))')
+            params += [score, score, key]
+        sql.append('ORDER BY rank, rowid DESC LIMIT %s')
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [make_result(key, score)
+                    for key, score in cursor.fetchall()]
+
+
+class InvertedIndexBackend(BaseBackend):
+    """
+    Index documents in the Posting table. Documents are scored by the sum of
+    the counts of the query terms in them, each divided by the number of
+    documents the term appears in so rare terms count for more.
+    """
+
+    def index(self, kind, documents):
+        documents = list(documents)
+        postings = []
+        for object_id, text in documents:
+            counts = {}
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + 1
+            postings += [Posting(term=term, kind=kind, object_id=object_id,
+                                 count=count)
+                         for term, count in counts.items()]
+
+        self.remove(kind, [object_id for object_id, _ in documents])
+        fields = [field for field in Posting._meta.concrete_fields
+                  if not field.primary_key]
+        Posting.objects.bulk_create(
+            postings, batch_size=connection.ops.bulk_batch_size(
+                fields, postings) or None)
+
+    def remove(self, kind, object_ids):
+        Posting.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+    def clear(self):
+        Posting.objects.all().delete()
+
+    def search(self, terms, kinds, position=None, limit=20):
+        terms = list(dict.fromkeys(terms))
+        frequencies = dict(Posting.objects.filter(term__in=terms).values(
+            'term').annotate(count=Count('id')).values_list('term', 'count'))
+        if len(frequencies) < len(terms):
+            return []  # a term that is in no document matches nothing
+
+        weight = Case(*[When(term=term, then=Value(1 / count))
+                        for term, count in frequencies.items()],
+                      output_field=FloatField())
+        queryset = Posting.objects.filter(term__in=terms, kind__in=kinds)
+        queryset = queryset.values('kind', 'object_id').annotate(
+            key=ExpressionWrapper(F('object_id') * 2 + F('kind'),
+                                  output_field=IntegerField()),
+            matched=Count('id'),
+            score=Sum(F('count') * weight, output_field=FloatField()),
+        ).filter(matched=len(terms))
+        if position is not None:
+            score, key = position
+            queryset = queryset.filter(
+                Q(score__lt=score) | Q(score=score, key__lt=key))
+
+        return [make_result(row['key'], row['score'])
+                for row in queryset.order_by('-score', '-key')[:limit]]
+
+
+def get_backend():
+    path = get_config()['BACKEND']
+    if path is None:
+        path = ('search.backends.FTS5Backend' if connection.vendor == 'sqlite'
+                else 'search.backends.InvertedIndexBackend')
+    return import_string(path)()
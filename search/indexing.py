@@ -0,0 +1,69 @@
+"""
+Keeping the search index up to date.
+
+Saving or deleting a post or comment queues a 'search.index' job (see
+search/signals.py, bulk created posts and comments are queued by their views)
+that reindexes it, or removes it from the index when it no longer exists.
+rebuild() indexes everything from scratch in batches.
+"""
+from django.db import transaction
+
+from jobs.queue import enqueue
+from posts.models import Comment, Post
+from .backends import get_backend, get_config
+from .models import Posting
+
+KINDS = {
+    'post': Posting.POST,
+    'comment': Posting.COMMENT,
+}
+MODELS = {
+    Posting.POST: Post,
+    Posting.COMMENT: Comment,
+}
+
+
+def queue(kind, object_id):
+    enqueue('search.index', kind=kind, id=object_id)
+
+
+def update(kind, object_ids):
+    """
+    Reindex the objects of a kind that still exist and remove the rest.
+    """
+    object_ids = set(object_ids)
+    documents = list(MODELS[kind].objects.filter(
+        pk__in=object_ids).values_list('id', 'text'))
+    missing = object_ids - {object_id for object_id, _ in documents}
+
+    backend = get_backend()
+    with transaction.atomic():
+        if documents:
+            backend.index(kind, documents)
+        if missing:
+            backend.remove(kind, missing)
+
+
+def rebuild(batch_size=None):
+    """
+    Clear the index and index every post and comment, batch_size documents at
+    a time. Returns the number of documents indexed.
+    """
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    backend = get_backend()
+    backend.clear()
+
+    indexed = 0
+    for kind, model in MODELS.items():
+        last_id = 0
+        while True:
+            documents = list(model.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', 'text')[:batch_size])
+            if not documents:
+                break
+
+            with transaction.atomic():
+                backend.index(kind, documents)
+            indexed += len(documents)
+            last_id = documents[-1][0]
+    return indexed
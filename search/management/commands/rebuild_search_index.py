@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from search.indexing import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index of every post and comment in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='Documents indexed per batch')
+
+    def handle(self, *args, **options):
+        indexed = rebuild(options['batch_size'])
+        self.stdout.write(f'Indexed {indexed} posts and comments')
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.8 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    """
+    Create the FTS5 table used by FTS5Backend, SQLite only.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE search_fts USING fts5('
+            'text, tokenize="unicode61 remove_diacritics 2")')
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE search_fts')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Posting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('kind', models.SmallIntegerField(choices=[(0, 'Post'), (1, 'Comment')])),
+                ('object_id', models.IntegerField()),
+                ('count', models.IntegerField(default=1)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['kind', 'object_id'], name='search_post_kind_64e1a5_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='posting',
+            unique_together={('term', 'kind', 'object_id')},
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
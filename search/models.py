@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class Posting(models.Model):
+    """
+    An entry of the inverted index used by InvertedIndexBackend: term appears
+    count times in the post or comment object_id. The SQLite FTS5 backend
+    keeps its index in the search_fts virtual table instead.
+    """
+    POST = 0
+    COMMENT = 1
+    KIND_CHOICES = [
+        (POST, 'Post'),
+        (COMMENT, 'Comment'),
+    ]
+
+    class Meta:
+        unique_together = ['term', 'kind', 'object_id']
+        indexes = [
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    term = models.CharField(max_length=64, null=False)
+    kind = models.SmallIntegerField(choices=KIND_CHOICES, null=False)
+    object_id = models.IntegerField(null=False)
+    count = models.IntegerField(default=1, null=False)
+
+    def __str__(self):
+        return f'<Posting term={self.term} kind={self.kind} id={self.object_id}>'
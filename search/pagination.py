@@ -0,0 +1,9 @@
+from posts.pagination import ScorePagination
+
+
+class SearchPagination(ScorePagination):
+    """
+    Keyset pagination over search results, best match first. The backends
+    filter on the position themselves, see search/backends.py.
+    """
+    ordering = ('-score', '-key')
@@ -0,0 +1,16 @@
+"""
+Background jobs for search, run by the job queue in jobs/queue.py.
+"""
+from jobs.queue import task
+from . import indexing
+
+
+@task('search.index')
+def index(payloads):
+    """
+    Bring the index up to date with saved and deleted posts and comments.
+    """
+    for kind, code in indexing.KINDS.items():
+        object_ids = [p['id'] for p in payloads if p['kind'] == kind]
+        if object_ids:
+            indexing.update(code, object_ids)
@@ -0,0 +1,146 @@
+from rest_framework.test import APITestCase
+from rest_framework import status as s
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import override_settings
+from io import StringIO
+
+from jobs.models import Job
+from jobs.queue import run_pending
+from posts.models import Comment, Post
+from .backends import tokenize
+
+User = get_user_model()
+
+
+class SearchTests:
+    """
+    Tests run against every backend.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='pw')
+
+    def search(self, q, **params):
+        res = self.client.get(reverse('search'), data={'q': q, **params})
+        self.assertEqual(res.status_code, s.HTTP_200_OK)
+        return res
+
+    def texts(self, q, **params):
+        return [result['data']['text']
+                for result in self.search(q, **params).data['results']]
+
+    def test_search(self):
+        Post.objects.create(text='hello world', author=self.user)
+        post = Post.objects.create(text='hello hello there', author=self.user)
+        Comment.objects.create(text='world peace', author=self.user, post=post)
+
+        self.assertListEqual(self.texts('hello'),
+                             ['hello hello there', 'hello world'])
+        self.assertListEqual(self.texts('World HELLO'), ['hello world'])
+        self.assertListEqual(self.texts('world', type='comment'),
+                             ['world peace'])
+        self.assertListEqual(self.texts('missing'), [])
+
+        res = self.search('peace')
+        self.assertEqual(res.data['results'][0]['type'], 'comment')
+        self.assertEqual(res.data['results'][0]['data']['post'], post.uuid)
+
+    def test_accents(self):
+        Post.objects.create(text='Café Crème', author=self.user)
+        self.assertListEqual(self.texts('cafe creme'), ['Café Crème'])
+
+    def test_edit_and_delete(self):
+        post = Post.objects.create(text='first draft', author=self.user)
+        comment = Comment.objects.create(text='a draft comment',
+                                         author=self.user, post=post)
+        post.text = 'final version'
+        post.save()
+        self.assertListEqual(self.texts('draft'), ['a draft comment'])
+        self.assertListEqual(self.texts('final'), ['final version'])
+
+        comment.delete()
+        self.assertListEqual(self.texts('draft'), [])
+        post.delete()
+        self.assertListEqual(self.texts('final'), [])
+
+    def test_pages(self):
+        for i in range(5):
+            Post.objects.create(text=f'page {i}', author=self.user)
+
+        texts = []
+        res = self.search('page', limit=2)
+        while True:
+            self.assertEqual(res.status_code, s.HTTP_200_OK)
+            texts += [r['data']['text'] for r in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+        self.assertCountEqual(texts, [f'page {i}' for i in range(5)])
+
+    def test_bad_queries(self):
+        Post.objects.create(text='hello', author=self.user)
+        for params in ({'q': ''}, {'q': '!?'}, {'q': 'hello', 'type': 'x'}):
+            res = self.client.get(reverse('search'), data=params)
+            self.assertEqual(res.status_code, s.HTTP_400_BAD_REQUEST)
+        # FTS5 query syntax is matched as plain words
+        self.assertListEqual(self.texts('hello OR "NEAR(*'), [])
+        self.assertListEqual(self.texts('"hello"*'), ['hello'])
+
+    def test_bulk_create(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse('post_batch'), format='json', data=[
+            {'text': 'bulk one'}, {'text': 'bulk two'}])
+        post = Post.objects.first()
+        self.client.post(
+            reverse('comment_batch', kwargs={'uuid': post.uuid}),
+            format='json', data=[{'text': 'bulk comment'}])
+        self.assertCountEqual(self.texts('bulk'),
+                              ['bulk one', 'bulk two', 'bulk comment'])
+
+    @override_settings(JOBS={'EAGER': False})
+    def test_queued(self):
+        Post.objects.create(text='queued', author=self.user)
+        self.assertTrue(Job.objects.filter(name='search.index').exists())
+        self.assertListEqual(self.texts('queued'), [])
+        run_pending()
+        self.assertListEqual(self.texts('queued'), ['queued'])
+
+    @override_settings(JOBS={'EAGER': False})
+    def test_rebuild(self):
+        posts = [Post.objects.create(text=f'rebuilt {i}', author=self.user)
+                 for i in range(3)]
+        Comment.objects.create(text='rebuilt', author=self.user, post=posts[0])
+        self.assertListEqual(self.texts('rebuilt'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=2, stdout=out)
+        self.assertIn('Indexed 4', out.getvalue())
+        self.assertEqual(len(self.texts('rebuilt')), 4)
+
+
+@override_settings(JOBS={'EAGER': True},
+                   SEARCH={'BACKEND': 'search.backends.FTS5Backend'})
+class FTS5BackendTest(SearchTests, APITestCase):
+    pass
+
+
+@override_settings(JOBS={'EAGER': True},
+                   SEARCH={'BACKEND': 'search.backends.InvertedIndexBackend'})
+class InvertedIndexBackendTest(SearchTests, APITestCase):
+
+    def test_search_queries(self):
+        Post.objects.create(text='hello world', author=self.user)
+        # term frequencies, the ranked page and the posts on it
+        with self.assertNumQueries(3):
+            self.search('hello world')
+
+
+class TokenizeTest(APITestCase):
+
+    def test_tokenize(self):
+        self.assertListEqual(tokenize('Héllo, WORLD! snake_case 42'),
+                             ['hello', 'world', 'snake', 'case', '42'])
+        self.assertListEqual(tokenize('x' * 65), [])
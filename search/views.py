@@ -0,0 +1,65 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView
+
+from posts.models import Comment, Post
+from posts.serializers import CommentSerializer, PostSerializer
+from .backends import get_backend, tokenize
+from .indexing import KINDS
+from .models import Posting
+from .pagination import SearchPagination
+
+
+class SearchAPIView(GenericAPIView):
+    """
+    Full text search over posts and comments, best matches first one page at
+    a time. Every word of the query must appear in a result. Results are a
+    list of {"type": "post" or "comment", "data": {...}}.
+
+    EXAMPLE:
+        GET -> /search/?q=hello world -> posts and comments matching both words
+        GET -> /search/?q=hello&type=post -> only posts
+    """
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        terms = tokenize(request.query_params.get('q', ''))
+        if not terms:
+            raise ValidationError({'q': 'A search query is required.'})
+
+        kind = request.query_params.get('type')
+        if kind is not None and kind not in KINDS:
+            raise ValidationError({'type': (
+                f'Must be one of: {", ".join(KINDS)}.')})
+        kinds = [KINDS[kind]] if kind else list(KINDS.values())
+
+        paginator = self.paginator
+        paginator.prepare(request)
+        page = paginator.page(get_backend().search(
+            terms, kinds, paginator.position, paginator.limit + 1))
+        return paginator.get_paginated_response(self.serialize(page))
+
+    def serialize(self, page):
+        """
+        Serialize the posts and comments on a page of results in order,
+        skipping any deleted since they were indexed.
+        """
+        querysets = {
+            Posting.POST: Post.objects.with_summary(),
+            Posting.COMMENT: Comment.objects.select_related('author', 'post'),
+        }
+        objects = {
+            kind: queryset.in_bulk([row['object_id'] for row in page
+                                    if row['kind'] == kind])
+            for kind, queryset in querysets.items()
+        }
+        found = [(row['kind'], objects[row['kind']][row['object_id']])
+                 for row in page if row['object_id'] in objects[row['kind']]]
+
+        serializers = {Posting.POST: PostSerializer,
+                       Posting.COMMENT: CommentSerializer}
+        data = {kind: iter(serializer([obj for k, obj in found if k == kind],
+                                      many=True).data)
+                for kind, serializer in serializers.items()}
+        names = {code: name for name, code in KINDS.items()}
+        return [{'type': names[kind], 'data': next(data[kind])}
+                for kind, _ in found]
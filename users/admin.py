@@ -1,8 +1,13 @@
 from django.contrib import admin
 
-from .models import User
+from .models import User, Follow
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    pass
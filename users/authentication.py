@@ -0,0 +1,179 @@
+"""
+Stateless JWT authentication.
+
+Tokens issued by the login view carry the claims in CLAIMS, so
+StatelessJWTAuthentication can build request.user from the token without
+loading the users row. Fields that are not claims are deferred and loaded from
+the database the first time they are used.
+
+Because the row is not checked, revoked tokens are tracked in the
+STATELESS_AUTH['CACHE'] cache:
+
+    revoke(token)        a single token, e.g. on logout
+    revoke_user(user_id) every token issued to the user so far, e.g. after
+                         changing their password, deactivating or deleting
+                         them or changing one of their claims
+
+Entries only live as long as the tokens they revoke could. The cache has to
+be shared by every process and must never evict live entries, otherwise
+revoked tokens work again. By default it is a database table, which costs
+the same one query per request as loading the users row; only a shared
+in-memory cache such as Redis saves it. Tokens are refused when the
+revocations can't be read.
+"""
+import logging
+import time
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from metrics.profiling import TimedAuthenticationMixin
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CACHE': 'revocations',
+    'KEY_PREFIX': 'jwt-denylist',
+}
+
+CLAIMS = ('uuid', 'username', 'date_joined', 'is_active', 'is_staff')
+
+# user fields whose change revokes the users tokens
+REVOKING_FIELDS = CLAIMS + ('is_superuser',)
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'STATELESS_AUTH', {}))
+    return config
+
+
+def add_claims(token, user):
+    """
+    Add the user fields needed to build the user back to a token.
+    """
+    # when the login happened, copied to the tokens refreshed from it
+    token['iat'] = time.time()
+    return set_claims(token, user)
+
+
+def set_claims(token, user):
+    """
+    Set the user field claims of a token to the current values.
+    """
+    token['uuid'] = str(user.uuid)
+    token['username'] = user.username
+    token['date_joined'] = user.date_joined.isoformat()
+    token['is_active'] = user.is_active
+    token['is_staff'] = user.is_staff
+    return token
+
+
+def get_cache():
+    return caches[get_config()['CACHE']]
+
+
+def jti_key(jti):
+    return f'{get_config()["KEY_PREFIX"]}:jti:{jti}'
+
+
+def user_key(user_id):
+    return f'{get_config()["KEY_PREFIX"]}:user:{user_id}'
+
+
+def get_issued_at(token):
+    if 'iat' in token:
+        return token['iat']
+    # tokens from before the claims were added, work it out from the expiry
+    return token['exp'] - token.lifetime.total_seconds()
+
+
+def revoke(token):
+    """
+    Deny a single token until it expires.
+    """
+    remaining = token['exp'] - time.time()
+    if remaining > 0:
+        get_cache().set(jti_key(token[api_settings.JTI_CLAIM]), True,
+                        timeout=int(remaining) + 1)
+
+
+def revoke_user(user_id):
+    """
+    Deny every token issued to the user before now.
+    """
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME,
+                   api_settings.REFRESH_TOKEN_LIFETIME)
+    get_cache().set(user_key(user_id), time.time(),
+                    timeout=int(lifetime.total_seconds()) + 1)
+
+
+def is_revoked(token):
+    user_id = token[api_settings.USER_ID_CLAIM]
+    try:
+        denied = get_cache().get_many([jti_key(token[api_settings.JTI_CLAIM]),
+                                       user_key(user_id)])
+    except Exception:
+        logger.exception('Could not read the token revocations')
+        raise AuthenticationFailed(_('Token revocation could not be checked'),
+                                   code='token_not_checked')
+    if denied.get(jti_key(token[api_settings.JTI_CLAIM])):
+        return True
+
+    revoked_before = denied.get(user_key(user_id))
+    return revoked_before is not None and get_issued_at(token) < revoked_before
+
+
+class StatelessJWTAuthentication(TimedAuthenticationMixin, JWTAuthentication):
+    """
+    JWTAuthentication that builds the user from the token claims instead of
+    fetching them. Tokens without the claims, issued before they were added,
+    fall back to fetching the user.
+    """
+
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise AuthenticationFailed(_('Token has been revoked'),
+                                       code='token_revoked')
+
+        if not all(claim in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(_('User is inactive'),
+                                       code='user_inactive')
+
+        User = get_user_model()
+        values = {
+            api_settings.USER_ID_FIELD: validated_token[
+                api_settings.USER_ID_CLAIM],
+            'uuid': UUID(validated_token['uuid']),
+            'username': validated_token['username'],
+            'date_joined': parse_datetime(validated_token['date_joined']),
+            'is_active': validated_token['is_active'],
+            'is_staff': validated_token['is_staff'],
+        }
+        # from_db expects the loaded fields in model order, the rest deferred
+        fields = [field.attname for field in User._meta.concrete_fields
+                  if field.attname in values]
+        return User.from_db(router.db_for_read(User), fields,
+                            [values[field] for field in fields])
+
+
+class SessionAuthentication(TimedAuthenticationMixin,
+                            authentication.SessionAuthentication):
+    pass
+
+
+class BasicAuthentication(TimedAuthenticationMixin,
+                          authentication.BasicAuthentication):
+    pass
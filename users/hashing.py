@@ -0,0 +1,151 @@
+"""
+Password hashing off the request thread.
+
+Hashing and checking passwords is slow on purpose and holds the GIL, so a
+burst of registrations or logins starves every other request served by the
+same process. With PASSWORD_HASHING['WORKERS'] set, make_password and
+check_password run in a pool of that many processes instead.
+
+The pool is bounded: at most WORKERS + MAX_PENDING passwords are hashed or
+waiting at once. Requests that can not get a slot within QUEUE_TIMEOUT, or
+whose hash takes longer than TIMEOUT, fail with a 503 so callers back off
+instead of piling up.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+DEFAULTS = {
+    'WORKERS': 0,  # 0 hashes in the calling thread
+    'MAX_PENDING': 64,  # passwords waiting for a worker
+    'QUEUE_TIMEOUT': 1,  # seconds to wait for a slot
+    'TIMEOUT': 10,  # seconds to wait for a hash
+}
+
+lock = threading.Lock()
+pool = None
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many password requests, try again shortly.')
+    default_code = 'overloaded'
+    wait = 1  # sent as Retry-After
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'PASSWORD_HASHING', {}))
+    return config
+
+
+def setup_worker():
+    import django
+    django.setup()
+
+
+def check(password, encoded):
+    """
+    Check a password in a worker. Returns whether it was correct and whether
+    it should be rehashed with the preferred hasher.
+    """
+    updates = []
+    is_correct = hashers.check_password(password, encoded, updates.append)
+    return is_correct, bool(updates)
+
+
+class Pool:
+
+    def __init__(self, config):
+        # spawn so workers don't inherit locks held by other threads
+        self.executor = ProcessPoolExecutor(
+            config['WORKERS'], mp_context=get_context('spawn'),
+            initializer=setup_worker)
+        self.slots = threading.BoundedSemaphore(
+            config['WORKERS'] + config['MAX_PENDING'])
+        self.queue_timeout = config['QUEUE_TIMEOUT']
+        self.timeout = config['TIMEOUT']
+        self.pid = os.getpid()
+
+    def run(self, func, *args):
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise Overloaded()
+
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # hold the slot until the work is really done, even after a timeout
+        future.add_done_callback(lambda future: self.slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise Overloaded()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+def get_pool():
+    """
+    The process pool, or None when hashing inline. Created on first use and
+    again in processes forked after that.
+    """
+    global pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    config = get_config()
+    if not config['WORKERS']:
+        return None
+
+    with lock:
+        if pool is None or pool.pid != os.getpid():
+            pool = Pool(config)
+    return pool
+
+
+def shutdown():
+    global pool
+    with lock:
+        if pool is not None and pool.pid == os.getpid():
+            pool.shutdown()
+        pool = None
+
+
+def make_password(password):
+    """
+    Hash a password with the preferred hasher, like Django's make_password.
+    """
+    pool = get_pool()
+    if password is None or pool is None:
+        return hashers.make_password(password)
+    return pool.run(hashers.make_password, password)
+
+
+def check_password(password, encoded, setter=None):
+    """
+    Like Django's check_password, setter is called to rehash the password
+    when it is correct but was not hashed with the preferred hasher.
+    """
+    pool = get_pool()
+    if pool is None:
+        return hashers.check_password(password, encoded, setter)
+
+    if password is None or not hashers.is_password_usable(encoded):
+        return False
+
+    is_correct, must_update = pool.run(check, password, encoded)
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
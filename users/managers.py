@@ -12,7 +12,7 @@ class UserManager(BaseUserManager):
 
         user = self.model(username=username, **kwargs)
         user.set_password(password)
-        user.save()
+        user.save(using=self._db)
 
         return user
 
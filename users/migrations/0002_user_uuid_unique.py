@@ -0,0 +1,29 @@
+from django.db import migrations, models
+import uuid
+
+from mysite.indexes import unique_index
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                unique_index('users_user', 'uuid', 'users_user_uuid_uniq'),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='uuid',
+                    field=models.UUIDField(default=uuid.uuid4, unique=True),
+                ),
+            ],
+        ),
+    ]
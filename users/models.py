@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from uuid import uuid4
 
+from . import hashing
 from .managers import UserManager
 
 
@@ -12,7 +13,8 @@ class User(AbstractUser):
     email = None
     first_name = None
     last_name = None
-    uuid = models.UUIDField(default=uuid4)
+    uuid = models.UUIDField(default=uuid4, unique=True)
+    follower_count = models.IntegerField(default=0)
 
     objects = UserManager()
 
@@ -21,3 +23,34 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # rehashing with a newer hasher is not a password change
+            self._password = None
+            self.save(update_fields=['password'])
+        return hashing.check_password(raw_password, self.password, setter)
+
+
+class Follow(models.Model):
+    """
+    A user following another users posts.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'],
+                                    name='unique_follow'),
+        ]
+
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    follower = models.ForeignKey(
+        'User', related_name='following', on_delete=models.CASCADE)
+    followee = models.ForeignKey(
+        'User', related_name='followers', on_delete=models.CASCADE)
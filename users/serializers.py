@@ -1,10 +1,16 @@
+from django.db import DEFAULT_DB_ALIAS
 from rest_framework import serializers
-from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from metrics.profiling import TimedListSerializer, TimedSerializerMixin
+from . import hashing
+from .authentication import add_claims, is_revoked, set_claims
 from .models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(max_length=128, write_only=True)
     confirm_password = serializers.CharField(max_length=128, write_only=True)
 
@@ -13,13 +19,14 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'username', 'date_joined',
                   'password', 'confirm_password']
         read_only_fields = ['uuid', 'date_joined']
+        list_serializer_class = TimedListSerializer
 
     def validate(self, data):
         if data.get('password') != data.get('confirm_password'):
             raise serializers.ValidationError('Passwords must match')
 
         del data['confirm_password']
-        data['password'] = make_password(data['password'])
+        data['password'] = hashing.make_password(data['password'])
         return data
 
 
@@ -32,3 +39,40 @@ class PasswordChangeSerializer(serializers.Serializer):
             raise serializers.ValidationError(detail='Passwords must match')
 
         return data
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """
+    Issues tokens carrying the claims StatelessJWTAuthentication needs.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Refuses to refresh revoked tokens or tokens of users that are gone or
+    inactive. The claims of the new tokens are read from the users row rather
+    than copied from the old token.
+    """
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if is_revoked(refresh):
+            raise serializers.ValidationError('Token has been revoked')
+
+        user = User.objects.db_manager(DEFAULT_DB_ALIAS).filter(**{
+            jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM],
+        }).first()
+        if user is None or not user.is_active:
+            raise serializers.ValidationError('User is inactive or deleted')
+        set_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            data['refresh'] = str(refresh)
+        return data
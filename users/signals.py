@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import REVOKING_FIELDS, revoke_user
+from .models import Follow
+
+User = get_user_model()
+
+
+# tokens are not checked against the users row, deny them instead when the
+# user they were issued to is gone or the claims they carry change
+
+
+@receiver(pre_save, sender=User)
+def check_claims_changed(sender, instance, update_fields=None, **kwargs):
+    instance._claims_changed = False
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+            REVOKING_FIELDS):
+        return
+
+    old = User.objects.db_manager(DEFAULT_DB_ALIAS).filter(
+        pk=instance.pk).values(*REVOKING_FIELDS).first()
+    instance._claims_changed = old is not None and any(
+        getattr(instance, field) != value for field, value in old.items())
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_user(sender, instance, **kwargs):
+    if not instance.is_active or getattr(instance, '_claims_changed', False):
+        revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    revoke_user(instance.pk)
+
+
+# however a follow is created or deleted, including cascades from either user
+
+
+@receiver(post_save, sender=Follow)
+def increment_follower_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.followee_id).update(
+            follower_count=F('follower_count') + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follower_count(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.followee_id).update(
+        follower_count=F('follower_count') - 1)
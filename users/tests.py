@@ -1,13 +1,20 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import DatabaseError
 from django.db.utils import IntegrityError
 from django.urls import reverse
 
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 import datetime as dt
+from unittest import mock
 
+from . import hashing
+from .models import Follow
 from .serializers import UserSerializer
 
 User = get_user_model()
@@ -63,6 +70,16 @@ class UserTests(TestCase):
             u2 = User.objects.create_user(
                 username='user1', password='123Testtest123')
 
+    def test_uuid_unique(self):
+        """
+        Assert that user UUIDs must be unique.
+        """
+        u1 = User.objects.create_user(
+            username='user1', password='123Testtest123')
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(
+                username='user2', password='123Testtest123', uuid=u1.uuid)
+
 
 class TestUserApi(APITestCase):
 
@@ -235,3 +252,280 @@ class TestUserApi(APITestCase):
             'access': access
         }, format='json')
         self.assertTrue(res.status_code, status.HTTP_200_OK)
+
+
+class FollowApiTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test', password='123tester123')
+        self.user2 = User.objects.create_user(
+            username='test2', password='123tester123')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('follow', kwargs={'username': 'test2'})
+
+    def test_follow(self):
+        res = self.client.put(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(Follow.objects.filter(
+            follower=self.user, followee=self.user2).exists())
+        self.assertEqual(User.objects.get(pk=self.user2.pk).follower_count, 1)
+
+    def test_follow_twice(self):
+        self.client.put(self.url)
+        res = self.client.put(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.get(pk=self.user2.pk).follower_count, 1)
+
+    def test_unfollow(self):
+        self.client.put(self.url)
+        res = self.client.delete(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(User.objects.get(pk=self.user2.pk).follower_count, 0)
+
+        self.client.delete(self.url)
+        self.assertEqual(User.objects.get(pk=self.user2.pk).follower_count, 0)
+
+    def test_delete_follower(self):
+        self.client.put(self.url)
+        self.user.delete()
+        self.assertEqual(User.objects.get(pk=self.user2.pk).follower_count, 0)
+
+    def test_follow_self(self):
+        res = self.client.put(reverse('follow', kwargs={'username': 'test'}))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_follow_404(self):
+        res = self.client.put(reverse('follow', kwargs={'username': 'nobody'}))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_follow_unauth(self):
+        self.client.force_authenticate(None)
+        res = self.client.put(self.url)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StatelessAuthTest(APITestCase):
+
+    def setUp(self):
+        caches['revocations'].clear()  # user ids are reused between tests
+        self.user = User.objects.create_user(
+            username='test', password='123tester123')
+        self.tokens = self._login()
+
+    def _login(self):
+        res = self.client.post(reverse('token_login'), data={
+            'username': 'test',
+            'password': '123tester123',
+        })
+        return res.data
+
+    def _me(self, access):
+        return self.client.get(reverse('current_user_details'),
+                               HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_user_from_claims(self):
+        # only the revocations are read
+        with self.assertNumQueries(1):
+            res = self._me(self.tokens['access'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, UserSerializer(instance=self.user).data)
+
+    def test_token_without_claims(self):
+        token = AccessToken.for_user(self.user)
+        with self.assertNumQueries(2):
+            res = self._me(str(token))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['username'], 'test')
+
+    def test_refreshed_token_keeps_claims(self):
+        res = self.client.post(reverse('token_refresh'), data={
+            'refresh': self.tokens['refresh']
+        }, format='json')
+        with self.assertNumQueries(1):
+            res = self._me(res.data['access'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_password_change_revokes_tokens(self):
+        res = self.client.post(reverse('change_password'), data={
+            'password': 'newpassword',
+            'confirm_password': 'newpassword',
+        }, format='json', HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self._me(self.tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._me(res.data['access']).status_code,
+                         status.HTTP_200_OK)
+        res = self.client.post(reverse('token_refresh'), data={
+            'refresh': self.tokens['refresh']
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_password_change_keeps_user(self):
+        # changed without signals, the token still has the old claims
+        User.objects.filter(pk=self.user.pk).update(username='renamed')
+        res = self.client.post(reverse('change_password'), data={
+            'password': 'newpassword',
+            'confirm_password': 'newpassword',
+        }, format='json', HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.username, 'renamed')
+        self.assertTrue(user.check_password('newpassword'))
+        res = self._me(res.data['access'])
+        self.assertEqual(res.data['username'], 'renamed')
+
+    def test_logout(self):
+        other = self._login()
+        res = self.client.post(
+            reverse('logout'), data={'refresh': self.tokens['refresh']},
+            format='json', HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self._me(self.tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(reverse('token_refresh'), data={
+            'refresh': self.tokens['refresh']
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        # other sessions stay logged in
+        self.assertEqual(self._me(other['access']).status_code,
+                         status.HTTP_200_OK)
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._me(self.tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocations_kept_apart(self):
+        self.client.post(
+            reverse('logout'), HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        # the default cache is per process and culls post payloads
+        cache.clear()
+        self.assertEqual(self._me(self.tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocations_unreadable(self):
+        with mock.patch.object(caches['revocations'], 'get_many',
+                               side_effect=DatabaseError), \
+                self.assertLogs('users.authentication', 'ERROR'):
+            res = self._me(self.tokens['access'])
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def _refresh(self):
+        return self.client.post(reverse('token_refresh'), data={
+            'refresh': self.tokens['refresh']
+        }, format='json')
+
+    def test_changed_claims_revoke_tokens(self):
+        for field, value in [('is_staff', True), ('is_superuser', True),
+                             ('username', 'renamed')]:
+            self.tokens = self._login()
+            setattr(self.user, field, value)
+            self.user.save()
+            self.assertEqual(self._me(self.tokens['access']).status_code,
+                             status.HTTP_401_UNAUTHORIZED, field)
+            self.assertEqual(self._refresh().status_code,
+                             status.HTTP_400_BAD_REQUEST, field)
+            self.user.username = 'test'
+            self.user.save()
+
+    def test_unrelated_save_keeps_tokens(self):
+        self.user.follower_count = 5
+        self.user.save()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self._me(self.tokens['access']).status_code,
+                         status.HTTP_200_OK)
+
+    def test_deleted_user(self):
+        self.user.delete()
+        self.assertEqual(self._me(self.tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(
+            reverse('post_list_create'), data={'text': 'post'},
+            HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._refresh().status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_reads_claims(self):
+        # changed without signals, so the tokens are not revoked
+        User.objects.filter(pk=self.user.pk).update(username='renamed')
+        res = self._refresh()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(res.data['access'])['username'],
+                         'renamed')
+        self.assertEqual(RefreshToken(res.data['refresh'])['username'],
+                         'renamed')
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.tokens = res.data
+        self.assertEqual(self._refresh().status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class PasswordHashingTest(APITestCase):
+
+    def test_scrypt_hasher(self):
+        encoded = make_password('123tester123', hasher='scrypt')
+        self.assertTrue(encoded.startswith('scrypt$16384$'))
+        self.assertTrue(check_password('123tester123', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+
+    def test_rehash_on_login(self):
+        user = User.objects.create_user(username='test', password='x')
+        user.password = make_password('123tester123', hasher='pbkdf2_sha1')
+        user.save()
+
+        res = self.client.post(reverse('token_login'), data={
+            'username': 'test',
+            'password': '123tester123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('123tester123'))
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1})
+    def test_pool(self):
+        hashing.shutdown()
+        self.addCleanup(hashing.shutdown)
+
+        encoded = hashing.make_password('123tester123')
+        self.assertIsNotNone(hashing.get_pool())
+        self.assertTrue(hashing.check_password('123tester123', encoded))
+
+        rehashed = []
+        old = make_password('123tester123', hasher='pbkdf2_sha1')
+        self.assertTrue(
+            hashing.check_password('123tester123', old, rehashed.append))
+        self.assertListEqual(rehashed, ['123tester123'])
+
+    @override_settings(PASSWORD_HASHING={
+        'WORKERS': 1, 'MAX_PENDING': 0, 'QUEUE_TIMEOUT': 0})
+    def test_pool_overloaded(self):
+        hashing.shutdown()
+        self.addCleanup(hashing.shutdown)
+
+        pool = hashing.get_pool()
+        pool.slots.acquire()
+        with self.assertRaises(hashing.Overloaded):
+            hashing.make_password('123tester123')
+        res = self.client.post(reverse('token_login'), data={
+            'username': 'test',
+            'password': '123tester123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        pool.slots.release()
+
+        res = self.client.post(reverse('register'), data={
+            'username': 'test',
+            'password': '123tester123',
+            'confirm_password': '123tester123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
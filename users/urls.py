@@ -6,13 +6,21 @@ from rest_framework_simplejwt.views import (
 )
 
 from . import views
+from .serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
 urlpatterns = [
     path('me/', views.current_user_details, name='current_user_details'),
     path('password/change/', views.change_password, name='change_password'),
     path('register/', views.register, name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='token_login'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/',
+         TokenObtainPairView.as_view(
+             serializer_class=TokenObtainPairSerializer),
+         name='token_login'),
+    path('logout/', views.logout, name='logout'),
+    path('token/refresh/',
+         TokenRefreshView.as_view(serializer_class=TokenRefreshSerializer),
+         name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('<str:username>/', views.user_details, name='user_details'),
+    path('<str:username>/follow/', views.follow, name='follow'),
 ]
@@ -1,11 +1,20 @@
 from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status as s
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from .serializers import UserSerializer, PasswordChangeSerializer
+from .authentication import revoke, revoke_user
+from .models import Follow
+from .serializers import (
+    UserSerializer,
+    PasswordChangeSerializer,
+    TokenObtainPairSerializer
+)
 
 User = get_user_model()
 
@@ -37,17 +46,45 @@ def user_details(request, username):
 @permission_classes([IsAuthenticated])
 def change_password(request):
     """
-    Change user password.
+    Change user password. Every token issued before is revoked, a new pair is
+    returned.
     """
     data = PasswordChangeSerializer(data=request.data)
     if data.is_valid():
-        request.user.set_password(data.validated_data['password'])
-        request.user.save()
-        return Response(status=s.HTTP_200_OK)
+        # request.user is built from the token claims, which may be out of
+        # date, only ever write the password
+        user = User.objects.db_manager(DEFAULT_DB_ALIAS).get(pk=request.user.pk)
+        user.set_password(data.validated_data['password'])
+        user.save(update_fields=['password'])
+        revoke_user(user.pk)
+
+        refresh = TokenObtainPairSerializer.get_token(user)
+        return Response({'refresh': str(refresh),
+                         'access': str(refresh.access_token)},
+                        status=s.HTTP_200_OK)
 
     return Response(data.errors, status=s.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    """
+    Revoke the access token used for the request and the refresh token in the
+    body, if given.
+    """
+    if request.auth is not None:
+        revoke(request.auth)
+
+    if 'refresh' in request.data:
+        try:
+            revoke(RefreshToken(request.data['refresh']))
+        except TokenError:
+            pass  # invalid or expired already
+
+    return Response(status=s.HTTP_200_OK)
+
+
 @api_view(['POST'])
 def register(request):
     """
@@ -59,3 +96,32 @@ def register(request):
         return Response(status=s.HTTP_201_CREATED)
 
     return Response(user.errors, status=s.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def follow(request, username):
+    """
+    Follow (PUT) or unfollow (DELETE) the user with username. Both are
+    idempotent.
+    """
+    try:
+        followee = User.objects.get(username=username)
+    except User.DoesNotExist:
+        return Response(status=s.HTTP_404_NOT_FOUND)
+
+    if followee.pk == request.user.pk:
+        return Response({'detail': 'You can not follow yourself'},
+                        status=s.HTTP_400_BAD_REQUEST)
+
+    # follower_count is kept in sync by users/signals.py
+    if request.method == 'PUT':
+        try:
+            with transaction.atomic():
+                Follow.objects.create(follower=request.user, followee=followee)
+        except IntegrityError:
+            pass  # already following
+    else:
+        Follow.objects.filter(follower=request.user, followee=followee).delete()
+
+    return Response(status=s.HTTP_200_OK)